@@ -0,0 +1,122 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from ml.cardio_model import RiskPrediction, get_model
+
+# Knob micro-batching (bisa diatur lewat environment variable):
+# - SIAGA_BATCH_MAX_WAIT_MS: berapa lama request pertama menunggu request lain
+# - SIAGA_BATCH_MAX_SIZE: jumlah baris maksimum per panggilan model
+DEFAULT_MAX_WAIT_MS = float(os.getenv("SIAGA_BATCH_MAX_WAIT_MS", "5"))
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("SIAGA_BATCH_MAX_SIZE", "64"))
+
+ScoreResult = Tuple[RiskPrediction, Optional[Dict[str, float]]]
+
+
+class MicroBatcher:
+    """Antrian inferensi async di depan CardioRiskModel.
+
+    Request yang datang bersamaan dikumpulkan selama maksimal `max_wait_ms`
+    atau sampai `max_batch_size` baris, lalu diskor dengan satu panggilan
+    predict_proba (dan satu panggilan SHAP untuk baris yang memintanya).
+    Tambahan latensi per request dibatasi oleh `max_wait_ms` plus durasi
+    satu batch. Bila skoring satu batch gagal, baris diskor ulang satu per
+    satu sehingga error hanya sampai ke request yang barisnya bermasalah.
+    """
+
+    def __init__(self, max_wait_ms: float = DEFAULT_MAX_WAIT_MS, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size harus >= 1")
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.max_batch_size = max_batch_size
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, data: Dict, with_shap: bool = False) -> ScoreResult:
+        """Masukkan satu baris ke antrian dan tunggu hasil batch-nya."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((data, with_shap, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Ambil sisa item yang sudah antre tanpa menunggu lagi
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            rows = [data for data, _, _ in batch]
+            shap_mask = [with_shap for _, with_shap, _ in batch]
+            try:
+                # Model dijalankan di thread pool agar event loop tetap responsif
+                results = await self._loop.run_in_executor(None, self._score, rows, shap_mask)
+            except Exception as e:
+                if len(batch) > 1:
+                    # Satu baris rusak tidak boleh menggagalkan seluruh batch:
+                    # ulangi per baris agar hanya baris itu yang error.
+                    await self._score_each(batch)
+                elif not batch[0][2].done():
+                    batch[0][2].set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():  # request bisa saja sudah dibatalkan
+                    future.set_result(result)
+
+    async def _score_each(self, batch: list) -> None:
+        for data, with_shap, future in batch:
+            if future.done():
+                continue
+            try:
+                result = (await self._loop.run_in_executor(None, self._score, [data], [with_shap]))[0]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += 1
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _score(rows: List[Dict], shap_mask: List[bool]) -> List[ScoreResult]:
+        model = get_model()
+        predictions = model.predict_batch(rows, threshold=0.5)
+
+        shap_rows = [None] * len(rows)
+        shap_idx = [i for i, wanted in enumerate(shap_mask) if wanted]
+        if shap_idx:
+            explained = model.get_shap_values_batch([rows[i] for i in shap_idx])
+            for i, values in zip(shap_idx, explained):
+                shap_rows[i] = values
+
+        return list(zip(predictions, shap_rows))
+
+
+# Satu antrian bersama untuk semua endpoint skoring dalam proses ini.
+scoring_batcher = MicroBatcher()
@@ -1,13 +1,48 @@
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+import json
+import queue
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from fastapi import Body, FastAPI, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from .. import crud, models, schemas
+from .. import crud, export, models, schemas
+from ..checkup_writer import WRITER_ENABLED, checkup_writer
 from ..database import SessionLocal, engine
-from ml.cardio_model import CardioRiskModel
+from ..migrate import upgrade as upgrade_schema
+from ..patient_search import ensure_search_index
+from ml.cardio_model import get_model, model_status, warm_up_model
+from .batching import scoring_batcher
 
-models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+ensure_search_index(engine)
 
-app = FastAPI(title="SIAGA Jantung API v2")
+def _ensure_stats_rollup():
+    db = SessionLocal()
+    try:
+        crud.ensure_checkup_stats(db)
+    finally:
+        db.close()
+
+_ensure_stats_rollup()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Muat model + satu prediksi/SHAP dummy sebelum request pertama
+    await run_in_threadpool(warm_up_model)
+    yield
+    # Pastikan checkup yang masih antre di background writer tersimpan
+    if WRITER_ENABLED:
+        await run_in_threadpool(checkup_writer.close)
+
+app = FastAPI(title="SIAGA Jantung API v2", lifespan=lifespan)
+
+MIN_AGE_YEARS = 5
+MIN_AGE_ERROR = "Pasien harus berusia minimal 5 tahun untuk analisis risiko."
+MAX_BULK_ROWS = 5000
 
 # Dependency
 def get_db():
@@ -17,6 +52,27 @@ def get_db():
     finally:
         db.close()
 
+# --- Keyset pagination ---
+# List endpoints keep returning a plain list; the token for the next page is
+# sent in this header and passed back as `?cursor=`.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def decode_cursor_param(cursor: Optional[str], *types):
+    """Decode an opaque `cursor` into a tuple of `types`; None when absent."""
+    if not cursor:
+        return None
+    try:
+        return tuple(t(v) for t, v in zip(types, crud.decode_cursor(cursor), strict=True))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor tidak valid.")
+
+def paginate(response: Response, rows: list, limit: int, key):
+    """Trim `rows` (fetched with limit + 1) and set the next-page header."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = crud.encode_cursor(*key(rows[-1]))
+    return rows
+
 @app.get("/model-info")
 def get_model_info():
     import json
@@ -28,6 +84,35 @@ def get_model_info():
     except Exception as e:
         return {"accuracy": "N/A", "error": str(e)}
 
+def build_recommendations(risk_cat: str, input_data: dict) -> str:
+    """Clinical-path recommendations for one scored checkup."""
+    recs = []
+
+    # 1. Risk-Based Path
+    if risk_cat == "Tinggi":
+        recs.append("⚠️ **PROTOKOL RISIKO TINGGI**: Rujuk segera ke Spesialis Jantung (Cardiologist).")
+        recs.append("Lakukan EKG 12-lead dan Panel Lipid Lengkap.")
+    elif risk_cat == "Sedang":
+        recs.append("⚠️ **PROTOKOL RISIKO SEDANG**: Jadwalkan kontrol ulang dalam 3 bulan.")
+        recs.append("Evaluasi gaya hidup ketat dan pertimbangkan terapi statin jika kolesterol tinggi.")
+    else:
+        recs.append("✅ **PROTOKOL RISIKO RENDAH**: Edukasi gaya hidup sehat (diet & olahraga).")
+        recs.append("Kontrol rutin tahunan.")
+
+    # 2. Factor-Based Path (Simplified SHAP-like logic)
+    if input_data['smoke'] == 1:
+        recs.append("🚭 **STOP MEROKOK**: Program berhenti merokok wajib. (Sumber: WHO Tobacco Free Initiative)")
+    if input_data['bmi'] >= 30:
+        recs.append("⚖️ **MANAJEMEN BERAT BADAN**: Rujuk ke Ahli Gizi. Target penurunan BB 5-10%. (Sumber: WHO BMI)")
+    if input_data['map'] > 105:
+        recs.append("🩺 **HIPERTENSI**: Monitoring tekanan darah harian. Pertimbangkan ACE-Inhibitor/ARB. (Sumber: JNC 8)")
+    if input_data['cholesterol'] >= 3:
+        recs.append("🍔 **KOLESTEROL**: Diet rendah lemak jenuh. Cek ulang profil lipid 1 bulan. (Sumber: ESC/EAS)")
+    if input_data['gluc'] >= 3:
+        recs.append("🍬 **DIABETES**: Cek HbA1c. Konsul Endokrin jika perlu. (Sumber: ADA Standards)")
+
+    return "\n".join(recs)
+
 # --- Users ---
 @app.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -37,9 +122,16 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db=db, user=user)
 
 @app.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(models.User).offset(skip).limit(limit).all()
-    return users
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    after = decode_cursor_param(cursor, int)
+    users = crud.get_users(db, skip=skip, limit=limit + 1, after_id=after[0] if after else None)
+    return paginate(response, users, limit, lambda u: (u.id,))
 
 # --- Patients ---
 @app.post("/patients/", response_model=schemas.Patient)
@@ -52,9 +144,36 @@ def create_patient(patient: schemas.PatientCreate, db: Session = Depends(get_db)
     return crud.create_patient(db=db, patient=patient)
 
 @app.get("/patients/", response_model=List[schemas.Patient])
-def read_patients(skip: int = 0, limit: int = 100, name: Optional[str] = None, db: Session = Depends(get_db)):
-    patients = crud.get_patients(db, skip=skip, limit=limit, name=name)
-    return patients
+def read_patients(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    after = decode_cursor_param(cursor, int)
+    patients = crud.get_patients(db, skip=skip, limit=limit + 1, name=name, after_id=after[0] if after else None)
+    return paginate(response, patients, limit, lambda p: (p.id,))
+
+@app.get("/patients/search/", response_model=schemas.PatientSearchPage)
+def search_patients(q: str, limit: int = 20, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """Ranked prefix/fuzzy search on name and MRN, paginated with `next_cursor`."""
+    after = decode_cursor_param(cursor, float, int)
+    patients, next_after = crud.search_patients_page(db, q, limit=limit, after=after)
+    return schemas.PatientSearchPage(
+        results=patients,
+        next_cursor=crud.encode_cursor(*next_after) if next_after else None
+    )
+
+@app.get("/patients/risk-status/", response_model=List[schemas.PatientWithRisk])
+def read_patients_with_risk(q: Optional[str] = None, skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+    """Patients (optionally filtered by name/MRN) with their latest risk_category."""
+    rows = crud.get_patients_with_latest_risk(db, q=q, skip=skip, limit=limit)
+    return [
+        schemas.PatientWithRisk(**schemas.Patient.model_validate(patient).dict(), last_risk_category=category)
+        for patient, category in rows
+    ]
 
 @app.get("/patients/{patient_id}", response_model=schemas.Patient)
 def read_patient(patient_id: int, db: Session = Depends(get_db)):
@@ -65,102 +184,196 @@ def read_patient(patient_id: int, db: Session = Depends(get_db)):
 
 # --- Checkups ---
 @app.post("/patients/{patient_id}/checkups/", response_model=schemas.Checkup)
-def create_checkup_for_patient(
+async def create_checkup_for_patient(
     patient_id: int, 
     checkup: schemas.CheckupCreate, 
     db: Session = Depends(get_db)
 ):
+    # DB calls stay synchronous, so they run in the threadpool; only model
+    # scoring goes through the shared micro-batching queue.
     # 1. Validate Patient
-    patient = crud.get_patient(db, patient_id=patient_id)
+    patient = await run_in_threadpool(crud.get_patient, db, patient_id=patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
+    # Kembalikan koneksi ke pool selama scoring / antre writer; tanpa ini
+    # request konkuren menahan koneksi dan pool (5 + 10 overflow) habis.
+    db.close()
 
     # 2. Calculate Risk
     try:
-        model = CardioRiskModel()
         # Prepare data for model
         input_data = checkup.dict()
         
         # Validate Age
-        if input_data['age_years'] < 5:
-            raise HTTPException(status_code=400, detail="Pasien harus berusia minimal 5 tahun untuk analisis risiko.")
+        if input_data['age_years'] < MIN_AGE_YEARS:
+            raise HTTPException(status_code=400, detail=MIN_AGE_ERROR)
             
         # Model expects specific keys, checkup.dict() has them plus 'notes' and 'checked_by_user_id'
         # The model wrapper _to_feature_array handles extraction by key, so extra keys are fine if we pass the dict.
         # However, we need to ensure the keys match exactly what the model expects.
         # The model expects: age_years, gender, bmi, map, cholesterol, gluc, smoke, alco, active
         
-        proba = model.predict_proba(input_data)
-        label = model.predict_label(input_data, threshold=0.5)
-        
-        # Calculate SHAP Values
-        shap_dict = model.get_shap_values(input_data)
-        import json
-        shap_json = json.dumps(shap_dict)
+        # Prediction + SHAP Values, batched with concurrent requests
+        result, shap_dict = await scoring_batcher.submit(input_data, with_shap=True)
         
-        risk_percent = proba * 100
-        if risk_percent < 30:
-            risk_cat = "Rendah"
-        elif risk_percent < 60:
-            risk_cat = "Sedang"
-        else:
-            risk_cat = "Tinggi"
-            
-        model_version = "xgb_v1.0.0" # Hardcoded for now
+        risk_cat = result.risk_category
 
         # Generate Recommendations (Clinical Path)
-        recs = []
-        
-        # 1. Risk-Based Path
-        if risk_cat == "Tinggi":
-            recs.append("⚠️ **PROTOKOL RISIKO TINGGI**: Rujuk segera ke Spesialis Jantung (Cardiologist).")
-            recs.append("Lakukan EKG 12-lead dan Panel Lipid Lengkap.")
-        elif risk_cat == "Sedang":
-            recs.append("⚠️ **PROTOKOL RISIKO SEDANG**: Jadwalkan kontrol ulang dalam 3 bulan.")
-            recs.append("Evaluasi gaya hidup ketat dan pertimbangkan terapi statin jika kolesterol tinggi.")
-        else:
-            recs.append("✅ **PROTOKOL RISIKO RENDAH**: Edukasi gaya hidup sehat (diet & olahraga).")
-            recs.append("Kontrol rutin tahunan.")
-
-        # 2. Factor-Based Path (Simplified SHAP-like logic)
-        if input_data['smoke'] == 1:
-            recs.append("🚭 **STOP MEROKOK**: Program berhenti merokok wajib. (Sumber: WHO Tobacco Free Initiative)")
-        if input_data['bmi'] >= 30:
-            recs.append("⚖️ **MANAJEMEN BERAT BADAN**: Rujuk ke Ahli Gizi. Target penurunan BB 5-10%. (Sumber: WHO BMI)")
-        if input_data['map'] > 105:
-            recs.append("🩺 **HIPERTENSI**: Monitoring tekanan darah harian. Pertimbangkan ACE-Inhibitor/ARB. (Sumber: JNC 8)")
-        if input_data['cholesterol'] >= 3:
-            recs.append("🍔 **KOLESTEROL**: Diet rendah lemak jenuh. Cek ulang profil lipid 1 bulan. (Sumber: ESC/EAS)")
-        if input_data['gluc'] >= 3:
-            recs.append("🍬 **DIABETES**: Cek HbA1c. Konsul Endokrin jika perlu. (Sumber: ADA Standards)")
-        
-        recommendations_str = "\n".join(recs)
+        recommendations_str = build_recommendations(risk_cat, input_data)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
 
     # 3. Save to DB
-    return crud.create_checkup(
-        db=db, 
+    checkup_kwargs = dict(
         checkup=checkup, 
         patient_id=patient_id, 
-        probability=proba, 
-        risk_label=label, 
-        risk_category=risk_cat,
-        model_version=model_version,
+        probability=result.probability, 
+        risk_label=result.label, 
+        risk_category=result.risk_category,
+        model_version=result.model_version,
         recommendations=recommendations_str,
-        shap_values=shap_json
+        shap_values=shap_dict
     )
+    if WRITER_ENABLED:
+        # Group commit lewat background writer; tetap menunggu commit agar ID durable
+        try:
+            future = checkup_writer.submit(**checkup_kwargs)
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="Antrian penyimpanan penuh, silakan coba lagi.")
+        return await asyncio.wrap_future(future)
+    return await run_in_threadpool(crud.create_checkup, db=db, **checkup_kwargs)
+
+@app.post("/patients/checkups/bulk", response_model=schemas.CheckupBulkResponse)
+def create_checkups_bulk(
+    rows: List[Dict[str, Any]] = Body(...),
+    db: Session = Depends(get_db)
+):
+    """Score and store many checkups (e.g. a posbindu session) in one request.
+
+    Rows are validated one by one so a bad row only produces an entry in
+    `errors`; valid rows are scored with a single model call and inserted
+    in a single transaction.
+    """
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"Maksimal {MAX_BULK_ROWS} baris per request.")
+
+    errors = []
+    valid = []  # (index, CheckupBulkCreate)
+    for idx, row in enumerate(rows):
+        try:
+            checkup = schemas.CheckupBulkCreate(**row)
+        except ValidationError as e:
+            errors.append(schemas.BulkRowError(index=idx, detail=str(e)))
+            continue
+        if checkup.age_years < MIN_AGE_YEARS:
+            errors.append(schemas.BulkRowError(index=idx, detail=MIN_AGE_ERROR))
+            continue
+        valid.append((idx, checkup))
+
+    # Validate all referenced patients with one query
+    patient_ids = {c.patient_id for _, c in valid}
+    existing = {
+        pid for (pid,) in db.query(models.Patient.id).filter(models.Patient.id.in_(patient_ids))
+    } if patient_ids else set()
+    scored = []
+    for idx, checkup in valid:
+        if checkup.patient_id not in existing:
+            errors.append(schemas.BulkRowError(index=idx, detail="Patient not found"))
+        else:
+            scored.append((idx, checkup))
+
+    if not scored:
+        return schemas.CheckupBulkResponse(results=[], errors=sorted(errors, key=lambda e: e.index))
+
+    try:
+        model = get_model()
+        input_rows = [checkup.dict() for _, checkup in scored]
+        predictions = model.predict_batch(input_rows, threshold=0.5)
+        shap_rows = model.get_shap_values_batch(input_rows)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
+
+    db_rows = []
+    for (idx, checkup), input_data, result, shap_dict in zip(scored, input_rows, predictions, shap_rows):
+        db_rows.append(dict(
+            checkup=checkup,
+            patient_id=checkup.patient_id,
+            probability=result.probability,
+            risk_label=result.label,
+            risk_category=result.risk_category,
+            model_version=result.model_version,
+            recommendations=build_recommendations(result.risk_category, input_data),
+            shap_values=shap_dict
+        ))
+    db_checkups = crud.create_checkups_bulk(db, db_rows)
+
+    results = [
+        schemas.CheckupBulkResult(index=idx, checkup=db_checkup)
+        for (idx, _), db_checkup in zip(scored, db_checkups)
+    ]
+    return schemas.CheckupBulkResponse(results=results, errors=sorted(errors, key=lambda e: e.index))
 
 @app.get("/patients/{patient_id}/checkups/", response_model=List[schemas.Checkup])
-def read_checkups(patient_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    checkups = crud.get_checkups_by_patient(db, patient_id=patient_id, skip=skip, limit=limit)
-    return checkups
+def read_checkups(
+    patient_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    after = decode_cursor_param(cursor, datetime.fromisoformat, int)
+    checkups = crud.get_checkups_by_patient(db, patient_id=patient_id, skip=skip, limit=limit + 1, after=after)
+    return paginate(response, checkups, limit, lambda c: (c.created_at.isoformat(), c.id))
 
 @app.get("/checkups/", response_model=List[schemas.Checkup])
 def read_all_checkups(limit: int = 1000, db: Session = Depends(get_db)):
-    return crud.get_all_checkups(db, limit=limit)
+    return [
+        dict(row._mapping, shap_values=models.shap_json(row))
+        for row in crud.get_checkup_report(db, limit=limit)
+    ]
+
+@app.get("/checkups/export")
+def export_checkups(format: str = "csv", with_details: bool = True):
+    """Laporan lengkap semua checkup (tanpa batas baris), di-stream per potongan."""
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format harus 'csv' atau 'parquet'.")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Ekspor Parquet membutuhkan paket pyarrow.")
+    media_type, extension = export.EXPORT_FORMATS[format]
+    filename = f"Laporan_Klinik_{datetime.now():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        export.stream_report(format, with_details=with_details),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/health")
+def health(response: Response):
+    status_info = model_status()
+    if status_info["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"model": status_info}
 
 @app.get("/stats/")
 def get_stats(db: Session = Depends(get_db)):
     return crud.get_checkup_stats(db)
+
+@app.get("/stats/timeseries", response_model=List[schemas.StatsDay])
+def get_stats_timeseries(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    risk_category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return crud.get_checkup_timeseries(db, start=start, end=end, risk_category=risk_category)
+
+@app.get("/stats/shap-impact", response_model=schemas.ShapImpact)
+def get_stats_shap_impact(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    risk_category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return crud.get_shap_impact(db, start=start, end=end, risk_category=risk_category)
@@ -1,12 +1,24 @@
-from typing import Dict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
 
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import Body, FastAPI, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 
-from ml.cardio_model import CardioRiskModel
+from ml.cardio_model import get_model, model_status, warm_up_model
+from .batching import scoring_batcher
 
 
-app = FastAPI(title="SIAGA Jantung API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Muat model + satu prediksi/SHAP dummy sebelum request pertama
+    await run_in_threadpool(warm_up_model)
+    yield
+
+
+app = FastAPI(title="SIAGA Jantung API", lifespan=lifespan)
+
+MAX_BATCH_ROWS = 10000
 
 
 class PredictRequest(BaseModel):
@@ -27,22 +39,65 @@ class PredictResponse(BaseModel):
     risk_category: str
 
 
+class PredictBatchItem(PredictResponse):
+    index: int
+
+
+class PredictRowError(BaseModel):
+    index: int
+    detail: str
+
+
+class PredictBatchResponse(BaseModel):
+    results: List[PredictBatchItem]
+    errors: List[PredictRowError]
+
+
+@app.get("/health")
+def health(response: Response):
+    status_info = model_status()
+    if status_info["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"model": status_info}
+
+
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest) -> PredictResponse:
-    model = CardioRiskModel()
-    proba = model.predict_proba(req.dict())
-    label = model.predict_label(req.dict(), threshold=0.5)
-
-    risk_percent = proba * 100
-    if risk_percent < 30:
-        risk_cat = "Rendah"
-    elif risk_percent < 60:
-        risk_cat = "Sedang"
-    else:
-        risk_cat = "Tinggi"
+async def predict(req: PredictRequest) -> PredictResponse:
+    # Digabung dengan request lain yang datang bersamaan (lihat batching.py)
+    result, _ = await scoring_batcher.submit(req.dict())
 
     return PredictResponse(
-        probability=proba,
-        label=label,
-        risk_category=risk_cat,
+        probability=result.probability,
+        label=result.label,
+        risk_category=result.risk_category,
     )
+
+
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+def predict_batch(rows: List[Dict[str, Any]] = Body(...)) -> PredictBatchResponse:
+    """Skor banyak baris dengan satu panggilan model; baris invalid dilaporkan per indeks."""
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Maksimal {MAX_BATCH_ROWS} baris per request.")
+
+    errors = []
+    valid_idx = []
+    valid_rows = []
+    for idx, row in enumerate(rows):
+        try:
+            valid_rows.append(PredictRequest(**row).dict())
+            valid_idx.append(idx)
+        except ValidationError as e:
+            errors.append(PredictRowError(index=idx, detail=str(e)))
+
+    results = []
+    if valid_rows:
+        model = get_model()
+        for idx, result in zip(valid_idx, model.predict_batch(valid_rows, threshold=0.5)):
+            results.append(PredictBatchItem(
+                index=idx,
+                probability=result.probability,
+                label=result.label,
+                risk_category=result.risk_category,
+            ))
+
+    return PredictBatchResponse(results=results, errors=errors)
@@ -0,0 +1,138 @@
+"""Bandingkan statistik dashboard: versi lama (8 query), satu scan, dan rollup.
+
+Membuat database SQLite sementara berisi checkup sintetis:
+
+    python -m appheart.bench_stats --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from . import crud, models
+from .database import Base
+
+RISK_CATEGORIES = np.array(["Rendah", "Sedang", "Tinggi"])
+
+
+def get_checkup_stats_legacy(db):
+    """Implementasi lama: satu query per angka."""
+    C = models.Checkup
+    risk_dist = db.query(C.risk_category, func.count(C.id)).group_by(C.risk_category).all()
+    avg_stats = db.query(
+        func.avg(C.bmi).label('avg_bmi'),
+        func.avg(C.map).label('avg_map'),
+        func.avg(C.probability).label('avg_risk')
+    ).first()
+    return {
+        "total_patients": db.query(models.Patient).count(),
+        "total_checkups": db.query(C).count(),
+        "risk_distribution": {k: v for k, v in risk_dist},
+        "averages": {
+            "bmi": avg_stats.avg_bmi or 0,
+            "map": avg_stats.avg_map or 0,
+            "risk": avg_stats.avg_risk or 0
+        },
+        "risk_factors": {
+            "Merokok": db.query(C).filter(C.smoke == 1).count(),
+            "Kolesterol Tinggi": db.query(C).filter(C.cholesterol >= 2).count(),
+            "Diabetes": db.query(C).filter(C.gluc >= 2).count(),
+            "Hipertensi": db.query(C).filter(C.map > 105).count()
+        }
+    }
+
+
+def populate(engine, n_rows, n_patients=10000, seed=0, chunk=100000):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany(
+            "INSERT INTO patients (id, full_name, gender) VALUES (?, ?, ?)",
+            [(i, f"Pasien {i}", "M" if i % 2 else "F") for i in range(1, n_patients + 1)],
+        )
+        for offset in range(0, n_rows, chunk):
+            n = min(chunk, n_rows - offset)
+            proba = rng.random(n)
+            category = RISK_CATEGORIES[np.digitize(proba * 100, [30, 60])]
+            # Format penyimpanan DateTime SQLAlchemy (dengan mikrodetik), agar
+            # perbandingan string di SQLite konsisten dengan nilai yang di-bind
+            created = [
+                (start + timedelta(minutes=int(m))).strftime("%Y-%m-%d %H:%M:%S.%f")
+                for m in rng.integers(0, 365 * 24 * 60, n)
+            ]
+            cur.executemany(
+                "INSERT INTO checkups (patient_id, checked_by_user_id, age_years, gender, bmi, map, "
+                "cholesterol, gluc, smoke, alco, active, probability, risk_label, risk_category, "
+                "model_version, created_at) VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'bench', ?)",
+                zip(
+                    rng.integers(1, n_patients + 1, n).tolist(),
+                    rng.integers(30, 65, n).tolist(),
+                    rng.integers(1, 3, n).tolist(),
+                    rng.normal(27, 5, n).round(1).tolist(),
+                    rng.normal(100, 12, n).round(1).tolist(),
+                    rng.integers(1, 4, n).tolist(),
+                    rng.integers(1, 4, n).tolist(),
+                    rng.integers(0, 2, n).tolist(),
+                    rng.integers(0, 2, n).tolist(),
+                    rng.integers(0, 2, n).tolist(),
+                    proba.tolist(),
+                    (proba >= 0.5).astype(int).tolist(),
+                    category.tolist(),
+                    created,
+                ),
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def best_of(fn, db, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(db)
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="jumlah checkup sintetis")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        t0 = time.perf_counter()
+        populate(engine, args.rows)
+        print(f"Populated {args.rows:,} checkups in {time.perf_counter() - t0:.1f}s")
+
+        db = sessionmaker(bind=engine)()
+        try:
+            t0 = time.perf_counter()
+            n_rollup = crud.rebuild_checkup_stats(db)
+            print(f"Rebuilt rollup ({n_rollup:,} rows) in {time.perf_counter() - t0:.1f}s")
+            legacy_s, legacy = best_of(get_checkup_stats_legacy, db, args.repeat)
+            scan_s, scan = best_of(crud.scan_checkup_stats, db, args.repeat)
+            rollup_s, rollup = best_of(crud.get_checkup_stats, db, args.repeat)
+        finally:
+            db.close()
+
+        def same(a, b):
+            return a["total_checkups"] == b["total_checkups"] \
+                and a["risk_distribution"] == b["risk_distribution"] \
+                and a["risk_factors"] == b["risk_factors"] \
+                and all(abs(a["averages"][k] - b["averages"][k]) < 1e-9 for k in a["averages"])
+
+        print(f"legacy (8 queries): {legacy_s * 1000:8.1f} ms")
+        print(f"single scan:        {scan_s * 1000:8.1f} ms  ({legacy_s / scan_s:.1f}x)")
+        print(f"rollup:             {rollup_s * 1000:8.1f} ms  ({legacy_s / rollup_s:.0f}x)")
+        print(f"identical results:  {same(legacy, scan) and same(legacy, rollup)}")
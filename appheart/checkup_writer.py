@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import List, Optional, Tuple
+
+from . import crud
+from .database import SessionLocal
+
+# Mode penyimpanan checkup lewat background writer (group commit).
+# - SIAGA_CHECKUP_WRITER=1 untuk mengaktifkan
+# - SIAGA_WRITER_QUEUE_DEPTH: antrian maksimum sebelum request ditolak (503)
+# - SIAGA_WRITER_FLUSH_MS: jeda maksimum sebelum antrian di-commit
+# - SIAGA_WRITER_MAX_BATCH: jumlah baris maksimum per transaksi
+WRITER_ENABLED = os.getenv("SIAGA_CHECKUP_WRITER", "0") == "1"
+DEFAULT_QUEUE_DEPTH = int(os.getenv("SIAGA_WRITER_QUEUE_DEPTH", "1000"))
+DEFAULT_FLUSH_MS = float(os.getenv("SIAGA_WRITER_FLUSH_MS", "10"))
+DEFAULT_MAX_BATCH = int(os.getenv("SIAGA_WRITER_MAX_BATCH", "256"))
+
+
+def _resolve(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    # Request yang sudah dibatalkan (client putus) tetap tersimpan; hasilnya
+    # saja yang dibuang.
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class CheckupWriter:
+    """Thread penulis yang menggabungkan insert checkup ke satu transaksi.
+
+    Setiap `submit` mengembalikan Future yang selesai setelah baris benar-benar
+    di-commit, sehingga pemanggil tetap mendapat ID yang durable. Keuntungannya:
+    banyak request berbagi satu commit (satu fsync di SQLite), bukan satu
+    commit per request.
+    """
+
+    def __init__(
+        self,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        flush_ms: float = DEFAULT_FLUSH_MS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        session_factory=SessionLocal,
+    ):
+        self.flush_interval = max(flush_ms, 0) / 1000.0
+        self.max_batch = max(max_batch, 1)
+        self.session_factory = session_factory
+        self._queue: "queue.Queue[Optional[Tuple[dict, Future]]]" = queue.Queue(maxsize=queue_depth)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.commits = 0
+        self.rows = 0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="checkup-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, **checkup_kwargs) -> Future:
+        """Antrekan satu checkup (argumen sama dengan `crud.create_checkup`).
+
+        Raise `queue.Full` bila antrian penuh.
+        """
+        self.start()
+        future: Future = Future()
+        self._queue.put_nowait((checkup_kwargs, future))
+        return future
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Tulis semua yang masih antre lalu hentikan thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _collect(self) -> Tuple[List[Tuple[dict, Future]], bool]:
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[dict, Future]]) -> None:
+        db = self.session_factory()
+        try:
+            try:
+                checkups = crud.create_checkups_bulk(db, [kwargs for kwargs, _ in batch])
+            except Exception:
+                db.rollback()
+                # Satu baris rusak tidak boleh menggagalkan seluruh grup:
+                # ulangi per baris agar hanya baris itu yang error.
+                for kwargs, future in batch:
+                    try:
+                        checkup = crud.create_checkups_bulk(db, [kwargs])[0]
+                        # Lepas dari session: rollback baris berikutnya akan
+                        # meng-expire objek yang sudah di-commit ini.
+                        db.expunge(checkup)
+                        self.commits += 1
+                        self.rows += 1
+                        _resolve(future, checkup)
+                    except Exception as e:
+                        db.rollback()
+                        _resolve(future, error=e)
+                return
+            self.commits += 1
+            self.rows += len(batch)
+            for (_, future), checkup in zip(batch, checkups):
+                _resolve(future, checkup)
+        finally:
+            db.close()
+
+
+checkup_writer = CheckupWriter()
@@ -1,9 +1,57 @@
+import base64
+import json
+import threading
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from . import models, schemas
-from datetime import datetime
+from sqlalchemy import and_, func, literal, or_, select
+from . import models, patient_search, schemas
+from ml.cardio_model import SHAP_FEATURE_NAMES
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+# --- Pagination ---
+def encode_cursor(*values) -> str:
+    """Token halaman berikutnya (opaque bagi client) dari nilai kunci keyset."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(token: str) -> list:
+    """Kebalikan `encode_cursor`; raise ValueError untuk token rusak."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return values
+
+# --- Data version ---
+# Penghitung per cakupan data, naik setiap kali fungsi crud menulis data itu.
+# Cache baca (mis. st.cache_data di Streamlit) memakainya sebagai bagian key:
+# rerun tanpa perubahan tidak menyentuh database, dan tulisan hanya
+# membatalkan view yang datanya berubah. Berlaku per proses; tulisan dari
+# proses lain (mis. API) tetap butuh TTL di sisi cache.
+DATA_PATIENTS = "patients"
+DATA_CHECKUPS = "checkups"
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+
+def patient_checkups_scope(patient_id: int) -> str:
+    return f"{DATA_CHECKUPS}:{patient_id}"
+
+def bump_data_version(*scopes: str):
+    with _data_versions_lock:
+        for scope in scopes:
+            _data_versions[scope] = _data_versions.get(scope, 0) + 1
+
+def data_version(*scopes: str) -> Tuple[int, ...]:
+    return tuple(_data_versions.get(scope, 0) for scope in scopes)
 
 # --- User ---
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = db.query(models.User).order_by(models.User.id)
+    if after_id is not None:
+        return query.filter(models.User.id > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
@@ -27,24 +75,83 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_patient(db: Session, patient_id: int):
     return db.query(models.Patient).filter(models.Patient.id == patient_id).first()
 
-def get_patients(db: Session, skip: int = 0, limit: int = 100, name: str = None):
+def get_patients(db: Session, skip: int = 0, limit: int = 100, name: str = None, after_id: int = None):
+    """Pasien urut id; `name` hanya dicocokkan ke nama (bukan No RM).
+    Dengan `after_id` (keyset) `skip` diabaikan."""
     query = db.query(models.Patient)
     if name:
-        query = query.filter(models.Patient.full_name.contains(name))
-    return query.offset(skip).limit(limit).all()
+        query = query.filter(patient_search.match_clause(db, name, columns=("full_name",)))
+    if after_id is not None:
+        return query.filter(models.Patient.id > after_id).order_by(models.Patient.id).limit(limit).all()
+    return query.order_by(models.Patient.id).offset(skip).limit(limit).all()
 
-def search_patients(db: Session, q: str):
-    return db.query(models.Patient).filter(
-        or_(
-            models.Patient.full_name.contains(q),
-            models.Patient.medical_record_number.contains(q)
-        )
-    ).limit(20).all()
+def _patient_list_query(db: Session, q: str = None, gender: str = None):
+    query = db.query(models.Patient)
+    if q:
+        query = query.filter(patient_search.match_clause(db, q))
+    if gender:
+        query = query.filter(models.Patient.gender == gender)
+    return query
+
+def get_patient_list(db: Session, q: str = None, gender: str = None, limit: int = 10, before_id: int = None):
+    """Daftar pasien terbaru dulu (id DESC); `before_id` = id terakhir halaman sebelumnya."""
+    query = _patient_list_query(db, q, gender)
+    if before_id is not None:
+        query = query.filter(models.Patient.id < before_id)
+    return query.order_by(models.Patient.id.desc()).limit(limit).all()
+
+def count_patients(db: Session, q: str = None, gender: str = None):
+    return _patient_list_query(db, q, gender).order_by(None).with_entities(func.count(models.Patient.id)).scalar()
+
+def search_patients_page(db: Session, q: str, limit: int = 20, after: Tuple[float, int] = None):
+    """Pencarian nama / No RM berperingkat (prefix + fuzzy trigram) dengan keyset.
+
+    Return (patients, next_after); `next_after` = (score, id) untuk halaman
+    berikutnya, atau None bila ini halaman terakhir.
+    """
+    ranked = patient_search.ranked_search(db, q, limit=limit + 1, after=after)
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+    by_id = {p.id: p for p in db.query(models.Patient).filter(models.Patient.id.in_([pid for pid, _ in ranked])).all()}
+    patients = [by_id[pid] for pid, _ in ranked if pid in by_id]
+    next_after = (ranked[-1][1], ranked[-1][0]) if has_more else None
+    return patients, next_after
+
+def search_patients(db: Session, q: str, limit: int = 20):
+    return search_patients_page(db, q, limit=limit)[0]
+
+def latest_risk_category_subquery():
+    """Scalar subquery berkorelasi: risk_category checkup terbaru milik Patient."""
+    C = models.Checkup
+    return (
+        select(C.risk_category)
+        .where(C.patient_id == models.Patient.id)
+        .order_by(C.created_at.desc(), C.id.desc())
+        .limit(1)
+        .correlate(models.Patient)
+        .scalar_subquery()
+    )
+
+def get_patients_with_latest_risk(db: Session, q: str = None, skip: int = 0, limit: int = 20):
+    """Pasien (pencarian nama/No RM opsional) + kategori risiko checkup terakhir.
+
+    Satu statement; return list of (Patient, last_risk_category), kategori
+    None bila pasien belum pernah diperiksa. Tanpa `q` urut id, agar halaman
+    `skip`/`limit` stabil.
+    """
+    query = db.query(models.Patient, latest_risk_category_subquery().label("last_risk_category"))
+    if not q:
+        return query.order_by(models.Patient.id).offset(skip).limit(limit).all()
+    # Urutan mengikuti peringkat pencarian
+    ranked = [pid for pid, _ in patient_search.ranked_search(db, q, limit=skip + limit)][skip:]
+    rows = {p.id: (p, cat) for p, cat in query.filter(models.Patient.id.in_(ranked)).all()}
+    return [rows[pid] for pid in ranked if pid in rows]
 
 def create_patient(db: Session, patient: schemas.PatientCreate):
     db_patient = models.Patient(**patient.dict())
     db.add(db_patient)
     db.commit()
+    bump_data_version(DATA_PATIENTS)
     db.refresh(db_patient)
     return db_patient
 
@@ -54,6 +161,7 @@ def update_patient(db: Session, patient_id: int, patient_data: schemas.PatientCr
         for key, value in patient_data.dict().items():
             setattr(db_patient, key, value)
         db.commit()
+        bump_data_version(DATA_PATIENTS)
         db.refresh(db_patient)
     return db_patient
 
@@ -64,11 +172,13 @@ def delete_patient(db: Session, patient_id: int):
         # Assuming simple delete for now.
         db.delete(db_patient)
         db.commit()
+        # Checkup pasien ikut berubah (patient_id dilepas)
+        bump_data_version(DATA_PATIENTS, DATA_CHECKUPS, patient_checkups_scope(patient_id))
         return True
     return False
 
 # --- Checkup ---
-def create_checkup(db: Session, checkup: schemas.CheckupCreate, patient_id: int, probability: float, risk_label: int, risk_category: str, model_version: str, recommendations: str = None, shap_values: str = None):
+def create_checkup(db: Session, checkup: schemas.CheckupCreate, patient_id: int, probability: float, risk_label: int, risk_category: str, model_version: str, recommendations: str = None, shap_values: Dict[str, float] = None):
     db_checkup = models.Checkup(
         **checkup.dict(),
         patient_id=patient_id,
@@ -80,47 +190,129 @@ def create_checkup(db: Session, checkup: schemas.CheckupCreate, patient_id: int,
         shap_values=shap_values
     )
     db.add(db_checkup)
+    db.flush()
+    update_checkup_stats(db, [db_checkup])
     db.commit()
+    bump_data_version(DATA_CHECKUPS, patient_checkups_scope(patient_id))
     db.refresh(db_checkup)
     return db_checkup
 
-def get_checkups_by_patient(db: Session, patient_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Checkup).filter(models.Checkup.patient_id == patient_id).order_by(models.Checkup.created_at.desc()).offset(skip).limit(limit).all()
+def create_checkups_bulk(db: Session, rows: List[dict]):
+    """Insert many checkups in a single transaction.
+
+    Each row holds the keyword arguments of `create_checkup` (checkup, patient_id,
+    probability, ...). Returns the persisted checkups in input order.
+    """
+    db_checkups = []
+    for row in rows:
+        row = dict(row)
+        checkup = row.pop("checkup")
+        db_checkups.append(models.Checkup(**checkup.dict(exclude={"patient_id"}), **row))
+    db.add_all(db_checkups)
+    db.flush()
+    update_checkup_stats(db, db_checkups)
+    ids = [c.id for c in db_checkups]
+    scopes = {patient_checkups_scope(c.patient_id) for c in db_checkups}
+    db.commit()
+    bump_data_version(DATA_CHECKUPS, *scopes)
+    # Reload all rows in one SELECT instead of one refresh() per object
+    if ids:
+        db.query(models.Checkup).filter(models.Checkup.id.in_(ids)).all()
+    return db_checkups
+
+def get_checkups_by_patient(db: Session, patient_id: int, skip: int = 0, limit: int = 100, after: Tuple[datetime, int] = None):
+    """Riwayat checkup terbaru dulu. `after` = (created_at, id) baris terakhir
+    halaman sebelumnya (keyset); bila diberikan, `skip` diabaikan.
+
+    Batas keyset memakai nilai `created_at` yang tersimpan pada baris cursor
+    (lookup primary key), sehingga perbandingannya sama persis dengan ORDER BY
+    walaupun penulis lain menyimpan format string berbeda (mis. tanpa
+    mikrodetik di SQLite). `created_at` dari cursor hanya cadangan bila baris
+    itu sudah dihapus.
+    """
+    C = models.Checkup
+    query = db.query(C).filter(C.patient_id == patient_id).order_by(C.created_at.desc(), C.id.desc())
+    if after is not None:
+        created_at, checkup_id = after
+        stored = select(C.created_at).where(C.id == checkup_id).scalar_subquery()
+        boundary = func.coalesce(stored, literal(created_at, C.created_at.type))
+        query = query.filter(or_(C.created_at < boundary, and_(C.created_at == boundary, C.id < checkup_id)))
+        return query.limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def get_all_checkups(db: Session, limit: int = 1000):
     return db.query(models.Checkup).order_by(models.Checkup.created_at.desc()).limit(limit).all()
 
+# Kolom detail berukuran besar (teks) yang tidak perlu untuk tampilan tabel
+CHECKUP_DETAIL_COLUMNS = ("recommendations",) + models.SHAP_COLUMNS
+
+def get_checkup_report(db: Session, limit: int = 1000, with_details: bool = True):
+    """Checkup terbaru beserta nama & No RM pasien dalam satu query (outer join).
+
+    Mengembalikan `Result` berisi tuple kolom (bukan objek ORM), sehingga
+    pemanggil bisa membangun DataFrame langsung dari `result.keys()` dan
+    `result.fetchall()` tanpa lazy load relasi per baris.
+    """
+    return db.execute(checkup_report_statement(with_details).limit(limit))
+
+def checkup_report_statement(with_details: bool = True):
+    """SELECT laporan (checkup + nama & No RM pasien), terbaru dulu, tanpa limit."""
+    C, P = models.Checkup, models.Patient
+    columns = [col for col in C.__table__.columns if with_details or col.name not in CHECKUP_DETAIL_COLUMNS]
+    return (
+        select(*columns, P.full_name.label("patient_name"), P.medical_record_number)
+        .outerjoin(P, C.patient_id == P.id)
+        .order_by(C.created_at.desc())
+    )
+
 # --- Analytics ---
-def get_checkup_stats(db: Session):
-    total_patients = db.query(models.Patient).count()
-    total_checkups = db.query(models.Checkup).count()
-    
-    # Risk Distribution
-    risk_dist = db.query(
-        models.Checkup.risk_category, func.count(models.Checkup.id)
-    ).group_by(models.Checkup.risk_category).all()
-    
-    # Average Stats
-    avg_stats = db.query(
-        func.avg(models.Checkup.bmi).label('avg_bmi'),
-        func.avg(models.Checkup.map).label('avg_map'),
-        func.avg(models.Checkup.probability).label('avg_risk')
-    ).first()
-    
-    # Risk Factors Counts
-    smokers = db.query(models.Checkup).filter(models.Checkup.smoke == 1).count()
-    high_chol = db.query(models.Checkup).filter(models.Checkup.cholesterol >= 2).count()
-    diabetes = db.query(models.Checkup).filter(models.Checkup.gluc >= 2).count()
-    hypertension = db.query(models.Checkup).filter(models.Checkup.map > 105).count()
-    
+# Kategori keluaran CardioRiskModel dan ambang faktor risiko kartu dashboard
+RISK_CATEGORIES = ("Rendah", "Sedang", "Tinggi")
+HYPERTENSION_MAP = 105
+HIGH_CHOLESTEROL_LEVEL = 2
+DIABETES_GLUC_LEVEL = 2
+
+def scan_checkup_stats(db: Session):
+    """Statistik dashboard dihitung langsung dari tabel checkups (satu scan).
+
+    Dashboard membaca rollup lewat `get_checkup_stats`; fungsi ini dipakai
+    untuk memverifikasi rollup. Semua penghitung memakai conditional aggregation (COUNT ... FILTER) tanpa
+    GROUP BY, sehingga SQLite cukup membaca tiap baris sekali tanpa sort.
+    Kategori risiko di luar RISK_CATEGORIES (data lama / NULL) dihitung
+    terpisah hanya bila memang ada.
+    """
+    C = models.Checkup
+    row = db.query(
+        db.query(func.count(models.Patient.id)).scalar_subquery(),
+        func.count(C.id),
+        *[func.count(C.id).filter(C.risk_category == cat) for cat in RISK_CATEGORIES],
+        func.avg(C.bmi),
+        func.avg(C.map),
+        func.avg(C.probability),
+        func.count(C.id).filter(C.smoke == 1),
+        func.count(C.id).filter(C.cholesterol >= HIGH_CHOLESTEROL_LEVEL),
+        func.count(C.id).filter(C.gluc >= DIABETES_GLUC_LEVEL),
+        func.count(C.id).filter(C.map > HYPERTENSION_MAP),
+    ).one()
+    total_patients, total_checkups, *rest = row
+    per_category, rest = rest[:len(RISK_CATEGORIES)], rest[len(RISK_CATEGORIES):]
+    avg_bmi, avg_map, avg_risk, smokers, high_chol, diabetes, hypertension = rest
+
+    risk_dist = {cat: n for cat, n in zip(RISK_CATEGORIES, per_category) if n}
+    if sum(per_category) < total_checkups:
+        others = db.query(C.risk_category, func.count(C.id)).filter(
+            or_(C.risk_category.notin_(RISK_CATEGORIES), C.risk_category.is_(None))
+        ).group_by(C.risk_category).all()
+        risk_dist.update({k: v for k, v in others})
+
     return {
         "total_patients": total_patients,
         "total_checkups": total_checkups,
-        "risk_distribution": {k: v for k, v in risk_dist},
+        "risk_distribution": risk_dist,
         "averages": {
-            "bmi": avg_stats.avg_bmi or 0,
-            "map": avg_stats.avg_map or 0,
-            "risk": avg_stats.avg_risk or 0
+            "bmi": avg_bmi or 0,
+            "map": avg_map or 0,
+            "risk": avg_risk or 0
         },
         "risk_factors": {
             "Merokok": smokers,
@@ -129,3 +321,188 @@ def get_checkup_stats(db: Session):
             "Hipertensi": hypertension
         }
     }
+
+# --- Rollup (checkup_stats) ---
+# Kategori NULL disimpan sebagai "" karena risk_category bagian primary key.
+UNKNOWN_CATEGORY = ""
+ROLLUP_FIELDS = (
+    "n_checkups", "bmi_sum", "bmi_count", "map_sum", "map_count",
+    "probability_sum", "probability_count",
+    "smokers", "high_cholesterol", "diabetes", "hypertension",
+)
+
+def _rollup_deltas(checkups):
+    deltas = {}
+    for c in checkups:
+        key = (c.created_at.date(), c.risk_category or UNKNOWN_CATEGORY)
+        d = deltas.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        d["n_checkups"] += 1
+        for name in ("bmi", "map", "probability"):
+            value = getattr(c, name)
+            if value is not None:
+                d[f"{name}_sum"] += value
+                d[f"{name}_count"] += 1
+        d["smokers"] += c.smoke == 1
+        d["high_cholesterol"] += c.cholesterol is not None and c.cholesterol >= HIGH_CHOLESTEROL_LEVEL
+        d["diabetes"] += c.gluc is not None and c.gluc >= DIABETES_GLUC_LEVEL
+        d["hypertension"] += c.map is not None and c.map > HYPERTENSION_MAP
+    return deltas
+
+def update_checkup_stats(db: Session, checkups):
+    """Tambahkan checkup (sudah di-flush) ke rollup dalam transaksi yang sama.
+
+    Memakai INSERT .. ON CONFLICT DO UPDATE (SQLite & PostgreSQL) sehingga
+    penulis konkuren tidak saling menimpa. Dialek lain memakai read-modify-write.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+    table = models.CheckupStat.__table__
+    for (day, category), delta in _rollup_deltas(checkups).items():
+        if insert is None:
+            row = db.get(models.CheckupStat, (day, category))
+            if row is None:
+                row = models.CheckupStat(day=day, risk_category=category, **dict.fromkeys(ROLLUP_FIELDS, 0))
+                db.add(row)
+            for name, value in delta.items():
+                setattr(row, name, getattr(row, name) + value)
+            continue
+        stmt = insert(table).values(day=day, risk_category=category, **delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.risk_category],
+            set_={name: table.c[name] + stmt.excluded[name] for name in ROLLUP_FIELDS},
+        )
+        db.execute(stmt)
+
+def rebuild_checkup_stats(db: Session):
+    """Hitung ulang seluruh rollup dari tabel checkups (backfill). Return jumlah baris rollup."""
+    C = models.Checkup
+    day = func.date(C.created_at)
+    category = func.coalesce(C.risk_category, UNKNOWN_CATEGORY)
+    source = select(
+        day, category,
+        func.count(C.id),
+        func.coalesce(func.sum(C.bmi), 0), func.count(C.bmi),
+        func.coalesce(func.sum(C.map), 0), func.count(C.map),
+        func.coalesce(func.sum(C.probability), 0), func.count(C.probability),
+        func.count(C.id).filter(C.smoke == 1),
+        func.count(C.id).filter(C.cholesterol >= HIGH_CHOLESTEROL_LEVEL),
+        func.count(C.id).filter(C.gluc >= DIABETES_GLUC_LEVEL),
+        func.count(C.id).filter(C.map > HYPERTENSION_MAP),
+    ).where(C.created_at.isnot(None)).group_by(day, category)
+
+    table = models.CheckupStat.__table__
+    db.execute(table.delete())
+    db.execute(table.insert().from_select(["day", "risk_category", *ROLLUP_FIELDS], source))
+    db.commit()
+    return db.query(models.CheckupStat).count()
+
+def ensure_checkup_stats(db: Session):
+    """Backfill otomatis bila rollup masih kosong tetapi checkup sudah ada (DB lama)."""
+    has_rollup = db.query(db.query(models.CheckupStat).exists()).scalar()
+    if not has_rollup and db.query(db.query(models.Checkup).exists()).scalar():
+        rebuild_checkup_stats(db)
+
+def get_checkup_stats(db: Session):
+    """Statistik dashboard dari rollup checkup_stats: O(hari x kategori) baris."""
+    S = models.CheckupStat
+    rows = db.query(
+        S.risk_category,
+        *[func.sum(getattr(S, name)) for name in ROLLUP_FIELDS],
+    ).group_by(S.risk_category).all()
+    total_patients = db.query(func.count(models.Patient.id)).scalar()
+
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    risk_dist = {}
+    for category, *values in rows:
+        for name, value in zip(ROLLUP_FIELDS, values):
+            totals[name] += value or 0
+        if values[0]:
+            risk_dist[category if category != UNKNOWN_CATEGORY else None] = values[0]
+
+    return {
+        "total_patients": total_patients,
+        "total_checkups": totals["n_checkups"],
+        "risk_distribution": risk_dist,
+        "averages": _rollup_averages(totals),
+        "risk_factors": {
+            "Merokok": totals["smokers"],
+            "Kolesterol Tinggi": totals["high_cholesterol"],
+            "Diabetes": totals["diabetes"],
+            "Hipertensi": totals["hypertension"]
+        }
+    }
+
+def _rollup_averages(totals):
+    return {
+        "bmi": totals["bmi_sum"] / totals["bmi_count"] if totals["bmi_count"] else 0,
+        "map": totals["map_sum"] / totals["map_count"] if totals["map_count"] else 0,
+        "risk": totals["probability_sum"] / totals["probability_count"] if totals["probability_count"] else 0
+    }
+
+def get_checkup_timeseries(db: Session, start=None, end=None, risk_category: str = None):
+    """Statistik harian dari rollup, urut tanggal naik.
+
+    `start`/`end` (date, inklusif) membatasi rentang; `risk_category`
+    membatasi ke satu kategori.
+    """
+    S = models.CheckupStat
+    query = db.query(S)
+    if start is not None:
+        query = query.filter(S.day >= start)
+    if end is not None:
+        query = query.filter(S.day <= end)
+    if risk_category is not None:
+        query = query.filter(S.risk_category == risk_category)
+
+    days = {}
+    for row in query.order_by(S.day).all():
+        day = days.setdefault(row.day, {"totals": dict.fromkeys(ROLLUP_FIELDS, 0), "risk_distribution": {}})
+        for name in ROLLUP_FIELDS:
+            day["totals"][name] += getattr(row, name)
+        category = row.risk_category if row.risk_category != UNKNOWN_CATEGORY else None
+        day["risk_distribution"][category] = row.n_checkups
+
+    return [
+        {
+            "day": day,
+            "total_checkups": d["totals"]["n_checkups"],
+            "risk_distribution": d["risk_distribution"],
+            "averages": _rollup_averages(d["totals"]),
+            "risk_factors": {
+                "Merokok": d["totals"]["smokers"],
+                "Kolesterol Tinggi": d["totals"]["high_cholesterol"],
+                "Diabetes": d["totals"]["diabetes"],
+                "Hipertensi": d["totals"]["hypertension"]
+            }
+        }
+        for day, d in days.items()
+    ]
+
+def get_shap_impact(db: Session, start=None, end=None, risk_category: str = None):
+    """Rata-rata |SHAP| per fitur, dihitung di SQL dari kolom SHAP.
+
+    `start`/`end` (date, inklusif) membatasi tanggal checkup (UTC).
+    """
+    C = models.Checkup
+    query = db.query(
+        func.count(C.shap_map),
+        *[func.avg(func.abs(getattr(C, column))) for column in models.SHAP_COLUMNS],
+    )
+    if start is not None:
+        query = query.filter(C.created_at >= datetime.combine(start, time.min))
+    if end is not None:
+        query = query.filter(C.created_at < datetime.combine(end + timedelta(days=1), time.min))
+    if risk_category is not None:
+        query = query.filter(C.risk_category == risk_category)
+    n_explained, *means = query.one()
+    return {
+        "total_checkups": n_explained,
+        "mean_abs_shap": {
+            label: float(mean or 0) for label, mean in zip(SHAP_FEATURE_NAMES, means)
+        }
+    }
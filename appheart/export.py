@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+from typing import Iterator
+
+from sqlalchemy import Boolean, DateTime, Float, Integer
+
+from . import crud
+from .database import engine
+
+# Jumlah baris per fetch dari cursor database (dan per row group Parquet)
+EXPORT_CHUNK_ROWS = int(os.getenv("SIAGA_EXPORT_CHUNK_ROWS", "5000"))
+
+# format -> (media type, ekstensi file)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_report(fmt: str = "csv", with_details: bool = True, chunk_rows: int = EXPORT_CHUNK_ROWS, bind=engine):
+    """Byte laporan checkup lengkap dalam format `fmt`, ditulis per potongan."""
+    chunks = iter_report_chunks(with_details, chunk_rows, bind)
+    if fmt == "parquet":
+        return stream_parquet(chunks, with_details)
+    return stream_csv(chunks, with_details)
+
+
+def iter_report_chunks(with_details: bool = True, chunk_rows: int = EXPORT_CHUNK_ROWS, bind=engine):
+    """Yield (column_names, rows) per potongan laporan checkup.
+
+    `stream_results` meminta server-side cursor (PostgreSQL); di SQLite
+    baris memang diambil bertahap dari statement yang sedang berjalan.
+    Memori hanya sebesar satu potongan, berapa pun jumlah checkup.
+    """
+    with bind.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(
+            crud.checkup_report_statement(with_details)
+        )
+        columns = list(result.keys())
+        for rows in result.partitions(chunk_rows):
+            yield columns, rows
+
+
+def stream_csv(chunks, with_details: bool = True) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_report_columns(with_details))
+    for _, rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """File-like untuk ParquetWriter: byte yang ditulis diambil per potongan."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(with_details: bool = True):
+    import pyarrow as pa
+
+    fields = []
+    for column in crud.checkup_report_statement(with_details).selected_columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def stream_parquet(chunks, with_details: bool = True) -> Iterator[bytes]:
+    """Parquet inkremental: satu row group per potongan. Membutuhkan pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(with_details)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for _, rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _report_columns(with_details: bool = True):
+    return [column.name for column in crud.checkup_report_statement(with_details).selected_columns]
@@ -0,0 +1,159 @@
+"""Migrasi skema untuk database yang sudah ada (mis. siaga_heart_v3.db lama).
+
+`create_all` hanya membuat tabel yang belum ada, sehingga kolom & index baru
+pada tabel lama tidak ikut dibuat. `upgrade` melengkapinya (termasuk
+menyalin SHAP dari string JSON lama ke kolom `shap_*`); aman dijalankan
+berulang kali, juga oleh beberapa proses sekaligus (worker API + Streamlit
+saat start): seluruh pengecekan & perubahan berjalan dalam satu transaksi
+yang memegang kunci database, jadi proses berikutnya melihat skema yang
+sudah lengkap.
+
+Kolom JSON lama `shap_values` tidak dihapus oleh `upgrade`, agar kode versi
+sebelumnya masih bisa dijalankan (rollback). Hapus secara eksplisit setelah
+versi ini dipastikan stabil:
+
+    python -m appheart.migrate
+    python -m appheart.migrate --drop-legacy-shap
+"""
+import argparse
+import json
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+
+from . import models
+from .database import Base, engine
+from ml.cardio_model import SHAP_FEATURE_NAMES
+
+# Kolom lama berisi SHAP sebagai string JSON {label fitur: nilai}
+LEGACY_SHAP_COLUMN = "shap_values"
+BACKFILL_CHUNK_ROWS = 10000
+# Kunci advisory PostgreSQL yang menandai "upgrade sedang berjalan"
+PG_LOCK_KEY = 7248311
+# Berapa lama (detik) proses lain menunggu upgrade yang sedang berjalan
+LOCK_TIMEOUT = 600
+
+
+@contextmanager
+def _locked_transaction(bind):
+    """Koneksi dengan transaksi yang memegang kunci tulis database.
+
+    SQLite: `BEGIN IMMEDIATE` (DDL SQLite transaksional). PostgreSQL:
+    `pg_advisory_xact_lock`, dilepas saat commit/rollback.
+    """
+    with bind.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while True:
+                try:
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                    break
+                except OperationalError as e:
+                    # busy_timeout habis karena proses lain sedang upgrade
+                    if "locked" not in str(e) or time.monotonic() > deadline:
+                        raise
+                    conn.rollback()
+        elif conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PG_LOCK_KEY})
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def upgrade(bind=engine):
+    """Buat tabel, kolom & index yang belum ada. Return nama yang dibuat."""
+    with _locked_transaction(bind) as conn:
+        Base.metadata.create_all(bind=conn)
+        inspector = inspect(conn)
+        created = []
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    created.append(f"{table.name}.{column.name}")
+            if table.name == models.Checkup.__tablename__ and LEGACY_SHAP_COLUMN in existing_columns:
+                if _migrate_legacy_shap(conn):
+                    created.append(f"{table.name}.{LEGACY_SHAP_COLUMN} -> shap_*")
+
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                    created.append(index.name)
+        if created and conn.dialect.name == "sqlite":
+            # Statistik baru agar query planner SQLite mau memakai index tersebut
+            conn.execute(text("ANALYZE"))
+    return created
+
+
+def _migrate_legacy_shap(conn) -> int:
+    """Salin SHAP dari string JSON ke kolom `shap_*` untuk baris yang kolom
+    `shap_*`-nya masih kosong (belum disalin, atau ditulis kode versi lama
+    setelah rollback). Return jumlah baris yang mendapat nilai; JSON rusak
+    tetap kosong dan hanya diperiksa ulang."""
+    assignments = ", ".join(f"{column} = :{column}" for column in models.SHAP_COLUMNS)
+    update = text(f"UPDATE checkups SET {assignments} WHERE id = :id")
+    not_copied = " AND ".join(f"{column} IS NULL" for column in models.SHAP_COLUMNS)
+    last_id = 0
+    copied = 0
+    while True:
+        rows = conn.execute(
+            text(
+                f"SELECT id, {LEGACY_SHAP_COLUMN} FROM checkups "
+                f"WHERE id > :last_id AND {LEGACY_SHAP_COLUMN} IS NOT NULL AND {not_copied} "
+                f"ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_CHUNK_ROWS},
+        ).fetchall()
+        if not rows:
+            break
+        params = []
+        for checkup_id, raw in rows:
+            try:
+                values = json.loads(raw)
+            except ValueError:
+                values = None
+            if not isinstance(values, dict):
+                values = {}
+            params.append(dict(
+                {column: values.get(label) for label, column in zip(SHAP_FEATURE_NAMES, models.SHAP_COLUMNS)},
+                id=checkup_id,
+            ))
+        conn.execute(update, params)
+        copied += sum(any(p[column] is not None for column in models.SHAP_COLUMNS) for p in params)
+        last_id = rows[-1][0]
+    return copied
+
+
+def drop_legacy_shap(bind=engine) -> bool:
+    """Salin sisa SHAP JSON lalu hapus kolom `shap_values`. Setelah ini kode
+    versi sebelumnya tidak bisa lagi dijalankan. Return False bila kolom sudah
+    tidak ada."""
+    with _locked_transaction(bind) as conn:
+        columns = {col["name"] for col in inspect(conn).get_columns(models.Checkup.__tablename__)}
+        if LEGACY_SHAP_COLUMN not in columns:
+            return False
+        _migrate_legacy_shap(conn)
+        conn.execute(text(f"ALTER TABLE checkups DROP COLUMN {LEGACY_SHAP_COLUMN}"))
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drop-legacy-shap", action="store_true",
+                        help="hapus kolom JSON checkups.shap_values (tidak bisa rollback)")
+    args = parser.parse_args()
+
+    names = upgrade()
+    print(f"Schema changes: {', '.join(names)}" if names else "Schema up to date")
+    if args.drop_legacy_shap:
+        dropped = drop_legacy_shap()
+        print(f"Dropped checkups.{LEGACY_SHAP_COLUMN}" if dropped else f"checkups.{LEGACY_SHAP_COLUMN} already dropped")
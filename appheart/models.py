@@ -1,7 +1,28 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+import json
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
+from ml.cardio_model import FEATURE_COLUMNS, SHAP_FEATURE_NAMES
+
+# SHAP disimpan per fitur sebagai kolom float (bukan string JSON), dengan urutan
+# fitur CardioRiskModel: `shap_age_years`, `shap_gender`, ..., `shap_active`.
+# Dapat diagregasi langsung di SQL, mis. avg(abs(shap_map)) per bulan.
+SHAP_COLUMNS = tuple(f"shap_{name}" for name in FEATURE_COLUMNS)
+# Float presisi tunggal (REAL di PostgreSQL); SQLite selalu menyimpan REAL 8 byte
+ShapFloat = Float(precision=24)
+
+def shap_dict(row):
+    """{label fitur: nilai SHAP} dari objek/row yang punya kolom SHAP_COLUMNS."""
+    values = [getattr(row, column) for column in SHAP_COLUMNS]
+    if all(v is None for v in values):
+        return None
+    return {label: v for label, v in zip(SHAP_FEATURE_NAMES, values) if v is not None}
+
+def shap_json(row):
+    """Bentuk lama `shap_values`: string JSON {label fitur: nilai}."""
+    values = shap_dict(row)
+    return None if values is None else json.dumps(values)
 
 class User(Base):
     __tablename__ = "users"
@@ -58,8 +79,61 @@ class Checkup(Base):
 
     notes = Column(String, nullable=True)
     recommendations = Column(String, nullable=True)
-    shap_values = Column(String, nullable=True)
+    shap_age_years = Column(ShapFloat, nullable=True)
+    shap_gender = Column(ShapFloat, nullable=True)
+    shap_bmi = Column(ShapFloat, nullable=True)
+    shap_map = Column(ShapFloat, nullable=True)
+    shap_cholesterol = Column(ShapFloat, nullable=True)
+    shap_gluc = Column(ShapFloat, nullable=True)
+    shap_smoke = Column(ShapFloat, nullable=True)
+    shap_alco = Column(ShapFloat, nullable=True)
+    shap_active = Column(ShapFloat, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     patient = relationship("Patient", back_populates="checkups")
     checked_by = relationship("User", back_populates="checkups")
+
+    @property
+    def shap_values(self):
+        return shap_json(self)
+
+    @shap_values.setter
+    def shap_values(self, values):
+        # dict dari CardioRiskModel.get_shap_values, atau string JSON (format lama)
+        if isinstance(values, str):
+            values = json.loads(values)
+        values = values or {}
+        for label, column in zip(SHAP_FEATURE_NAMES, SHAP_COLUMNS):
+            setattr(self, column, values.get(label))
+
+    __table_args__ = (
+        # Riwayat per pasien & checkup terakhir (ORDER BY created_at DESC)
+        Index("ix_checkups_patient_id_created_at", "patient_id", created_at.desc(), id.desc()),
+        # Laporan / daftar checkup terbaru
+        Index("ix_checkups_created_at", "created_at"),
+    )
+
+class CheckupStat(Base):
+    """Rollup checkup per hari (UTC) dan kategori risiko.
+
+    Diperbarui di crud setiap checkup dibuat; bangun ulang dengan
+    `python -m appheart.rebuild_stats`.
+    """
+    __tablename__ = "checkup_stats"
+
+    day = Column(Date, primary_key=True)
+    risk_category = Column(String, primary_key=True)
+
+    n_checkups = Column(Integer, nullable=False, default=0)
+    bmi_sum = Column(Float, nullable=False, default=0.0)
+    bmi_count = Column(Integer, nullable=False, default=0)
+    map_sum = Column(Float, nullable=False, default=0.0)
+    map_count = Column(Integer, nullable=False, default=0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+    probability_count = Column(Integer, nullable=False, default=0)
+
+    # Faktor risiko (ambang di crud)
+    smokers = Column(Integer, nullable=False, default=0)
+    high_cholesterol = Column(Integer, nullable=False, default=0)
+    diabetes = Column(Integer, nullable=False, default=0)
+    hypertension = Column(Integer, nullable=False, default=0)
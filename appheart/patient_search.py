@@ -0,0 +1,168 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, column, or_, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Indeks pencarian pasien: tabel FTS5 (tokenizer trigram) dengan external
+# content `patients`, disinkronkan oleh trigger sehingga semua jalur tulis
+# (ORM, bulk insert, SQL mentah) ikut terindeks.
+FTS_TABLE = "patients_fts"
+MIN_TRIGRAM_QUERY = 3
+SEARCH_COLUMNS = ("full_name", "medical_record_number")
+
+# Peringkat bertingkat (score kecil = lebih relevan). bm25 FTS5 bernilai
+# negatif kecil, jadi jarak antar tingkat cukup besar agar tidak tumpang tindih.
+TIER_GAP = 100.0
+TIER_EXACT_MRN, TIER_PREFIX, TIER_SUBSTRING, TIER_FUZZY = 0, 1, 2, 3
+
+_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        full_name, medical_record_number,
+        content='patients', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_name, medical_record_number)
+        VALUES (new.id, new.full_name, new.medical_record_number);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, medical_record_number)
+        VALUES ('delete', old.id, old.full_name, old.medical_record_number);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF full_name, medical_record_number ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, medical_record_number)
+        VALUES ('delete', old.id, old.full_name, old.medical_record_number);
+        INSERT INTO {FTS_TABLE}(rowid, full_name, medical_record_number)
+        VALUES (new.id, new.full_name, new.medical_record_number);
+    END""",
+]
+
+# Engine URL yang sudah punya indeks FTS siap pakai
+_fts_ready = set()
+
+
+def ensure_search_index(engine) -> bool:
+    """Buat tabel FTS + trigger bila belum ada (backfill dari `patients`).
+
+    Return False bila database bukan SQLite atau FTS5/trigram tidak tersedia;
+    pencarian lalu memakai LIKE biasa.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).first()
+            for ddl in _SEARCH_DDL:
+                conn.execute(text(ddl))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError as e:
+        print(f"Warning: patient search index unavailable, falling back to LIKE: {e}")
+        return False
+    _fts_ready.add(str(engine.url))
+    return True
+
+
+def _use_fts(db: Session, q: str) -> bool:
+    # Trigram butuh minimal 3 karakter; query lebih pendek memakai LIKE
+    return len(q) >= MIN_TRIGRAM_QUERY and str(db.get_bind().url) in _fts_ready
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _name_trigrams(q: str) -> List[str]:
+    # Hanya kata alfabet: fuzzy untuk angka / No RM tidak bermakna
+    grams = []
+    for word in re.split(r"\s+", q.lower()):
+        if not word.isalpha():
+            continue
+        for i in range(len(word) - MIN_TRIGRAM_QUERY + 1):
+            gram = word[i:i + MIN_TRIGRAM_QUERY]
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+def match_clause(db: Session, q: str, columns: Tuple[str, ...] = SEARCH_COLUMNS):
+    """Filter `Patient` untuk `columns` (default nama / No RM) yang mengandung
+    `q` (case-insensitive).
+
+    Memakai indeks trigram bila tersedia, sama hasilnya dengan `contains`.
+    """
+    q = q.strip()
+    if not _use_fts(db, q):
+        return or_(*[getattr(models.Patient, name).contains(q) for name in columns])
+    ids = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_substring").bindparams(
+        fts_substring="{" + " ".join(columns) + "} : " + _quote(q)
+    )
+    return models.Patient.id.in_(ids.columns(column("rowid", Integer)))
+
+
+def ranked_search(
+    db: Session, q: str, limit: int = 20, after: Optional[Tuple[float, int]] = None
+) -> List[Tuple[int, float]]:
+    """(patient_id, score) terurut relevansi (score kecil = lebih relevan).
+
+    Tingkat: No RM persis sama, prefix nama, substring, lalu fuzzy (nama
+    berbagi trigram dengan query, mis. salah ketik). Dalam satu tingkat diurutkan
+    bm25. Kandidat fuzzy hanya dicari bila hasil substring belum memenuhi
+    satu halaman, karena query OR trigram jauh lebih mahal.
+    `after` = (score, id) baris terakhir halaman sebelumnya (keyset).
+    """
+    q = q.strip()
+    if not _use_fts(db, q):
+        query = db.query(models.Patient.id).filter(match_clause(db, q))
+        if after is not None:
+            query = query.filter(models.Patient.id > after[1])
+        return [(pid, 0.0) for pid, in query.order_by(models.Patient.id).limit(limit).all()]
+
+    needle = q.lower()
+    params = {
+        "needle": needle,
+        "prefix": re.sub(r"([\\%_])", r"\\\1", needle) + "%",
+        "gap": TIER_GAP,
+        "limit": limit,
+    }
+    keyset = ""
+    if after is not None:
+        keyset = "WHERE score > :after_score OR (score = :after_score AND id > :after_id)"
+        params["after_score"], params["after_id"] = after
+
+    name = "lower(coalesce(full_name, ''))"
+    mrn = "lower(coalesce(medical_record_number, ''))"
+    results = []
+    if after is None or after[0] < TIER_FUZZY * TIER_GAP:
+        tier = (
+            f"CASE WHEN {mrn} = :needle THEN {TIER_EXACT_MRN} "
+            f"WHEN {name} LIKE :prefix ESCAPE '\\' THEN {TIER_PREFIX} ELSE {TIER_SUBSTRING} END"
+        )
+        results = _ranked_query(db, tier, "", keyset, dict(params, fts_query=_quote(q)))
+    grams = _name_trigrams(q)
+    if len(results) < limit and grams:
+        # Fuzzy: nama yang berbagi trigram dengan query tetapi bukan substring
+        # (substring sudah masuk tingkat atas)
+        exclude = f"AND instr({name}, :needle) = 0 AND instr({mrn}, :needle) = 0"
+        fuzzy_query = "full_name : (" + " OR ".join(_quote(g) for g in grams) + ")"
+        fuzzy_params = dict(params, fts_query=fuzzy_query, limit=limit - len(results))
+        results += _ranked_query(db, str(TIER_FUZZY), exclude, keyset, fuzzy_params)
+    return results
+
+
+def _ranked_query(db: Session, tier: str, extra_where: str, keyset: str, params: dict) -> List[Tuple[int, float]]:
+    sql = f"""
+        SELECT id, score FROM (
+            SELECT rowid AS id, ({tier}) * :gap + bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query {extra_where}
+        )
+        {keyset}
+        ORDER BY score, id
+        LIMIT :limit
+    """
+    return [(row.id, row.score) for row in db.execute(text(sql), params)]
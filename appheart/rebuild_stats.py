@@ -0,0 +1,40 @@
+"""Bangun ulang rollup checkup_stats dari tabel checkups (backfill).
+
+    python -m appheart.rebuild_stats           # rebuild
+    python -m appheart.rebuild_stats --check   # bandingkan rollup vs scan penuh
+"""
+import argparse
+import math
+
+from . import crud, models
+from .database import SessionLocal, engine
+
+
+def rollup_matches_scan(db) -> bool:
+    rollup = crud.get_checkup_stats(db)
+    scan = crud.scan_checkup_stats(db)
+    averages_match = all(
+        math.isclose(rollup["averages"][k], scan["averages"][k], rel_tol=1e-9, abs_tol=1e-9)
+        for k in scan["averages"]
+    )
+    return averages_match and all(
+        rollup[k] == scan[k] for k in ("total_checkups", "risk_distribution", "risk_factors")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="hanya verifikasi, tanpa rebuild")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not args.check:
+            n_rows = crud.rebuild_checkup_stats(db)
+            print(f"Rebuilt checkup_stats: {n_rows} rows")
+        ok = rollup_matches_scan(db)
+        print("Rollup matches full scan" if ok else "Rollup differs from full scan; run without --check to rebuild")
+    finally:
+        db.close()
+    raise SystemExit(0 if ok else 1)
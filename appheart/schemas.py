@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 
 # --- User ---
 class UserBase(BaseModel):
@@ -40,6 +40,13 @@ class Patient(PatientBase):
     class Config:
         from_attributes = True
 
+class PatientWithRisk(Patient):
+    last_risk_category: Optional[str] = None
+
+class PatientSearchPage(BaseModel):
+    results: List[Patient]
+    next_cursor: Optional[str] = None
+
 # --- Checkup ---
 class CheckupBase(BaseModel):
     age_years: int
@@ -70,3 +77,31 @@ class Checkup(CheckupBase):
 
     class Config:
         from_attributes = True
+
+# --- Bulk ---
+class BulkRowError(BaseModel):
+    index: int
+    detail: str
+
+class CheckupBulkCreate(CheckupCreate):
+    patient_id: int
+
+class CheckupBulkResult(BaseModel):
+    index: int
+    checkup: Checkup
+
+class CheckupBulkResponse(BaseModel):
+    results: List[CheckupBulkResult]
+    errors: List[BulkRowError]
+
+# --- Stats ---
+class StatsDay(BaseModel):
+    day: date
+    total_checkups: int
+    risk_distribution: Dict[Optional[str], int]
+    averages: Dict[str, float]
+    risk_factors: Dict[str, int]
+
+class ShapImpact(BaseModel):
+    total_checkups: int
+    mean_abs_shap: Dict[str, float]
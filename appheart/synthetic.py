@@ -0,0 +1,394 @@
+"""Data sintetis (user, pasien, checkup) dalam jumlah besar untuk load test.
+
+Data dibuat per potongan pasien dengan `numpy.random.Generator`; setiap
+potongan punya stream sendiri dari `SeedSequence.spawn`, sehingga hasilnya
+sama berapa pun jumlah proses worker. Worker membuat data, penulisan memakai
+`executemany` (SQLite, satu penulis) atau `COPY` (PostgreSQL, langsung dari
+worker):
+
+    python -m appheart.synthetic --url sqlite:////tmp/siaga_load.db --patients 10000000 --workers 4
+
+Database aplikasi (`SIAGA_DATABASE_URL`) ditolak kecuali dengan `--allow-app-db`.
+"""
+import argparse
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from . import crud, models
+from .database import SQLALCHEMY_DATABASE_URL, build_engine
+from .migrate import upgrade
+from .patient_search import FTS_TABLE, ensure_search_index
+from ml.cardio_model import RISK_THRESHOLD_SEDANG, RISK_THRESHOLD_TINGGI
+
+CHUNK_PATIENTS = 50000
+DEFAULT_USERS = 50
+MODEL_VERSION = "synthetic"
+# Rentang tanggal checkup (UTC)
+START = np.datetime64("2023-01-01T00:00:00")
+SPAN_SECONDS = 2 * 365 * 86400
+
+FIRST_NAMES = np.array([
+    "Budi", "Siti", "Agus", "Dewi", "Rina", "Andi", "Sri", "Joko", "Putri", "Rudi",
+    "Wahyu", "Indah", "Eko", "Fitri", "Hendra", "Yuni", "Bambang", "Ratna", "Dedi", "Maya",
+    "Arif", "Nur", "Bayu", "Lina", "Taufik", "Ayu", "Rizky", "Wulan", "Fajar", "Sari",
+])
+LAST_NAMES = np.array([
+    "Santoso", "Wijaya", "Saputra", "Lestari", "Hidayat", "Pratama", "Kusuma", "Nugroho",
+    "Setiawan", "Susanto", "Gunawan", "Halim", "Siregar", "Nasution", "Harahap", "Simanjuntak",
+    "Sembiring", "Purba", "Wibowo", "Rahman", "Hakim", "Permana", "Utami", "Rahayu",
+])
+
+PATIENT_COLUMNS = (
+    "id", "medical_record_number", "full_name", "date_of_birth", "gender",
+    "phone", "is_active", "created_at", "updated_at",
+)
+CHECKUP_COLUMNS = (
+    "patient_id", "checked_by_user_id", "age_years", "gender", "bmi", "map", "cholesterol", "gluc",
+    "smoke", "alco", "active", "probability", "risk_label", "risk_category", "model_version", "created_at",
+)
+
+
+# Format penyimpanan DateTime SQLAlchemy di SQLite. Kolom dibandingkan sebagai
+# string, jadi format lain (mis. tanpa mikrodetik) merusak filter & keyset.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _timestamps(values) -> list:
+    """datetime64 -> string TIMESTAMP_FORMAT (detik penuh, mikrodetik .000000)."""
+    seconds = values.astype("datetime64[s]").astype("S19").view(np.uint8).reshape(-1, 19)
+    stamps = np.empty((len(seconds), 26), dtype=np.uint8)
+    stamps[:, :19] = seconds
+    stamps[:, 10] = ord(" ")
+    stamps[:, 19:] = np.frombuffer(b".000000", dtype=np.uint8)
+    return stamps.view("S26").ravel().astype("U26").tolist()
+
+
+def generate_users(n_users: int = DEFAULT_USERS, start_id: int = 1):
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    return [
+        (i, f"Nakes {i}", f"nakes{i}@siaga.test", "hashed_secret", "TENAGA_KESEHATAN", now, now)
+        for i in range(start_id, start_id + n_users)
+    ]
+
+
+def generate_patients(rng: np.random.Generator, start_id: int, n: int):
+    """Baris `patients` (tuple sesuai PATIENT_COLUMNS) + array pendukung untuk checkup."""
+    ids = np.arange(start_id, start_id + n)
+    gender_f = rng.random(n) < 0.5
+    # Usia 18-90 saat awal rentang checkup, terpusat di usia paruh baya
+    age = np.clip(rng.normal(50, 13, n), 18, 90)
+    birth = START - (age * 365.25 * 86400).astype("timedelta64[s]")
+    registered = START + rng.integers(0, SPAN_SECONDS // 4, n).astype("timedelta64[s]")
+    names = [
+        f"{a} {b}" for a, b in zip(
+            FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n)].tolist(),
+            LAST_NAMES[rng.integers(0, len(LAST_NAMES), n)].tolist(),
+        )
+    ]
+    phones = [f"08{p:010d}" for p in rng.integers(10 ** 9, 10 ** 10, n).tolist()]
+    created = _timestamps(registered)
+    rows = list(zip(
+        ids.tolist(),
+        [f"RM{i:09d}" for i in ids.tolist()],
+        names,
+        np.datetime_as_string(birth, unit="D").tolist(),
+        np.where(gender_f, "F", "M").tolist(),
+        phones,
+        [1] * n,
+        created,
+        created,
+    ))
+    return rows, {"id": ids, "gender_f": gender_f, "birth": birth, "registered": registered}
+
+
+def generate_checkups(rng: np.random.Generator, patients: dict, checkups_per_patient: float, user_ids):
+    """Baris `checkups` (tuple sesuai CHECKUP_COLUMNS) untuk satu potongan pasien.
+
+    Jumlah checkup per pasien ~ Poisson; fitur dan probabilitas risiko
+    mengikuti pola `cardio.generate_synthetic_data`. `user_ids` = (pertama,
+    terakhir) rentang ID pemeriksa.
+    """
+    counts = rng.poisson(checkups_per_patient, len(patients["id"]))
+    owner = np.repeat(np.arange(len(counts)), counts)
+    n = len(owner)
+    registered = patients["registered"][owner]
+    remaining = (START + np.timedelta64(SPAN_SECONDS, "s") - registered).astype(np.int64)
+    created = registered + (rng.random(n) * remaining).astype("timedelta64[s]")
+    age = ((created - patients["birth"][owner]).astype(np.int64) // int(365.25 * 86400)).astype(np.int64)
+    gender = np.where(patients["gender_f"][owner], 1, 2)
+
+    bmi = np.clip(rng.normal(27, 4.5, n), 16, 50).round(1)
+    map_val = np.clip(rng.normal(95 + (age - 50) * 0.4, 13), 60, 170).round(1)
+    cholesterol = rng.choice([1, 2, 3], n, p=[0.7, 0.2, 0.1])
+    gluc = rng.choice([1, 2, 3], n, p=[0.8, 0.15, 0.05])
+    smoke = (rng.random(n) < 0.2).astype(np.int64)
+    alco = (rng.random(n) < 0.1).astype(np.int64)
+    active = (rng.random(n) < 0.8).astype(np.int64)
+
+    score = (
+        -5.0 + (age / 60) ** 2 * 2.0 + (bmi / 30) * 1.5 + (map_val / 100) ** 1.5 * 2.5
+        + (cholesterol - 1) * 1.2 + (gluc - 1) * 0.8 + smoke * 0.8 + alco * 0.4 - active * 1.2
+        + smoke * (cholesterol > 1) + (bmi > 30) * (1 - active) + (age > 50) * (map_val > 120)
+    )
+    probability = 1 / (1 + np.exp(-score))
+    category = np.array(["Rendah", "Sedang", "Tinggi"])[
+        np.digitize(probability * 100, [RISK_THRESHOLD_SEDANG, RISK_THRESHOLD_TINGGI])
+    ]
+    return list(zip(
+        patients["id"][owner].tolist(),
+        rng.integers(user_ids[0], user_ids[1] + 1, n).tolist(),
+        age.tolist(),
+        gender.tolist(),
+        bmi.tolist(),
+        map_val.tolist(),
+        cholesterol.tolist(),
+        gluc.tolist(),
+        smoke.tolist(),
+        alco.tolist(),
+        active.tolist(),
+        probability.tolist(),
+        (probability >= 0.5).astype(np.int64).tolist(),
+        category.tolist(),
+        [MODEL_VERSION] * n,
+        _timestamps(created),
+    ))
+
+
+def generate_chunk(seed: np.random.SeedSequence, start_id: int, n_patients: int, checkups_per_patient: float, user_ids):
+    rng = np.random.default_rng(seed)
+    patient_rows, patients = generate_patients(rng, start_id, n_patients)
+    return patient_rows, generate_checkups(rng, patients, checkups_per_patient, user_ids)
+
+
+def insert_rows(raw_connection, dialect: str, table: str, columns, rows) -> None:
+    """Bulk insert lewat DBAPI: COPY untuk PostgreSQL, executemany selain itu."""
+    cursor = raw_connection.cursor()
+    try:
+        if dialect == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            marks = ", ".join("?" if dialect == "sqlite" else "%s" for _ in columns)
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+    finally:
+        cursor.close()
+
+
+def _write_chunk(engine, patient_rows, checkup_rows) -> None:
+    raw = engine.raw_connection()
+    try:
+        insert_rows(raw, engine.dialect.name, "patients", PATIENT_COLUMNS, patient_rows)
+        insert_rows(raw, engine.dialect.name, "checkups", CHECKUP_COLUMNS, checkup_rows)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _secondary_indexes():
+    """Index non-unik `patients` / `checkups`: dihapus selama load lalu dibuat ulang.
+
+    Membangun index sekali dari data yang sudah ada jauh lebih murah daripada
+    memperbaruinya per baris (terutama `created_at` yang acak).
+    """
+    return [
+        index
+        for table in (models.Patient.__table__, models.Checkup.__table__)
+        for index in table.indexes
+        if not index.unique
+    ]
+
+
+def _has_fts(conn) -> bool:
+    return conn.dialect.name == "sqlite" and conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first() is not None
+
+
+_worker_engine = None
+
+
+def _generate_and_write(url, *chunk_args):
+    # Server DB: setiap worker menulis sendiri (COPY paralel)
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = build_engine(url)
+    patient_rows, checkup_rows = generate_chunk(*chunk_args)
+    _write_chunk(_worker_engine, patient_rows, checkup_rows)
+    return len(patient_rows), len(checkup_rows)
+
+
+class _InlinePool:
+    """Pengganti executor untuk `workers <= 1`: jalan di proses ini, tanpa pickle."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def _pool(workers: int):
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlinePool()
+
+
+def _bounded_map(pool, fn, args_list, depth: int):
+    """Seperti `pool.map` (urutan terjaga) tetapi maksimal `depth` potongan
+    sedang diproses, agar hasil tidak menumpuk di memori saat penulis lebih lambat."""
+    pending = deque()
+    for args in args_list:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _is_app_database(url: str) -> bool:
+    target, app = make_url(url), make_url(SQLALCHEMY_DATABASE_URL)
+    if target.get_backend_name() == app.get_backend_name() == "sqlite":
+        return bool(target.database) and bool(app.database) and (
+            os.path.realpath(target.database) == os.path.realpath(app.database)
+        )
+    return target.render_as_string(hide_password=False) == app.render_as_string(hide_password=False)
+
+
+def populate(
+    url: str,
+    n_patients: int = 100000,
+    checkups_per_patient: float = 3.0,
+    n_users: int = DEFAULT_USERS,
+    seed: int = 0,
+    workers: int = 1,
+    chunk_patients: int = CHUNK_PATIENTS,
+    allow_app_db: bool = False,
+):
+    """Tambahkan user, pasien dan checkup sintetis ke database `url`.
+
+    ID pasien dilanjutkan dari ID terbesar yang ada. Rollup `checkup_stats`
+    dibangun ulang di akhir. Index non-unik dilepas selama load, jadi jangan
+    dijalankan pada database yang sedang melayani aplikasi; database
+    `SIAGA_DATABASE_URL` ditolak kecuali `allow_app_db=True`.
+    Return (n_patients, n_checkups, detik).
+    """
+    if _is_app_database(url) and not allow_app_db:
+        raise ValueError(f"Refusing to load synthetic data into the application database {url}")
+    engine = build_engine(url)
+    upgrade(engine)
+    with engine.connect() as conn:
+        first_patient = (conn.execute(func.max(models.Patient.id).select()).scalar() or 0) + 1
+        first_user = (conn.execute(func.max(models.User.id).select()).scalar() or 0) + 1
+    raw = engine.raw_connection()
+    try:
+        insert_rows(raw, engine.dialect.name, "users",
+                    ("id", "name", "email", "password_hash", "role", "created_at", "updated_at"),
+                    generate_users(n_users, first_user))
+        raw.commit()
+    finally:
+        raw.close()
+    user_ids = (first_user, first_user + n_users - 1)
+
+    starts = range(first_patient, first_patient + n_patients, chunk_patients)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    chunks = [
+        (s, start, min(chunk_patients, first_patient + n_patients - start), checkups_per_patient, user_ids)
+        for s, start in zip(seeds, starts)
+    ]
+
+    started = time.perf_counter()
+    indexes = _secondary_indexes()
+    with engine.begin() as conn:
+        fts = _has_fts(conn)
+        if fts:
+            # Trigger per baris diganti satu INSERT ... SELECT setelah load
+            conn.execute(text("DROP TRIGGER IF EXISTS patients_fts_ai"))
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+
+    total_patients = total_checkups = 0
+    depth = 2 * workers if workers > 1 else 1
+    single_writer = engine.dialect.name == "sqlite"
+    try:
+        if single_writer:
+            # SQLite hanya punya satu penulis: worker membuat data, proses ini menulis
+            with _pool(workers) as pool:
+                for patient_rows, checkup_rows in _bounded_map(pool, generate_chunk, chunks, depth):
+                    _write_chunk(engine, patient_rows, checkup_rows)
+                    total_patients += len(patient_rows)
+                    total_checkups += len(checkup_rows)
+        else:
+            with _pool(workers) as pool:
+                for n_p, n_c in _bounded_map(pool, _generate_and_write, [(url, *c) for c in chunks], depth):
+                    total_patients += n_p
+                    total_checkups += n_c
+    finally:
+        # Juga saat load gagal di tengah: index & FTS tetap lengkap
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn, checkfirst=True)
+            if fts:
+                conn.execute(
+                    text(f"INSERT INTO {FTS_TABLE}(rowid, full_name, medical_record_number) "
+                         "SELECT id, full_name, medical_record_number FROM patients WHERE id >= :first"),
+                    {"first": first_patient},
+                )
+    if fts:
+        ensure_search_index(engine)
+    if engine.dialect.name == "postgresql":
+        # ID diisi eksplisit, jadi sequence SERIAL perlu disusulkan
+        with engine.begin() as conn:
+            for table in ("users", "patients"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                ))
+    seconds = time.perf_counter() - started
+
+    db = sessionmaker(bind=engine)()
+    try:
+        crud.rebuild_checkup_stats(db)
+    finally:
+        db.close()
+    if single_writer:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    engine.dispose()
+    return total_patients, total_checkups, seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Isi database dengan data sintetis untuk load test")
+    parser.add_argument("--url", required=True, help="database tujuan, mis. sqlite:////tmp/siaga_load.db")
+    parser.add_argument("--allow-app-db", action="store_true", help="izinkan menulis ke SIAGA_DATABASE_URL")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--checkups-per-patient", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=CHUNK_PATIENTS)
+    args = parser.parse_args()
+
+    try:
+        n_p, n_c, seconds = populate(
+            args.url, args.patients, args.checkups_per_patient, args.users, args.seed, args.workers, args.chunk,
+            allow_app_db=args.allow_app_db,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Inserted {n_p:,} patients + {n_c:,} checkups in {seconds:.1f} s "
+          f"({(n_p + n_c) / seconds:,.0f} rows/s)")
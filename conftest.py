@@ -0,0 +1,8 @@
+"""Pytest: aplikasi memakai database SQLite sementara, bukan siaga_heart_v3.db.
+
+Harus di-set sebelum `appheart.database` diimpor oleh modul test mana pun.
+"""
+import os
+import tempfile
+
+os.environ["SIAGA_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='siaga-test-')}/siaga_test.db"
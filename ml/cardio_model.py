@@ -1,108 +1,557 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
 
-import joblib
 import numpy as np
-import sklearn.utils.validation
 
-# Monkey patch for scikit-learn >= 1.6 compatibility
-# Fixes: ImportError: cannot import name '_is_pandas_df' from 'sklearn.utils.validation'
-if not hasattr(sklearn.utils.validation, "_is_pandas_df"):
-    def _is_pandas_df(X):
-        return hasattr(X, "dtypes") and hasattr(X, "columns")
-    sklearn.utils.validation._is_pandas_df = _is_pandas_df
+from ml.compiled_trees import BOOSTER_PATH, TREES_PATH, CompiledTreeEnsemble, random_feature_matrix
+from ml.lookup_engine import build_lookup_engine
+from ml.prediction_cache import PredictionCache
+from ml.tree_shap import build_explainer
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _patch_sklearn_compat() -> None:
+    # Monkey patch for scikit-learn >= 1.6 compatibility
+    # Fixes: ImportError: cannot import name '_is_pandas_df' from 'sklearn.utils.validation'
+    # Dipanggil sebelum unpickle pipeline / import shap, bukan saat import modul,
+    # supaya mode "slim" tidak perlu memuat scikit-learn sama sekali.
+    import sklearn.utils.validation
+
+    if not hasattr(sklearn.utils.validation, "_is_pandas_df"):
+        def _is_pandas_df(X):
+            return hasattr(X, "dtypes") and hasattr(X, "columns")
+        sklearn.utils.validation._is_pandas_df = _is_pandas_df
 
 # Lokasi file model (pipeline XGBoost) yang sudah Anda train sebelumnya.
 MODEL_PATH = Path(__file__).resolve().parent / "best_xgb_pipeline.joblib"
+METADATA_PATH = Path(__file__).resolve().parent / "model_metadata.json"
+DEFAULT_MODEL_VERSION = "xgb_v1.0.0"
 
+# "pipeline": muat best_xgb_pipeline.joblib (butuh imblearn/sklearn).
+# "slim": muat ekspor xgb_trees.npz saja (hanya NumPy); SHAP memakai
+# xgb_booster.ubj dan baru dimuat saat pertama kali dibutuhkan.
+MODEL_FORMAT = os.getenv("SIAGA_MODEL_FORMAT", "pipeline")
 
-class CardioRiskModel:
-    """Wrapper sederhana untuk pipeline XGBoost penyakit jantung.
+# Fast path evaluator pohon hanya dipakai bila hasilnya identik (toleransi float)
+# dengan pipeline pada sejumlah input acak saat model dimuat.
+FAST_PATH_CHECK_ROWS = 512
+FAST_PATH_TOLERANCE = 1e-5
+# Di atas ukuran ini inplace_predict XGBoost (C++, multi-thread) lebih cepat
+# daripada evaluator NumPy.
+FAST_PATH_MAX_ROWS = 16
 
-    Asumsi fitur input (urutan kolom) konsisten dengan saat training, misalnya:
-    ['age_years','gender','bmi','map','cholesterol','gluc','smoke','alco','active']
+# Lookup engine opsional: seluruh kisi fitur dihitung di depan (~76 MB, ~3 s
+# saat load) sehingga predict_proba cukup berupa indexing tabel.
+USE_LOOKUP_ENGINE = os.getenv("SIAGA_LOOKUP_ENGINE", "0") == "1"
+LOOKUP_VERIFY_ROWS = 20000
+
+# Cache prediksi + SHAP per vektor fitur (0 = nonaktif). Key memakai fitur
+# dalam float32, presisi yang juga dipakai XGBoost, sehingga hit selalu
+# memberi hasil yang sama dengan menghitung ulang.
+CACHE_SIZE = int(os.getenv("SIAGA_PREDICTION_CACHE_SIZE", "4096"))
+CACHE_TTL = float(os.getenv("SIAGA_PREDICTION_CACHE_TTL", "3600"))
+# Batch lebih besar dari ini (ekspor, analitik) tidak lewat cache.
+CACHE_MAX_ROWS = 256
+# Seberapa sering (detik) file model dicek untuk perubahan.
+MODEL_FILE_CHECK_INTERVAL = 1.0
+# Setelah gagal memuat model, percobaan berikutnya ditunda selama ini (detik)
+# supaya request beruntun tidak mengulang joblib.load yang pasti gagal.
+MODEL_RETRY_INTERVAL = float(os.getenv("SIAGA_MODEL_RETRY_INTERVAL", "5"))
+
+# Batas kategori risiko (dalam persen probabilitas).
+RISK_THRESHOLD_SEDANG = 30
+RISK_THRESHOLD_TINGGI = 60
+
+# Urutan kolom fitur yang dipakai saat training (lihat cardio.py).
+FEATURE_COLUMNS = [
+    "age_years",
+    "gender",
+    "bmi",
+    "map",
+    "cholesterol",
+    "gluc",
+    "smoke",
+    "alco",
+    "active",
+]
+
+# Label fitur (Bahasa Indonesia) untuk output SHAP, urutan sama dengan FEATURE_COLUMNS.
+SHAP_FEATURE_NAMES = ['Usia', 'Gender', 'BMI', 'MAP', 'Kolesterol', 'Glukosa', 'Rokok', 'Alkohol', 'Aktif']
+
+# Input dummy untuk warm-up (bukan data pasien).
+WARM_UP_ROW = dict(age_years=50, gender=2, bmi=28.0, map=110.0, cholesterol=2, gluc=1, smoke=0, alco=0, active=1)
+
+# Input batch yang diterima oleh *_batch: list of dict, pandas DataFrame,
+# atau NumPy array 2-D dengan kolom sesuai FEATURE_COLUMNS.
+BatchInput = Union[Iterable[Dict], "pd.DataFrame", np.ndarray]
+
+
+def extract_classifier(pipeline):
+    """Ambil estimator XGBoost dari pipeline (step 'classifier') atau pipeline itu sendiri."""
+    if hasattr(pipeline, 'named_steps') and 'classifier' in pipeline.named_steps:
+        return pipeline.named_steps['classifier']
+    return pipeline
+
+
+def risk_category(proba: float) -> str:
+    """Kategori risiko (Rendah/Sedang/Tinggi) dari probabilitas 0-1."""
+    risk_percent = proba * 100
+    if risk_percent < RISK_THRESHOLD_SEDANG:
+        return "Rendah"
+    elif risk_percent < RISK_THRESHOLD_TINGGI:
+        return "Sedang"
+    return "Tinggi"
+
+
+@dataclass(frozen=True)
+class RiskPrediction:
+    """Hasil satu kali inferensi: probabilitas, label, kategori dan versi model."""
+
+    probability: float
+    label: int
+    risk_category: str
+    model_version: str
+
+
+def _read_model_version() -> str:
+    try:
+        with open(METADATA_PATH, "r") as f:
+            return json.load(f).get("model_version", DEFAULT_MODEL_VERSION)
+    except (OSError, ValueError):
+        return DEFAULT_MODEL_VERSION
+
+
+def _model_fingerprint():
+    path = TREES_PATH if MODEL_FORMAT == "slim" else MODEL_PATH
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+class LoadedModel:
+    """Semua artefak satu versi model: pipeline/pohon, fast path, lookup,
+    TreeSHAP dan cache prediksinya.
+
+    Dibangun lengkap sebelum dipakai dan tidak diubah sesudahnya (kecuali
+    explainer SHAP yang dibuat lazy), sehingga reload cukup mengganti satu
+    referensi dan setiap request memakai satu versi yang konsisten.
     """
 
-    _instance = None
-    _init_success = False
+    def __init__(self):
+        # Diambil sebelum file dibaca: bila file berubah selama load, pengecekan
+        # berikutnya akan memuat ulang lagi.
+        self.fingerprint = _model_fingerprint()
+        self.model_version = _read_model_version()
+        self._explainer = None
+        self._explainer_ready = False
+        self._explainer_lock = threading.Lock()
+        self.pipeline = None
+        self.model_obj = None
+        self.booster = None
+        self.iteration_range = (0, 0)
+        self.fast_trees = None
+        if MODEL_FORMAT == "slim":
+            self._load_slim()
+        else:
+            self._load_pipeline()
+        self.lookup = self._init_lookup_engine() if USE_LOOKUP_ENGINE else None
+        # Tabel path TreeSHAP dihitung sekali di sini (lihat ml/tree_shap.py)
+        self.tree_explainer = build_explainer(self.fast_trees, len(FEATURE_COLUMNS))
+        self.cache = PredictionCache(CACHE_SIZE, CACHE_TTL) if CACHE_SIZE > 0 else None
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None or not cls._init_success:
-            # Create a new instance
-            instance = super().__new__(cls)
-            try:
-                instance._load_model()
-                cls._instance = instance
-                cls._init_success = True
-            except Exception as e:
-                # If loading fails, do not save instance
-                cls._instance = None
-                cls._init_success = False
-                raise e
-        return cls._instance
+    def _init_lookup_engine(self):
+        engine = build_lookup_engine(self.fast_trees, len(FEATURE_COLUMNS))
+        if engine is None:
+            return None
+        # Mode verifikasi: bandingkan dengan evaluator pohon (yang sudah
+        # dicek terhadap pipeline) pada input acak + nilai tepat di threshold.
+        err = engine.verify(self.fast_trees.predict_proba, n_rows=LOOKUP_VERIFY_ROWS)
+        if err > FAST_PATH_TOLERANCE:
+            print(f"Warning: lookup engine differs from trees (max error {err:.2e}), disabled")
+            return None
+        return engine
 
-    def _load_model(self) -> None:
+    def _load_pipeline(self) -> None:
         if not MODEL_PATH.exists():
             raise FileNotFoundError(
                 f"Model file tidak ditemukan di {MODEL_PATH}. "
                 "Pastikan Anda sudah meletakkan best_xgb_pipeline.joblib di folder ml/."
             )
+        import joblib
+
+        _patch_sklearn_compat()
         self.pipeline = joblib.load(MODEL_PATH)
-        
-        # Initialize SHAP Explainer
+        self.model_obj = extract_classifier(self.pipeline)
+        self._init_fast_paths()
+
+    def _load_slim(self) -> None:
+        if not TREES_PATH.exists():
+            raise FileNotFoundError(
+                f"Artefak slim tidak ditemukan di {TREES_PATH}. "
+                "Jalankan `python -m ml.compiled_trees` untuk mengekspornya."
+            )
+        self.fast_trees = CompiledTreeEnsemble.load(TREES_PATH)
+
+    @property
+    def explainer(self):
+        """SHAP TreeExplainer, dibangun saat pertama kali dipakai."""
+        if not self._explainer_ready:
+            with self._explainer_lock:
+                if not self._explainer_ready:
+                    self._explainer = self._build_explainer()
+                    self._explainer_ready = True
+        return self._explainer
+
+    def _build_explainer(self):
         # Assuming the pipeline has a step named 'classifier' or is just the model
         # If it's a pipeline, we need to handle the preprocessor separately if it exists
         try:
+            _patch_sklearn_compat()
             import shap
-            # Try to get the actual model object
-            if hasattr(self.pipeline, 'named_steps') and 'classifier' in self.pipeline.named_steps:
-                self.model_obj = self.pipeline.named_steps['classifier']
-            else:
-                self.model_obj = self.pipeline
-                
-            self.explainer = shap.TreeExplainer(self.model_obj)
+
+            model_obj = self.model_obj
+            if model_obj is None:
+                import xgboost
+
+                model_obj = xgboost.Booster(model_file=str(BOOSTER_PATH))
+            return shap.TreeExplainer(model_obj)
         except Exception as e:
             print(f"Warning: SHAP initialization failed: {e}")
-            self.explainer = None
+            return None
+
+    def _init_fast_paths(self) -> None:
+        """Siapkan jalur inferensi tanpa validasi sklearn/imblearn.
+
+        - `fast_trees`: evaluator pohon NumPy, untuk batch kecil (per request).
+        - `booster`: `Booster.inplace_predict` XGBoost, untuk batch besar.
+        Keduanya hanya aktif bila pipeline tidak punya transformer selain
+        sampler (SMOTE hanya berjalan saat fit) dan hasilnya identik dengan
+        `pipeline.predict_proba` dalam toleransi float.
+        """
+        steps = getattr(self.pipeline, "steps", [])[:-1]
+        if any(not hasattr(step, "fit_resample") for _, step in steps):
+            return
+
+        X_check = random_feature_matrix(FAST_PATH_CHECK_ROWS)
+        expected = self.pipeline.predict_proba(X_check)[:, 1]
+        try:
+            booster = self.model_obj.get_booster()
+            best_iteration = booster.attr("best_iteration")
+            iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+            if np.max(np.abs(booster.inplace_predict(X_check, iteration_range=iteration_range) - expected)) <= FAST_PATH_TOLERANCE:
+                self.booster = booster
+                self.iteration_range = iteration_range
+        except Exception as e:
+            print(f"Warning: booster inplace_predict unavailable: {e}")
+
+        try:
+            if TREES_PATH.exists() and TREES_PATH.stat().st_mtime >= MODEL_PATH.stat().st_mtime:
+                ensemble = CompiledTreeEnsemble.load(TREES_PATH)
+            else:
+                ensemble = CompiledTreeEnsemble.from_booster(self.model_obj)
+            err = float(np.max(np.abs(ensemble.predict_proba(X_check) - expected)))
+        except Exception as e:
+            print(f"Warning: compiled tree fast path unavailable: {e}")
+            return
+        if err > FAST_PATH_TOLERANCE:
+            print(f"Warning: compiled trees differ from pipeline (max error {err:.2e}), fast path disabled")
+            return
+        self.fast_trees = ensemble
+
+    def predict_uncached(self, X: np.ndarray) -> np.ndarray:
+        if self.lookup is not None and not np.isnan(X).any():
+            return self.lookup.predict_proba(X)
+        if self.fast_trees is not None and (X.shape[0] <= FAST_PATH_MAX_ROWS or self.pipeline is None):
+            return self.fast_trees.predict_proba(X)
+        if self.booster is not None:
+            return self.booster.inplace_predict(X, iteration_range=self.iteration_range).astype(float)
+        return self.pipeline.predict_proba(X)[:, 1].astype(float)
+
+    def shap_uncached(self, X: np.ndarray) -> Optional[np.ndarray]:
+        if self.tree_explainer is not None:
+            return self.tree_explainer.shap_values(X)
+        if not self.explainer:
+            return None
+
+        # Note: If there's a preprocessor, X should be transformed first. 
+        # Assuming simple pipeline for now or that X matches model input.
+        shap_values = self.explainer.shap_values(X)
+        
+        # Handle different SHAP output formats (list for multiclass, array for binary)
+        if isinstance(shap_values, list):
+            shap_values = shap_values[1] # Positive class
+        return np.asarray(shap_values, dtype=float)
+
+    def cached(self, X: np.ndarray, field: str, compute) -> Optional[np.ndarray]:
+        """Ambil `field` per baris dari cache, hitung hanya baris yang miss."""
+        if self.cache is None or X.shape[0] > CACHE_MAX_ROWS:
+            return compute(X)
+        keys = [(self.model_version, row.tobytes()) for row in X.astype(np.float32)]
+        values = [self.cache.get(key, field) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            computed = compute(X[missing])
+            if computed is None:
+                return None
+            for i, value in zip(missing, computed):
+                values[i] = value
+                self.cache.update(keys[i], **{field: value})
+        return np.array(values, dtype=float)
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        return self.cached(X, "proba", self.predict_uncached)
+
+    def shap_matrix(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """SHAP values (n_rows, 9) kelas positif, atau None bila tidak ada explainer."""
+        return self.cached(X, "shap", self.shap_uncached)
+
+
+class CardioRiskModel:
+    """Wrapper sederhana untuk pipeline XGBoost penyakit jantung.
+
+    Asumsi fitur input (urutan kolom) konsisten dengan saat training, misalnya:
+    ['age_years','gender','bmi','map','cholesterol','gluc','smoke','alco','active']
+
+    Artefak model ada di `LoadedModel` (`self._state`). Setiap panggilan
+    membaca `_state` sekali, jadi reload (penggantian satu referensi) tidak
+    pernah mencampur probabilitas model lama dengan SHAP model baru.
+    """
+
+    # Satu instance per proses, dipakai bersama semua sesi Streamlit / worker API.
+    _instance = None
+    _init_success = False
+    _instance_lock = threading.Lock()
+    _reload_lock = threading.Lock()
+    _load_error: Optional[Exception] = None
+    _load_failed_at = 0.0
+    _load_seconds: Optional[float] = None
+
+    def __new__(cls, *args, **kwargs):
+        instance = cls._instance
+        if instance is not None:
+            return instance
+        # Hanya satu thread yang memuat; thread lain menunggu lalu memakai hasilnya
+        with cls._instance_lock:
+            if cls._instance is not None:
+                return cls._instance
+            error = cls._load_error
+            if error is not None and time.monotonic() - cls._load_failed_at < MODEL_RETRY_INTERVAL:
+                raise error.with_traceback(None)
+            instance = super().__new__(cls)
+            started = time.perf_counter()
+            try:
+                instance._state = LoadedModel()
+            except Exception as e:
+                # Jangan simpan instance setengah jadi; coba lagi setelah interval
+                cls._load_error = e
+                cls._load_failed_at = time.monotonic()
+                raise
+            instance.warm_up_seconds = None
+            instance._fingerprint_checked = time.monotonic()
+            cls._load_seconds = time.perf_counter() - started
+            cls._load_error = None
+            cls._instance = instance
+            cls._init_success = True
+        return instance
+
+    # Akses baca ke artefak versi yang sedang aktif
+    @property
+    def model_version(self) -> str:
+        return self._state.model_version
+
+    @property
+    def pipeline(self):
+        return self._state.pipeline
+
+    @property
+    def fast_trees(self) -> Optional[CompiledTreeEnsemble]:
+        return self._state.fast_trees
+
+    @property
+    def lookup(self):
+        return self._state.lookup
+
+    @property
+    def cache(self) -> Optional[PredictionCache]:
+        return self._state.cache
+
+    @property
+    def explainer(self):
+        return self._state.explainer
+
+    def _current(self) -> LoadedModel:
+        self._check_model_file()
+        return self._state
+
+    def _check_model_file(self) -> None:
+        """Muat ulang model bila file model berubah.
+
+        Versi baru (termasuk cache kosongnya) dibangun di samping versi lama;
+        request lain tetap dilayani versi lama sampai `_state` diganti.
+        """
+        now = time.monotonic()
+        if now - self._fingerprint_checked < MODEL_FILE_CHECK_INTERVAL:
+            return
+        self._fingerprint_checked = now
+        if _model_fingerprint() == self._state.fingerprint:
+            return
+        # Hanya satu thread yang memuat ulang; yang lain tidak menunggu
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            if _model_fingerprint() == self._state.fingerprint:
+                return
+            self._state = LoadedModel()
+        except Exception as e:
+            # File mungkin sedang ditulis; coba lagi pada pengecekan berikutnya
+            print(f"Warning: model reload failed: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def warm_up(self) -> float:
+        """Satu prediksi + SHAP dummy, agar request pertama tidak membayar
+        inisialisasi lazy (explainer SHAP, buffer NumPy). Return detik."""
+        started = time.perf_counter()
+        self.predict(WARM_UP_ROW)
+        self.get_shap_values(WARM_UP_ROW)
+        self.warm_up_seconds = time.perf_counter() - started
+        return self.warm_up_seconds
+
+    def cache_stats(self) -> Dict[str, float]:
+        cache = self._state.cache
+        return cache.stats() if cache is not None else {}
 
     def _to_feature_array(self, data: Dict) -> np.ndarray:
-        ordered = [
-            data["age_years"],
-            data["gender"],
-            data["bmi"],
-            data["map"],
-            data["cholesterol"],
-            data["gluc"],
-            data["smoke"],
-            data["alco"],
-            data["active"],
-        ]
+        ordered = [data[col] for col in FEATURE_COLUMNS]
         return np.array(ordered, dtype=float).reshape(1, -1)
 
+    def _to_feature_matrix(self, data: BatchInput) -> np.ndarray:
+        """Ubah input batch menjadi array float (n_rows, 9) yang contiguous."""
+        if isinstance(data, np.ndarray):
+            if data.ndim != 2 or data.shape[1] != len(FEATURE_COLUMNS):
+                raise ValueError(
+                    f"Array fitur harus 2-D dengan {len(FEATURE_COLUMNS)} kolom, "
+                    f"diterima shape {data.shape}."
+                )
+            return np.ascontiguousarray(data, dtype=float)
+
+        if hasattr(data, "columns"):
+            # pandas DataFrame: pilih & urutkan kolom sesuai training
+            return np.ascontiguousarray(data[FEATURE_COLUMNS].to_numpy(dtype=float))
+
+        rows = [[row[col] for col in FEATURE_COLUMNS] for row in data]
+        return np.array(rows, dtype=float).reshape(-1, len(FEATURE_COLUMNS))
+
     def predict_proba(self, data: Dict) -> float:
         X = self._to_feature_array(data)
-        proba = self.pipeline.predict_proba(X)[0, 1]
+        proba = self._current().predict_matrix(X)[0]
         return float(proba)
 
     def predict_label(self, data: Dict, threshold: float = 0.5) -> int:
         return int(self.predict_proba(data) >= threshold)
 
+    def predict_proba_batch(self, data: BatchInput) -> np.ndarray:
+        """Probabilitas kelas positif untuk banyak pasien dalam satu panggilan model."""
+        X = self._to_feature_matrix(data)
+        if X.shape[0] == 0:
+            return np.empty(0, dtype=float)
+        return self._current().predict_matrix(X)
+
+    def predict_label_batch(self, data: BatchInput, threshold: float = 0.5) -> np.ndarray:
+        return (self.predict_proba_batch(data) >= threshold).astype(int)
+
+    @staticmethod
+    def _make_prediction(proba: float, threshold: float, model_version: str) -> RiskPrediction:
+        proba = float(proba)
+        return RiskPrediction(
+            probability=proba,
+            label=int(proba >= threshold),
+            risk_category=risk_category(proba),
+            model_version=model_version,
+        )
+
+    def predict(self, data: Dict, threshold: float = 0.5) -> RiskPrediction:
+        """Probabilitas, label dan kategori risiko dari satu kali inferensi."""
+        state = self._current()
+        proba = state.predict_matrix(self._to_feature_array(data))[0]
+        return self._make_prediction(proba, threshold, state.model_version)
+
+    def predict_batch(self, data: BatchInput, threshold: float = 0.5) -> List[RiskPrediction]:
+        state = self._current()
+        X = self._to_feature_matrix(data)
+        if X.shape[0] == 0:
+            return []
+        return [self._make_prediction(p, threshold, state.model_version) for p in state.predict_matrix(X)]
+
+    def explain_batch(self, data: BatchInput) -> Tuple[np.ndarray, List[str]]:
+        """SHAP values untuk banyak baris: array (n_rows, 9) dan nama fiturnya."""
+        X = self._to_feature_matrix(data)
+        if X.shape[0] == 0:
+            return np.empty((0, len(FEATURE_COLUMNS))), list(SHAP_FEATURE_NAMES)
+        sv = self._current().shap_matrix(X)
+        if sv is None:
+            raise RuntimeError("SHAP explainer tidak tersedia.")
+        return sv, list(SHAP_FEATURE_NAMES)
+
     def get_shap_values(self, data: Dict) -> Dict[str, float]:
-        if not self.explainer:
+        sv = self._current().shap_matrix(self._to_feature_array(data))
+        if sv is None:
             return {}
-            
-        X = self._to_feature_array(data)
-        # Note: If there's a preprocessor, X should be transformed first. 
-        # Assuming simple pipeline for now or that X matches model input.
-        
-        shap_values = self.explainer.shap_values(X)
-        
-        # Handle different SHAP output formats (list for multiclass, array for binary)
-        if isinstance(shap_values, list):
-            sv = shap_values[1][0] # Positive class
-        else:
-            sv = shap_values[0]
-            
-        feature_names = ['Usia', 'Gender', 'BMI', 'MAP', 'Kolesterol', 'Glukosa', 'Rokok', 'Alkohol', 'Aktif']
-        
-        return {k: float(v) for k, v in zip(feature_names, sv)}
+        return {k: float(v) for k, v in zip(SHAP_FEATURE_NAMES, sv[0])}
+
+    def get_shap_values_batch(self, data: BatchInput) -> List[Dict[str, float]]:
+        """SHAP values untuk banyak baris dalam satu panggilan explainer."""
+        X = self._to_feature_matrix(data)
+        if X.shape[0] == 0:
+            return []
+        sv = self._current().shap_matrix(X)
+        if sv is None:
+            return [{} for _ in range(X.shape[0])]
+        return [
+            {k: float(v) for k, v in zip(SHAP_FEATURE_NAMES, row)}
+            for row in sv
+        ]
+
+
+def get_model() -> CardioRiskModel:
+    """Model bersama untuk proses ini (dimuat sekali, thread-safe)."""
+    return CardioRiskModel()
+
+
+def warm_up_model() -> Dict:
+    """Muat model + warm-up saat startup. Tidak raise; return `model_status()`."""
+    try:
+        model = get_model()
+        if model.warm_up_seconds is None:
+            model.warm_up()
+    except Exception as e:
+        print(f"Warning: model warm-up failed: {e}")
+    return model_status()
+
+
+def model_status() -> Dict:
+    """Status kesehatan model: not_loaded / loading / ready / error."""
+    model = CardioRiskModel._instance
+    if model is not None:
+        return {
+            "status": "ready",
+            "model_version": model.model_version,
+            "model_format": MODEL_FORMAT,
+            "load_seconds": CardioRiskModel._load_seconds,
+            "warmed_up": model.warm_up_seconds is not None,
+            "warm_up_seconds": model.warm_up_seconds,
+        }
+    if CardioRiskModel._instance_lock.locked():
+        return {"status": "loading"}
+    if CardioRiskModel._load_error is not None:
+        return {"status": "error", "error": str(CardioRiskModel._load_error)}
+    return {"status": "not_loaded"}
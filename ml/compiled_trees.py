@@ -0,0 +1,255 @@
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+# Lokasi default hasil ekspor pohon XGBoost (lihat `python -m ml.compiled_trees`).
+TREES_PATH = Path(__file__).resolve().parent / "xgb_trees.npz"
+# Booster mentah (tanpa SMOTE/imblearn), dipakai SHAP pada mode slim.
+BOOSTER_PATH = Path(__file__).resolve().parent / "xgb_booster.ubj"
+
+# Jumlah baris per blok saat evaluasi, supaya array (rows x trees) tetap kecil.
+EVAL_CHUNK_ROWS = 8192
+
+
+class CompiledTreeEnsemble:
+    """Booster XGBoost (binary:logistic) yang diratakan menjadi array NumPy.
+
+    Setiap pohon disimpan sebagai baris pada array (n_trees, max_nodes):
+    indeks fitur, threshold, anak kiri/kanan, arah default untuk nilai
+    hilang (NaN) dan nilai leaf. Evaluasi berjalan level demi level untuk
+    semua pohon dan semua baris sekaligus.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        base_margin: float,
+        max_depth: int,
+        cover: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature.astype(np.int32)
+        self.threshold = threshold.astype(np.float32)
+        self.left = left.astype(np.int32)
+        self.right = right.astype(np.int32)
+        self.default_left = default_left.astype(bool)
+        self.value = value.astype(np.float32)
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        # sum_hessian per node; dipakai TreeSHAP (ml/tree_shap.py)
+        self.cover = None if cover is None else cover.astype(np.float64)
+
+    @property
+    def n_trees(self) -> int:
+        return self.feature.shape[0]
+
+    # --- Export / Load ---
+    @classmethod
+    def from_booster(cls, booster) -> "CompiledTreeEnsemble":
+        """Ratakan `xgboost.Booster` (atau XGBClassifier) menjadi array."""
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Objective {objective} belum didukung oleh evaluator pohon.")
+        gbm = learner["gradient_booster"]
+        if gbm.get("name", "gbtree") != "gbtree":
+            raise ValueError(f"Booster {gbm.get('name')} belum didukung oleh evaluator pohon.")
+
+        trees = gbm["model"]["trees"]
+        # Hormati early stopping: XGBClassifier.predict_proba hanya memakai
+        # pohon sampai best_iteration.
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            indptr = gbm["model"]["iteration_indptr"]
+            trees = trees[: indptr[int(best_iteration) + 1]]
+
+        if any(any(t.get("split_type", [])) for t in trees):
+            raise ValueError("Split kategorikal belum didukung oleh evaluator pohon.")
+
+        n_trees = len(trees)
+        max_nodes = max(len(t["left_children"]) for t in trees)
+        feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+        threshold = np.zeros((n_trees, max_nodes), dtype=np.float32)
+        left = np.full((n_trees, max_nodes), -1, dtype=np.int32)
+        right = np.full((n_trees, max_nodes), -1, dtype=np.int32)
+        default_left = np.zeros((n_trees, max_nodes), dtype=bool)
+        value = np.zeros((n_trees, max_nodes), dtype=np.float32)
+        cover = np.zeros((n_trees, max_nodes), dtype=np.float64)
+
+        max_depth = 0
+        for i, t in enumerate(trees):
+            n = len(t["left_children"])
+            left[i, :n] = t["left_children"]
+            right[i, :n] = t["right_children"]
+            feature[i, :n] = t["split_indices"]
+            default_left[i, :n] = np.asarray(t["default_left"], dtype=bool)
+            cond = np.asarray(t["split_conditions"], dtype=np.float32)
+            is_leaf = left[i, :n] == -1
+            threshold[i, :n] = np.where(is_leaf, 0, cond)
+            value[i, :n] = np.where(is_leaf, cond, 0)
+            cover[i, :n] = t["sum_hessian"]
+            max_depth = max(max_depth, _tree_depth(t["left_children"], t["right_children"]))
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        base_margin = np.log(base_score / (1.0 - base_score))
+        return cls(feature, threshold, left, right, default_left, value, base_margin, max_depth, cover)
+
+    def save(self, path: Path = TREES_PATH) -> None:
+        extra = {} if self.cover is None else {"cover": self.cover}
+        np.savez(
+            path,
+            **extra,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            default_left=self.default_left,
+            value=self.value,
+            base_margin=np.float64(self.base_margin),
+            max_depth=np.int32(self.max_depth),
+        )
+
+    @classmethod
+    def load(cls, path: Path = TREES_PATH) -> "CompiledTreeEnsemble":
+        with np.load(path) as data:
+            return cls(
+                data["feature"],
+                data["threshold"],
+                data["left"],
+                data["right"],
+                data["default_left"],
+                data["value"],
+                float(data["base_margin"]),
+                int(data["max_depth"]),
+                data["cover"] if "cover" in data.files else None,
+            )
+
+    # --- Evaluation ---
+    def _flatten(self) -> None:
+        # Node disimpan sebagai indeks global (tree * max_nodes + node) dan leaf
+        # menunjuk ke dirinya sendiri, sehingga traversal cukup np.take + np.where.
+        n_trees, max_nodes = self.feature.shape
+        offset = (np.arange(n_trees, dtype=np.int32) * max_nodes)[:, None]
+        own = offset + np.arange(max_nodes, dtype=np.int32)[None, :]
+        is_leaf = self.left < 0
+        self._roots = offset.ravel()
+        self._left = np.where(is_leaf, own, self.left + offset).ravel()
+        self._right = np.where(is_leaf, own, self.right + offset).ravel()
+        self._feature = self.feature.ravel()
+        self._threshold = self.threshold.ravel()
+        self._default_left = self.default_left.ravel()
+        self._value = self.value.ravel()
+        self._has_default_left = bool(self._default_left.any())
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """Indeks leaf (global, tree * max_nodes + node) per baris per pohon."""
+        if not hasattr(self, "_roots"):
+            self._flatten()
+        # XGBoost membandingkan fitur dalam float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        row_offset = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+        X_flat = X.ravel()
+        node = np.broadcast_to(self._roots, (n_rows, self.n_trees))
+        for _ in range(self.max_depth):
+            x = np.take(X_flat, row_offset + np.take(self._feature, node))
+            go_left = x < np.take(self._threshold, node)
+            if self._has_default_left:
+                # Nilai hilang (NaN) mengikuti arah default split
+                go_left |= np.isnan(x) & np.take(self._default_left, node)
+            node = np.where(go_left, np.take(self._left, node), np.take(self._right, node))
+        return node
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], EVAL_CHUNK_ROWS):
+            block = X[start:start + EVAL_CHUNK_ROWS]
+            leaves = self.leaf_indices(block)
+            # Jumlahkan dalam float32 seperti XGBoost
+            margin = np.take(self._value, leaves).sum(axis=1, dtype=np.float32)
+            out[start:start + block.shape[0]] = margin + np.float32(self.base_margin)
+        return out
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilitas kelas positif, setara `pipeline.predict_proba(X)[:, 1]`."""
+        return 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+
+
+def _tree_depth(left, right, node: int = 0) -> int:
+    if left[node] == -1:
+        return 0
+    return 1 + max(_tree_depth(left, right, left[node]), _tree_depth(left, right, right[node]))
+
+
+def random_feature_matrix(n_rows: int, seed: Optional[int] = 0) -> np.ndarray:
+    """Input acak dalam rentang klinis wajar, untuk verifikasi evaluator."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(15, 101, n_rows),        # age_years
+        rng.integers(1, 3, n_rows),           # gender
+        rng.uniform(15.0, 50.0, n_rows),      # bmi
+        rng.uniform(50.0, 180.0, n_rows),     # map
+        rng.integers(1, 4, n_rows),           # cholesterol
+        rng.integers(1, 4, n_rows),           # gluc
+        rng.integers(0, 2, n_rows),           # smoke
+        rng.integers(0, 2, n_rows),           # alco
+        rng.integers(0, 2, n_rows),           # active
+    ]).astype(float)
+
+
+def max_abs_error(ensemble: CompiledTreeEnsemble, pipeline, X: np.ndarray) -> float:
+    """Selisih maksimum probabilitas evaluator vs pipeline asli."""
+    expected = pipeline.predict_proba(X)[:, 1]
+    return float(np.max(np.abs(ensemble.predict_proba(X) - expected))) if len(X) else 0.0
+
+
+def export_from_pipeline(
+    pipeline,
+    path: Path = TREES_PATH,
+    booster_path: Path = BOOSTER_PATH,
+    n_verify: int = 10000,
+) -> Dict[str, float]:
+    from ml.cardio_model import extract_classifier
+
+    classifier = extract_classifier(pipeline)
+    ensemble = CompiledTreeEnsemble.from_booster(classifier)
+    err = max_abs_error(ensemble, pipeline, random_feature_matrix(n_verify))
+    ensemble.save(path)
+    classifier.get_booster().save_model(str(booster_path))
+    info = {"n_trees": ensemble.n_trees, "max_depth": ensemble.max_depth, "max_abs_error": err}
+
+    # Bandingkan TreeSHAP tervektorisasi dengan shap.TreeExplainer (bila terpasang)
+    try:
+        import shap
+    except ImportError:
+        return info
+    from ml.tree_shap import TreePathExplainer
+
+    X = random_feature_matrix(min(n_verify, 2000), seed=1)
+    expected = np.asarray(shap.TreeExplainer(classifier).shap_values(X))
+    actual = TreePathExplainer(ensemble, X.shape[1]).shap_values(X)
+    info["max_shap_error"] = float(np.max(np.abs(actual - expected)))
+    return info
+
+
+if __name__ == "__main__":
+    import joblib
+    from ml.cardio_model import MODEL_PATH, _patch_sklearn_compat
+
+    _patch_sklearn_compat()
+    info = export_from_pipeline(joblib.load(MODEL_PATH))
+    print(f"Exported {info['n_trees']} trees (depth {info['max_depth']}) to {TREES_PATH}")
+    print(f"Exported booster to {BOOSTER_PATH}")
+    print(f"Max |proba - pipeline.predict_proba| on random inputs: {info['max_abs_error']:.2e}")
+    if "max_shap_error" in info:
+        print(f"Max |TreeSHAP - shap.TreeExplainer| on random inputs: {info['max_shap_error']:.2e}")
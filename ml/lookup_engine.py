@@ -0,0 +1,175 @@
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ml.compiled_trees import CompiledTreeEnsemble, random_feature_matrix
+
+# Batas jumlah sel tabel (float32). 64M sel = 256 MB.
+MAX_LOOKUP_CELLS = 64 * 1024 * 1024
+
+
+class LookupEngine:
+    """Tabel margin untuk seluruh kisi fitur dari ensemble pohon.
+
+    Ensemble pohon adalah fungsi konstan per potongan: nilainya hanya berubah
+    di threshold split. Threshold tiap fitur dikumpulkan dari semua pohon,
+    sehingga setiap fitur terbagi menjadi (jumlah threshold + 1) bin dan
+    setiap sel kisi punya satu margin tetap. Prediksi cukup berupa
+    `np.searchsorted` per fitur lalu indexing tabel, tanpa traversal pohon.
+
+    Baris dengan nilai hilang (NaN) tidak ada di kisi; gunakan evaluator
+    pohon untuk baris tersebut.
+    """
+
+    def __init__(self, ensemble: CompiledTreeEnsemble, n_features: int):
+        internal = ensemble.left >= 0
+        self.n_features = n_features
+        self.thresholds: List[np.ndarray] = [
+            np.unique(ensemble.threshold[internal & (ensemble.feature == f)]) for f in range(n_features)
+        ]
+        self.shape = tuple(len(t) + 1 for t in self.thresholds)
+        n_cells = int(np.prod(self.shape, dtype=np.int64))
+        if n_cells > MAX_LOOKUP_CELLS:
+            raise ValueError(f"Kisi fitur terlalu besar untuk tabel lookup ({n_cells} sel).")
+        # Tabel disimpan dengan sumbu terbesar paling dalam (contiguous) agar
+        # broadcast-add saat membangun tabel memakai inner loop yang panjang.
+        self.axis_order = sorted(range(n_features), key=lambda f: self.shape[f])
+        permuted_shape = [self.shape[f] for f in self.axis_order]
+        self.strides = np.zeros(n_features, dtype=np.int64)
+        for pos, f in enumerate(self.axis_order):
+            self.strides[f] = int(np.prod(permuted_shape[pos + 1:], dtype=np.int64))
+        self.table = self._build_table(ensemble)
+
+    @staticmethod
+    def _representatives(thresholds: np.ndarray) -> np.ndarray:
+        # Nilai wakil bin b adalah batas bawahnya, t[b-1]; bin 0 = -inf.
+        return np.concatenate([[-np.inf], thresholds]).astype(np.float32)
+
+    def _group_grid(self, ens: CompiledTreeEnsemble, trees: List[int], feats: tuple) -> np.ndarray:
+        """Margin sekelompok pohon (fitur sama) pada sub-kisi global `feats`.
+
+        Pohon dievaluasi di kisi gabungan threshold milik kelompok itu saja
+        (jauh lebih kecil dari kisi global), lalu dipetakan ke bin global
+        lewat searchsorted.
+        """
+        internal = ens.left[trees] >= 0
+        features = ens.feature[trees]
+        local = [np.unique(ens.threshold[trees][internal & (features == f)]) for f in feats]
+        sub = CompiledTreeEnsemble(
+            features, ens.threshold[trees], ens.left[trees], ens.right[trees],
+            ens.default_left[trees], ens.value[trees], 0.0, ens.max_depth,
+        )
+        grids = np.meshgrid(*[self._representatives(thr) for thr in local], indexing="ij")
+        X = np.zeros((grids[0].size if feats else 1, self.n_features), dtype=np.float32)
+        for f, grid in zip(feats, grids):
+            X[:, f] = grid.ravel()
+        local_margin = sub.predict_margin(X).reshape([len(thr) + 1 for thr in local])
+        if not feats:
+            return local_margin
+        to_local = [
+            np.searchsorted(thr, self._representatives(self.thresholds[f]), side="right")
+            for f, thr in zip(feats, local)
+        ]
+        return local_margin[np.ix_(*to_local)]
+
+    def _build_table(self, ens: CompiledTreeEnsemble) -> np.ndarray:
+        groups: Dict[tuple, List[int]] = {}
+        for t in range(ens.n_trees):
+            feats = tuple(sorted(set(ens.feature[t][ens.left[t] >= 0].tolist())))
+            groups.setdefault(feats, []).append(t)
+
+        # Kelompok yang fiturnya subset dari kelompok lain ditambahkan ke
+        # sub-kisi kelompok "host" tersebut; hanya host yang di-broadcast ke
+        # tabel penuh.
+        hosts: Dict[tuple, np.ndarray] = {}
+        for feats in sorted(groups, key=len, reverse=True):
+            grid = self._group_grid(ens, groups[feats], feats)
+            host = next((h for h in hosts if set(feats) <= set(h)), None)
+            if host is None:
+                hosts[feats] = grid
+            else:
+                hosts[host] += grid.reshape([self.shape[f] if f in feats else 1 for f in host])
+
+        table = np.full([self.shape[f] for f in self.axis_order], ens.base_margin, dtype=np.float64)
+        for feats, grid in hosts.items():
+            # Urutkan sumbu grid mengikuti axis_order, lalu bentuk (1, .., bins_f, .., 1)
+            ordered = [f for f in self.axis_order if f in feats]
+            grid = np.transpose(grid, [feats.index(f) for f in ordered])
+            table += grid.reshape([self.shape[f] if f in feats else 1 for f in self.axis_order])
+        return table.astype(np.float32).ravel()
+
+    def cell_index(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        index = np.zeros(X.shape[0], dtype=np.int64)
+        for f in range(self.n_features):
+            if self.shape[f] > 1:
+                # bin = jumlah threshold <= x, sama dengan aturan split `x < t`
+                index += np.searchsorted(self.thresholds[f], X[:, f], side="right") * self.strides[f]
+        return index
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        return self.table[self.cell_index(X)].astype(np.float64)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    def verify(self, reference: Callable[[np.ndarray], np.ndarray], n_rows: int = 100000, seed: Optional[int] = 0) -> float:
+        """Selisih maksimum probabilitas terhadap `reference` pada input acak.
+
+        Selain input acak, nilai tepat di threshold (kasus tepi `x < t`)
+        juga diuji.
+        """
+        X = random_feature_matrix(n_rows, seed)
+        rng = np.random.default_rng(seed)
+        edge = X[: n_rows // 4].copy()
+        for f, thr in enumerate(self.thresholds):
+            if len(thr):
+                edge[:, f] = rng.choice(thr, len(edge))
+        X = np.vstack([X, edge])
+        return float(np.max(np.abs(self.predict_proba(X) - reference(X))))
+
+
+def build_lookup_engine(ensemble: Optional[CompiledTreeEnsemble], n_features: int) -> Optional[LookupEngine]:
+    if ensemble is None:
+        return None
+    try:
+        return LookupEngine(ensemble, n_features)
+    except ValueError as e:
+        print(f"Warning: lookup engine unavailable: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import joblib
+    from ml.cardio_model import MODEL_PATH, _patch_sklearn_compat, extract_classifier
+
+    parser = argparse.ArgumentParser(description="Bangun & verifikasi lookup engine terhadap pipeline asli.")
+    parser.add_argument("--rows", type=int, default=100000, help="jumlah input acak untuk verifikasi")
+    args = parser.parse_args()
+
+    _patch_sklearn_compat()
+    pipeline = joblib.load(MODEL_PATH)
+    ensemble = CompiledTreeEnsemble.from_booster(extract_classifier(pipeline))
+
+    t0 = time.perf_counter()
+    engine = LookupEngine(ensemble, pipeline.n_features_in_)
+    build_s = time.perf_counter() - t0
+    print(f"Grid {engine.shape} = {engine.table.size:,} cells ({engine.nbytes / 2**20:.0f} MB), built in {build_s:.2f}s")
+
+    err = engine.verify(lambda X: pipeline.predict_proba(X)[:, 1], n_rows=args.rows)
+    print(f"Max |lookup - pipeline.predict_proba| on {args.rows:,} random + threshold-edge rows: {err:.2e}")
+
+    X = random_feature_matrix(args.rows, seed=1)
+    t0 = time.perf_counter()
+    engine.predict_proba(X)
+    t1 = time.perf_counter()
+    pipeline.predict_proba(X)
+    t2 = time.perf_counter()
+    print(f"{args.rows:,} rows: lookup {t1 - t0:.3f}s, pipeline {t2 - t1:.3f}s")
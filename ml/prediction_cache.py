@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class PredictionCache:
+    """Cache LRU + TTL untuk hasil model per vektor fitur.
+
+    Nilai yang disimpan adalah dict kecil (mis. {"proba": ..., "shap": ...});
+    `update` menggabungkan field baru ke entri yang sudah ada sehingga
+    probabilitas dan SHAP bisa diisi dari jalur yang berbeda. Umur entri
+    dihitung dari field tertua: `update` tidak memperpanjang TTL field lama.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, field: str):
+        """Nilai `field` untuk key, atau None (dihitung sebagai miss)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                stored_at, value = item
+                if self.ttl is not None and now - stored_at > self.ttl:
+                    del self._data[key]
+                elif value.get(field) is not None:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value[field]
+            self.misses += 1
+            return None
+
+    def update(self, key: Hashable, **fields) -> None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None and self.ttl is not None and now - item[0] > self.ttl:
+                item = None
+            if item is not None:
+                stored_at, value = item[0], dict(item[1])
+            else:
+                stored_at, value = now, {}
+            value.update(fields)
+            self._data[key] = (stored_at, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
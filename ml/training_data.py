@@ -0,0 +1,309 @@
+"""Data training out-of-core: checkup dibaca per potongan dari SQLite / Parquet.
+
+Setiap potongan memakai dtype ringkas (kode kategori int8, nilai kontinu
+float32) dan diumpankan ke XGBoost lewat `xgboost.DataIter`, sehingga tabel
+lengkap tidak pernah ada di memori sebagai satu DataFrame. SMOTE (yang butuh
+seluruh data) diganti bobot kelas `scale_pos_weight`.
+
+Sumber SQLite wajib menyebut kolom label ground truth (`--label`): tabel
+`checkups` bawaan hanya berisi `risk_label`, yaitu prediksi model itu sendiri.
+Hasil training ditulis ke direktori `--out`, tidak pernah ke artefak di `ml/`:
+
+    python -m ml.training_data --db outcomes.db --label cardio --train --out /tmp/model_baru
+
+Bandingkan RSS puncak dengan pipeline lama (pandas + SMOTE + XGBClassifier),
+masing-masing di proses baru (data sintetis, hanya untuk waktu & memori):
+
+    python -m ml.training_data --db /tmp/checkups.db --rows 2000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from ml.cardio_model import FEATURE_COLUMNS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Dtype ringkas per kolom: 1 byte untuk kode / flag, float32 untuk pengukuran.
+FEATURE_DTYPES = {
+    "age_years": np.int8,
+    "gender": np.int8,
+    "bmi": np.float32,
+    "map": np.float32,
+    "cholesterol": np.int8,
+    "gluc": np.int8,
+    "smoke": np.int8,
+    "alco": np.int8,
+    "active": np.int8,
+}
+# Parquet dari dataset training memakai label ground truth `cardio`. SQLite
+# tidak punya default: `checkups.risk_label` adalah prediksi model yang sedang
+# dipakai, dan melatih ulang dengannya hanya menyalin model ke dirinya sendiri.
+PARQUET_LABEL = "cardio"
+# Hanya untuk benchmark waktu & memori di data sintetis, bukan untuk model.
+BENCH_LABEL = "risk_label"
+CHUNK_ROWS = 100000
+# Setiap baris ke-N (berdasarkan urutan baca) menjadi data validasi.
+VALID_EVERY = 10
+
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 5,
+    "learning_rate": 0.1,
+    "subsample": 0.9,
+    "seed": 42,
+}
+EARLY_STOPPING_ROUNDS = 30
+
+Chunk = Tuple[pd.DataFrame, np.ndarray]
+
+
+def _compact(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype(FEATURE_DTYPES, copy=False)
+
+
+def iter_sqlite_chunks(path, label: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[Chunk]:
+    """(fitur, label) per potongan dari tabel `checkups`; baris tidak lengkap dilewati."""
+    columns = FEATURE_COLUMNS + [label]
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in columns)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(checkups)")}
+        missing = [c for c in columns if c not in existing]
+        if missing:
+            raise ValueError(f"Table checkups in {path} has no column(s): {', '.join(missing)}")
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM checkups WHERE {not_null}")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.float32)
+            del rows
+            frame = _compact(pd.DataFrame(block[:, :-1], columns=FEATURE_COLUMNS))
+            yield frame, block[:, -1].astype(np.int8)
+    finally:
+        conn.close()
+
+
+def iter_parquet_chunks(path, label: str = PARQUET_LABEL, chunk_rows: int = CHUNK_ROWS) -> Iterator[Chunk]:
+    """(fitur, label) per row batch dari file Parquet (butuh pyarrow)."""
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=FEATURE_COLUMNS + [label]):
+        frame = batch.to_pandas().dropna()
+        yield _compact(frame[FEATURE_COLUMNS]), frame[label].to_numpy(dtype=np.int8)
+
+
+def iter_chunks(source, label: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Iterator[Chunk]:
+    if str(source).endswith(".parquet"):
+        return iter_parquet_chunks(source, label or PARQUET_LABEL, chunk_rows)
+    if not label:
+        raise ValueError(
+            "SQLite sources need an explicit ground-truth label column; "
+            "checkups.risk_label is the deployed model's own prediction"
+        )
+    return iter_sqlite_chunks(source, label, chunk_rows)
+
+
+def split_chunks(chunks: Iterator[Chunk], part: str) -> Iterator[Chunk]:
+    """Pisahkan "train" / "valid" secara deterministik dari urutan baris."""
+    offset = 0
+    for frame, y in chunks:
+        is_valid = (np.arange(offset, offset + len(y)) % VALID_EVERY) == 0
+        offset += len(y)
+        keep = is_valid if part == "valid" else ~is_valid
+        yield frame[keep], y[keep]
+
+
+class ChunkIter(xgb.DataIter):
+    """`xgboost.DataIter` di atas generator potongan yang bisa diulang.
+
+    XGBoost membaca data beberapa kali (sketsa kuantil, lalu isi matriks);
+    `make_chunks` dipanggil ulang pada setiap `reset`.
+    """
+
+    def __init__(self, make_chunks: Callable[[], Iterator[Chunk]], cache_prefix: Optional[str] = None):
+        self._make_chunks = make_chunks
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> int:
+        if self._chunks is None:
+            self._chunks = self._make_chunks()
+        for frame, y in self._chunks:
+            if len(y):
+                input_data(data=frame, label=y)
+                return 1
+        return 0
+
+    def reset(self) -> None:
+        self._chunks = None
+
+
+def label_counts(source, label: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for _, y in split_chunks(iter_chunks(source, label, chunk_rows), "train"):
+        values, n = np.unique(y, return_counts=True)
+        for value, count in zip(values.tolist(), n.tolist()):
+            counts[value] = counts.get(value, 0) + count
+    return counts
+
+
+def build_matrices(source, label=None, chunk_rows=CHUNK_ROWS, external_memory=False, cache_dir=None):
+    """(dtrain, dvalid) dibangun per potongan.
+
+    Default `QuantileDMatrix`: data langsung dikuantisasi ke bin histogram
+    (1 byte per nilai), tanpa salinan float penuh. `external_memory=True`
+    menulis halaman ke `cache_dir` di disk (untuk data yang tidak muat di RAM);
+    direktori itu harus tetap ada selama matriks dipakai.
+    """
+    def make(part):
+        return lambda: split_chunks(iter_chunks(source, label, chunk_rows), part)
+
+    if external_memory:
+        dtrain = xgb.DMatrix(ChunkIter(make("train"), os.path.join(cache_dir, "train")))
+        dvalid = xgb.DMatrix(ChunkIter(make("valid"), os.path.join(cache_dir, "valid")))
+    else:
+        dtrain = xgb.QuantileDMatrix(ChunkIter(make("train")))
+        dvalid = xgb.QuantileDMatrix(ChunkIter(make("valid")), ref=dtrain)
+    return dtrain, dvalid
+
+
+def train_streaming(
+    source,
+    label: Optional[str] = None,
+    num_boost_round: int = 1000,
+    params: Optional[Dict] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    external_memory: bool = False,
+    early_stopping_rounds: Optional[int] = EARLY_STOPPING_ROUNDS,
+) -> xgb.Booster:
+    """Latih booster dari `source` (.db SQLite atau .parquet) tanpa memuat semuanya.
+
+    `label` wajib untuk SQLite (kolom ground truth di tabel `checkups`).
+    """
+    counts = label_counts(source, label, chunk_rows)
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    if counts.get(1):
+        # Pengganti SMOTE: bobot kelas positif = rasio negatif / positif
+        params.setdefault("scale_pos_weight", counts.get(0, 0) / counts[1])
+    with tempfile.TemporaryDirectory(prefix="siaga-xgb-") as cache_dir:
+        dtrain, dvalid = build_matrices(source, label, chunk_rows, external_memory, cache_dir)
+        return xgb.train(
+            params, dtrain, num_boost_round=num_boost_round,
+            evals=[(dvalid, "valid")], early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+        )
+
+
+def save_slim(booster: xgb.Booster, out_dir) -> Dict:
+    """Simpan artefak format slim (`xgb_trees.npz` + `xgb_booster.ubj`) ke `out_dir`.
+
+    Artefak yang dipakai aplikasi di `ml/` tidak disentuh; salin manual
+    setelah model baru diverifikasi.
+    """
+    from ml.compiled_trees import BOOSTER_PATH, TREES_PATH, CompiledTreeEnsemble
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    trees_path, booster_path = out_dir / TREES_PATH.name, out_dir / BOOSTER_PATH.name
+    ensemble = CompiledTreeEnsemble.from_booster(booster)
+    ensemble.save(trees_path)
+    booster.save_model(str(booster_path))
+    return {"n_trees": ensemble.n_trees, "trees_path": str(trees_path), "booster_path": str(booster_path)}
+
+
+# --- Benchmark: pipeline lama vs streaming, masing-masing di proses baru ---
+CHILD = r"""
+import json, resource, sys, time, warnings
+warnings.filterwarnings("ignore")
+mode, source, rounds, label = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+t0 = time.perf_counter()
+if mode == "pandas":
+    import sqlite3
+    import pandas as pd
+    from imblearn.over_sampling import SMOTE
+    from xgboost import XGBClassifier
+    from ml.cardio_model import FEATURE_COLUMNS
+    from ml.training_data import DEFAULT_PARAMS
+    conn = sqlite3.connect(source)
+    df = pd.read_sql(f"SELECT {', '.join(FEATURE_COLUMNS)}, {label} FROM checkups", conn)
+    X, y = SMOTE(random_state=42).fit_resample(df[FEATURE_COLUMNS], df[label])
+    params = {k: v for k, v in DEFAULT_PARAMS.items() if k not in ("objective", "seed")}
+    XGBClassifier(n_estimators=rounds, random_state=42, **params).fit(X, y)
+else:
+    from ml.training_data import train_streaming
+    train_streaming(source, label, num_boost_round=rounds, external_memory=(mode == "external"), early_stopping_rounds=None)
+print(json.dumps({
+    "seconds": time.perf_counter() - t0,
+    "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+SCENARIOS = [
+    ("pandas + SMOTE (cardio.py)", "pandas"),
+    ("streaming QuantileDMatrix", "quantile"),
+    ("streaming external memory", "external"),
+]
+
+
+def bench(source, rounds, label=BENCH_LABEL):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    print(f"{'pipeline':<28} {'time':>8} {'RSS peak':>9}")
+    for name, mode in SCENARIOS:
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, mode, str(source), str(rounds), label],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<28} {r['seconds']:>7.1f}s {r['rss_peak_mb']:>7.0f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=None, help="SQLite berisi tabel checkups (atau file .parquet)")
+    parser.add_argument("--rows", type=int, default=1000000, help="isi --db dengan checkup sintetis bila belum ada")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--label", default=None, help="kolom label ground truth (wajib untuk --train dari SQLite)")
+    parser.add_argument("--train", action="store_true", help="latih dengan early stopping lalu simpan artefak slim")
+    parser.add_argument("--out", default=None, help="direktori artefak hasil --train (wajib)")
+    args = parser.parse_args()
+
+    if args.train:
+        if not args.db:
+            parser.error("--train needs --db with real outcome data")
+        if not args.out:
+            parser.error("--train needs --out; shipped artifacts in ml/ are never overwritten")
+        try:
+            booster = train_streaming(args.db, args.label)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Best iteration: {booster.best_iteration}, valid logloss: {booster.best_score:.4f}")
+        print(json.dumps(save_slim(booster, args.out)))
+    else:
+        source = args.db or os.path.join(tempfile.gettempdir(), "siaga_training_bench.db")
+        if not os.path.exists(source):
+            from sqlalchemy import create_engine
+
+            from appheart.bench_stats import populate
+            from appheart.migrate import upgrade
+
+            print(f"Populating {source} with {args.rows:,} checkups...")
+            engine = create_engine(f"sqlite:///{source}")
+            upgrade(engine)
+            populate(engine, args.rows)
+            engine.dispose()
+
+        bench(source, args.rounds, args.label or BENCH_LABEL)
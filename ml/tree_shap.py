@@ -0,0 +1,157 @@
+from math import factorial
+from typing import Optional
+
+import numpy as np
+
+from ml.compiled_trees import CompiledTreeEnsemble
+
+# Batas ukuran tabel kontribusi (paths x 2^depth x depth). Di atas ini
+# (pohon sangat dalam) gunakan shap.TreeExplainer biasa.
+MAX_TABLE_BYTES = 64 * 1024 * 1024
+
+# Target jumlah elemen (rows x paths x depth) per blok evaluasi.
+EVAL_CHUNK_ELEMENTS = 4_000_000
+
+
+class TreePathExplainer:
+    """TreeSHAP eksak (path-dependent, sama dengan shap.TreeExplainer) untuk batch.
+
+    Setiap leaf pada setiap pohon adalah satu "path" dengan <= `max_depth`
+    fitur unik. Untuk path-dependent TreeSHAP, kontribusi path ke tiap fitur
+    hanya bergantung pada fitur mana di path tersebut yang dilalui baris input
+    (one-fraction 0/1). Karena itu semua kemungkinan (2^depth pola) dihitung
+    sekali saat model dimuat, dan SHAP untuk banyak baris cukup berupa
+    perbandingan threshold + indexing tabel + satu perkalian matriks.
+    """
+
+    def __init__(self, ensemble: CompiledTreeEnsemble, n_features: int):
+        if ensemble.cover is None:
+            raise ValueError("Ensemble tidak punya cover (sum_hessian); ekspor ulang dengan `python -m ml.compiled_trees`.")
+        self.n_features = n_features
+        self._build_paths(ensemble)
+        self._build_tables()
+
+    # --- Precompute ---
+    def _build_paths(self, ens: CompiledTreeEnsemble) -> None:
+        paths = []
+        expected = ens.base_margin
+        for t in range(ens.n_trees):
+            root_cover = ens.cover[t, 0]
+            stack = [(0, [])]
+            while stack:
+                node, elems = stack.pop()
+                left, right = ens.left[t, node], ens.right[t, node]
+                if left < 0:
+                    expected += ens.value[t, node] * ens.cover[t, node] / root_cover
+                    if elems:
+                        paths.append((float(ens.value[t, node]), elems))
+                    continue
+                for child, is_left in ((left, True), (right, False)):
+                    elems_child = elems + [(
+                        int(ens.feature[t, node]),
+                        float(ens.threshold[t, node]),
+                        is_left,
+                        bool(ens.default_left[t, node]) == is_left,
+                        ens.cover[t, child] / ens.cover[t, node],
+                    )]
+                    stack.append((child, elems_child))
+        self.expected_value = float(expected)
+
+        n_paths = len(paths)
+        max_len = max((len(e) for _, e in paths), default=1)
+        self.depth = max((len({f for f, *_ in e}) for _, e in paths), default=1)
+
+        self.raw_feature = np.zeros((n_paths, max_len), dtype=np.int32)
+        self.raw_threshold = np.full((n_paths, max_len), np.inf, dtype=np.float32)
+        self.raw_left = np.ones((n_paths, max_len), dtype=bool)
+        self.raw_default = np.ones((n_paths, max_len), dtype=bool)
+        self.raw_slot = np.zeros((n_paths, max_len), dtype=np.int32)
+        self.raw_pad = np.ones((n_paths, max_len), dtype=bool)
+        # Slot = fitur unik dalam path; slot kosong adalah "dummy" (z=1, o=1)
+        self.slot_feature = np.zeros((n_paths, self.depth), dtype=np.int32)
+        self.slot_zero = np.ones((n_paths, self.depth), dtype=np.float64)
+        self.slot_used = np.zeros((n_paths, self.depth), dtype=bool)
+        self.leaf_value = np.zeros(n_paths, dtype=np.float64)
+
+        for p, (value, elems) in enumerate(paths):
+            self.leaf_value[p] = value
+            slots = {}
+            for i, (feat, thr, is_left, is_default, zero) in enumerate(elems):
+                k = slots.setdefault(feat, len(slots))
+                self.raw_feature[p, i] = feat
+                self.raw_threshold[p, i] = thr
+                self.raw_left[p, i] = is_left
+                self.raw_default[p, i] = is_default
+                self.raw_slot[p, i] = k
+                self.raw_pad[p, i] = False
+                self.slot_feature[p, k] = feat
+                self.slot_zero[p, k] *= zero
+                self.slot_used[p, k] = True
+
+    def _build_tables(self) -> None:
+        n_paths, D = self.slot_zero.shape
+        n_patterns = 1 << D
+        if n_paths * n_patterns * D * 8 > MAX_TABLE_BYTES:
+            raise ValueError(f"Pohon terlalu dalam untuk tabel TreeSHAP (depth {D}).")
+
+        # ones[m, k] = one-fraction slot k pada pola m
+        ones = ((np.arange(n_patterns)[:, None] >> np.arange(D)[None, :]) & 1).astype(np.float64)
+        z = self.slot_zero[:, None, :]  # (P, 1, D)
+        o = ones[None, :, :]            # (1, M, D)
+        weights = np.array([factorial(s) * factorial(D - s - 1) / factorial(D) for s in range(D)])
+
+        table = np.zeros((n_paths, n_patterns, D), dtype=np.float64)
+        for k in range(D):
+            # Koefisien polinomial prod_{j != k} (z_j + o_j * t)
+            poly = np.zeros((n_paths, n_patterns, D), dtype=np.float64)
+            poly[:, :, 0] = 1.0
+            for j in range(D):
+                if j == k:
+                    continue
+                shifted = np.zeros_like(poly)
+                shifted[:, :, 1:] = poly[:, :, :-1]
+                poly = poly * z[:, :, j, None] + shifted * o[:, :, j, None]
+            table[:, :, k] = (o[:, :, k] - z[:, :, k]) * (poly @ weights)
+        table *= self.leaf_value[:, None, None]
+        table *= self.slot_used[:, None, :]
+        self.table = table.reshape(n_paths * n_patterns, D)
+        self._pattern_offset = (np.arange(n_paths) * n_patterns)[None, :]
+        self._full_mask = n_patterns - 1
+
+        # Petakan (path, slot) -> kolom fitur untuk penjumlahan akhir
+        scatter = np.zeros((n_paths * D, self.n_features), dtype=np.float64)
+        scatter[np.arange(n_paths * D), self.slot_feature.ravel()] = self.slot_used.ravel()
+        self._scatter = scatter
+
+    # --- Evaluation ---
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """SHAP values (margin/log-odds) kelas positif, shape (n_rows, n_features)."""
+        # XGBoost membandingkan fitur dalam float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        n_paths, max_len = self.raw_feature.shape
+        out = np.empty((n_rows, self.n_features), dtype=np.float64)
+        chunk = max(1, EVAL_CHUNK_ELEMENTS // (n_paths * max_len))
+        slot_bits = (1 << self.raw_slot)
+        for start in range(0, n_rows, chunk):
+            block = X[start:start + chunk]
+            x = block[:, self.raw_feature]                       # (n, P, L)
+            below = x < self.raw_threshold
+            follows = np.where(np.isnan(x), self.raw_default, below == self.raw_left)
+            follows |= self.raw_pad
+            failed = np.bitwise_or.reduce(np.where(follows, 0, slot_bits), axis=2)
+            pattern = self._full_mask & ~failed                   # (n, P)
+            contrib = self.table[self._pattern_offset + pattern]  # (n, P, D)
+            out[start:start + block.shape[0]] = contrib.reshape(block.shape[0], -1) @ self._scatter
+        return out
+
+
+def build_explainer(ensemble: Optional[CompiledTreeEnsemble], n_features: int) -> Optional[TreePathExplainer]:
+    """TreePathExplainer untuk ensemble, atau None bila tidak bisa dipakai."""
+    if ensemble is None:
+        return None
+    try:
+        return TreePathExplainer(ensemble, n_features)
+    except ValueError as e:
+        print(f"Warning: vectorized TreeSHAP unavailable: {e}")
+        return None
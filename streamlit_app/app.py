@@ -6,7 +6,6 @@ from datetime import datetime
 import time
 import sys
 import os
-import json
 from PIL import Image
 
 # --- PATH SETUP FOR MONOLITH MODE ---
@@ -17,13 +16,11 @@ sys.path.append(parent_dir)
 
 # --- DIRECT IMPORTS (No API) ---
 from appheart.database import SessionLocal, engine
-from appheart import crud, models, schemas
-from sqlalchemy import or_
+from appheart.migrate import upgrade as upgrade_schema
+from appheart import crud, export, models, schemas
+from appheart.patient_search import ensure_search_index
 from sqlalchemy.exc import IntegrityError
-from ml.cardio_model import CardioRiskModel
-
-# Initialize DB
-models.Base.metadata.create_all(bind=engine)
+from ml.cardio_model import get_model, warm_up_model, RISK_THRESHOLD_SEDANG, RISK_THRESHOLD_TINGGI
 
 # --- SEED ADMIN USER (For Fresh DB) ---
 def seed_admin():
@@ -46,9 +43,109 @@ def seed_admin():
     finally:
         db.close()
 
-seed_admin()
+# Backfill rollup statistik untuk database lama (sekali, saat rollup masih kosong)
+def ensure_stats_rollup():
+    db = SessionLocal()
+    try:
+        crud.ensure_checkup_stats(db)
+    except Exception as e:
+        print(f"Warning: stats rollup backfill failed: {e}")
+    finally:
+        db.close()
+
+# Initialize DB: sekali per proses, bukan di setiap rerun
+@st.cache_resource(show_spinner=False)
+def init_database():
+    upgrade_schema(engine)
+    ensure_search_index(engine)
+    seed_admin()
+    ensure_stats_rollup()
+    return True
+
+init_database()
+
+# Model dimuat & di-warm-up sekali per proses (dipakai bersama semua sesi),
+# agar analisis pertama tidak membayar waktu load + inisialisasi SHAP
+@st.cache_resource(show_spinner="Memuat model...")
+def init_model():
+    return warm_up_model()
+
+init_model()
 
 # --- DB HELPERS ---
+# Cache baca: setiap fungsi menerima `version` = crud.data_version(...) dari
+# data yang dibacanya. Rerun tanpa perubahan data tidak menyentuh database;
+# tulisan lewat crud menaikkan versi sehingga hanya view terkait dihitung
+# ulang. TTL menyegarkan data yang ditulis proses lain (API).
+CACHE_TTL = 60
+
+# URL API (mis. http://localhost:8000). Bila di-set, tombol laporan lengkap
+# mengarah ke GET /checkups/export yang di-stream; tanpa API (mode monolith)
+# laporan dibangun di memori proses Streamlit saat tombol diklik.
+API_URL = os.getenv("SIAGA_API_URL", "").rstrip("/")
+
+def patient_versions():
+    return crud.data_version(crud.DATA_PATIENTS)
+
+def checkup_versions():
+    return crud.data_version(crud.DATA_PATIENTS, crud.DATA_CHECKUPS)
+
+def row_to_dict(obj):
+    return {c.name: getattr(obj, c.name) for c in obj.__table__.columns}
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_patient_count(q, gender, version):
+    # COUNT penuh mahal untuk registri besar
+    db = SessionLocal()
+    try:
+        return crud.count_patients(db, q=q, gender=gender)
+    finally:
+        db.close()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_patient_page(q, gender, before_id, limit, version):
+    db = SessionLocal()
+    try:
+        patients = crud.get_patient_list(db, q=q, gender=gender, limit=limit, before_id=before_id)
+        return [row_to_dict(p) for p in patients]
+    finally:
+        db.close()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_patient_search(q, version):
+    db = SessionLocal()
+    try:
+        # Pasien + risiko checkup terakhir dalam satu query
+        return [(row_to_dict(p), cat) for p, cat in crud.get_patients_with_latest_risk(db, q=q, limit=20)]
+    finally:
+        db.close()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_checkup_stats(version):
+    db = SessionLocal()
+    try:
+        return crud.get_checkup_stats(db)
+    finally:
+        db.close()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_checkup_report(version):
+    db = SessionLocal()
+    try:
+        # Satu query join pasien; DataFrame dibangun langsung dari tuple kolom
+        result = crud.get_checkup_report(db, with_details=False)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    finally:
+        db.close()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_patient_history(patient_id, version):
+    db = SessionLocal()
+    try:
+        return pd.DataFrame([row_to_dict(h) for h in crud.get_checkups_by_patient(db, patient_id)])
+    finally:
+        db.close()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -176,8 +273,8 @@ if "logged_in" not in st.session_state: st.session_state.logged_in = False
 # Visualization Helpers (Restored)
 def create_gauge_chart(value, title):
     color = "green"
-    if value >= 30: color = "orange"
-    if value >= 60: color = "red"
+    if value >= RISK_THRESHOLD_SEDANG: color = "orange"
+    if value >= RISK_THRESHOLD_TINGGI: color = "red"
     
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
@@ -192,9 +289,9 @@ def create_gauge_chart(value, title):
             'borderwidth': 2,
             'bordercolor': "#eee",
             'steps': [
-                {'range': [0, 30], 'color': "#e8f5e9"},
-                {'range': [30, 60], 'color': "#fff3e0"},
-                {'range': [60, 100], 'color': "#ffebee"}],
+                {'range': [0, RISK_THRESHOLD_SEDANG], 'color': "#e8f5e9"},
+                {'range': [RISK_THRESHOLD_SEDANG, RISK_THRESHOLD_TINGGI], 'color': "#fff3e0"},
+                {'range': [RISK_THRESHOLD_TINGGI, 100], 'color': "#ffebee"}],
             'threshold': {
                 'line': {'color': "red", 'width': 4},
                 'thickness': 0.75,
@@ -245,8 +342,8 @@ def create_radar_chart(input_data):
 
 def perform_analysis(p, age_years, bmi, map_val, chol_map, gluc_map, chol, gluc, smoke, alco, active):
     try:
-        # Load Model
-        model = CardioRiskModel()
+        # Model bersama (lihat init_model)
+        model = get_model()
         
         # Prepare Data
         input_data = {
@@ -262,16 +359,11 @@ def perform_analysis(p, age_years, bmi, map_val, chol_map, gluc_map, chol, gluc,
         }
         
         # Predict
-        proba = model.predict_proba(input_data)
-        label = model.predict_label(input_data, threshold=0.5)
+        result = model.predict(input_data, threshold=0.5)
         shap_dict = model.get_shap_values(input_data)
-        shap_json = json.dumps(shap_dict)
         
         # Categories & Recommendations
-        risk_percent = proba * 100
-        if risk_percent < 30: risk_cat = "Rendah"
-        elif risk_percent < 60: risk_cat = "Sedang"
-        else: risk_cat = "Tinggi"
+        risk_cat = result.risk_category
         
         recs = []
         if risk_cat == "Tinggi":
@@ -308,20 +400,20 @@ def perform_analysis(p, age_years, bmi, map_val, chol_map, gluc_map, chol, gluc,
                 db=db,
                 checkup=checkup_data,
                 patient_id=p['id'],
-                probability=proba,
-                risk_label=label,
+                probability=result.probability,
+                risk_label=result.label,
                 risk_category=risk_cat,
-                model_version="monolith_v1",
+                model_version=result.model_version,
                 recommendations=recommendations_str,
-                shap_values=shap_json
+                shap_values=shap_dict
             )
             
             # Return dict format for frontend to render
             return {
-                "probability": proba,
+                "probability": result.probability,
                 "risk_category": risk_cat,
                 "recommendations": recommendations_str,
-                "shap_values": shap_json
+                "shap_values": shap_dict
             }
         finally:
             db.close()
@@ -386,29 +478,18 @@ with st.sidebar:
         st.markdown("#### Cari Pasien (Nama/RM)")
         search = st.text_input("Nama / MRN", placeholder="Ketik Nama / No RM...", label_visibility="collapsed")
         
-        db = SessionLocal()
         if search:
             with st.spinner("Mencari..."):
-                # Direct search to bypass module caching issues on Cloud
-                patients = db.query(models.Patient).filter(
-                    or_(
-                        models.Patient.full_name.contains(search),
-                        models.Patient.medical_record_number.contains(search)
-                    )
-                ).limit(20).all()
+                patients = cached_patient_search(search, checkup_versions())
                 
             if patients:
                 st.caption(f"Ditemukan {len(patients)} pasien:")
-                for p_obj in patients:
-                    p = p_obj.__dict__
+                for p, last_risk in patients:
                     
-                    # Fetch latest risk status for visualization
-                    last_checkups = crud.get_checkups_by_patient(db, p['id'], limit=1)
                     risk_icon = "⚪"
-                    if last_checkups:
-                        cat = last_checkups[0].risk_category
-                        if cat == "Tinggi": risk_icon = "🔴"
-                        elif cat == "Sedang": risk_icon = "🟡"
+                    if last_risk:
+                        if last_risk == "Tinggi": risk_icon = "🔴"
+                        elif last_risk == "Sedang": risk_icon = "🟡"
                         else: risk_icon = "🟢"
                     
                     # Format: [Icon] Name (MRN)
@@ -420,7 +501,6 @@ with st.sidebar:
                         st.rerun()
             else:
                 st.warning("Tidak ditemukan.")
-        db.close()
         
         st.markdown("---")
         with st.expander("Daftar Pasien Baru"):
@@ -468,9 +548,7 @@ with st.sidebar:
 if menu == "Dashboard":
     st.title("Dashboard Klinik")
     
-    db = SessionLocal()
-    stats = crud.get_checkup_stats(db)
-    db.close()
+    stats = cached_checkup_stats(checkup_versions())
     
     c1, c2, c3, c4 = st.columns(4)
     with c1: st.metric("Pasien Terdaftar", stats['total_patients'])
@@ -502,29 +580,11 @@ if menu == "Dashboard":
 elif menu == "Laporan":
     st.title("Laporan Data")
     
-    db = SessionLocal()
-    try:
-        all_checkups = crud.get_all_checkups(db)
-        
-        # Convert SQLAlchemy objects to Dict/DataFrame via Pydantic schema or direct dict
-        data_list = []
-        for c in all_checkups:
-            # Simple dict conversion
-            d = {k: v for k, v in c.__dict__.items() if not k.startswith('_')}
-            
-            # Add Patient Info (Lazy load from relationship - Safe here because session is open)
-            if c.patient:
-                d['Nama Pasien'] = c.patient.full_name
-                d['No RM'] = c.patient.medical_record_number
-            else:
-                d['Nama Pasien'] = "Unknown"
-                d['No RM'] = "-"
-                
-            data_list.append(d)
-    finally:
-        db.close()
-    
-    df = pd.DataFrame(data_list)
+    df = cached_checkup_report(checkup_versions())
+
+    df = df.rename(columns={'patient_name': 'Nama Pasien', 'medical_record_number': 'No RM'})
+    df['Nama Pasien'] = df['Nama Pasien'].fillna("Unknown")
+    df['No RM'] = df['No RM'].fillna("-")
     
     # Reorder columns
     if not df.empty and 'Nama Pasien' in df.columns:
@@ -553,9 +613,17 @@ elif menu == "Laporan":
             
         st.markdown(f"**Menampilkan {len(df)} data**")
         st.dataframe(df, use_container_width=True)
-        csv = df.to_csv(index=False).encode('utf-8')
         date_str = datetime.now().strftime("%Y%m%d")
-        st.download_button("Unduh Laporan Lengkap (.csv)", csv, f"Laporan_Klinik_{date_str}.csv", "text/csv", icon=":material/download:", type="primary")
+        # Laporan lengkap (semua checkup, tanpa batas 1000 baris tampilan)
+        if API_URL:
+            st.link_button("Unduh Laporan Lengkap (.csv)", f"{API_URL}/checkups/export?format=csv", icon=":material/download:", type="primary")
+        else:
+            # st.download_button butuh seluruh isi file: laporan digabung di
+            # memori saat tombol diklik. Untuk data besar set SIAGA_API_URL.
+            st.download_button("Unduh Laporan Lengkap (.csv)", lambda: b"".join(export.stream_report("csv")), f"Laporan_Klinik_{date_str}.csv", "text/csv", icon=":material/download:", type="primary")
+        if search_term or filter_risk:
+            csv = df.to_csv(index=False).encode('utf-8')
+            st.download_button("Unduh Data Terfilter (.csv)", csv, f"Laporan_Klinik_Filter_{date_str}.csv", "text/csv", icon=":material/download:")
     else:
         st.info("Belum ada data.")
 
@@ -622,42 +690,38 @@ if menu == "Pasien":
         with c_filter:
             filter_gender = st.selectbox("Gender", ["Semua", "Laki-laki (M)", "Perempuan (F)"], label_visibility="collapsed")
         with c_limit:
-            # Pagination Logic
-            if "patient_page" not in st.session_state: st.session_state.patient_page = 0
+            # Pagination Logic (keyset): patient_cursors[k] = id batas awal halaman k
             limit = 10
+            filter_key = (search_query, filter_gender)
+            if st.session_state.get("patient_filter_key") != filter_key:
+                st.session_state.patient_filter_key = filter_key
+                st.session_state.patient_page = 0
+                st.session_state.patient_cursors = [None]
             
         # --- Data Fetching ---
-        db = SessionLocal()
-        offset = st.session_state.patient_page * limit
-        
-        # Base Query
-        query = db.query(models.Patient)
-        
-        # Apply Search
-        if search_query:
-            query = query.filter(
-                or_(
-                    models.Patient.full_name.contains(search_query),
-                    models.Patient.medical_record_number.contains(search_query)
-                )
-            )
-            
-        # Apply Filter
+        g_code = None
         if filter_gender != "Semua":
             g_code = "M" if "M" in filter_gender else "F"
-            query = query.filter(models.Patient.gender == g_code)
-            
-        # Count Total for Pagination
-        total_patients = query.count()
+        current_page = st.session_state.patient_page
         
-        # Apply Pagination
-        patients = query.order_by(models.Patient.id.desc()).offset(offset).limit(limit).all()
-        db.close()
+        # Satu baris ekstra untuk mengetahui apakah ada halaman berikutnya
+        patients = cached_patient_page(
+            search_query or None, g_code, st.session_state.patient_cursors[current_page], limit + 1,
+            patient_versions()
+        )
+        has_next_page = len(patients) > limit
+        patients = patients[:limit]
+        if has_next_page and len(st.session_state.patient_cursors) == current_page + 1:
+            st.session_state.patient_cursors.append(patients[-1]['id'])
+        
+        # Total untuk paginator
+        total_patients = cached_patient_count(search_query or None, g_code, patient_versions())
+        total_pages = max((total_patients + limit - 1) // limit, current_page + 1)
         
         # --- Display Data ---
         if patients:
             # Stats Bar
-            st.caption(f"Menampilkan {len(patients)} dari {total_patients} pasien.")
+            st.caption(f"Menampilkan {len(patients)} dari {total_patients} pasien (halaman {current_page + 1} dari ±{total_pages}).")
             
             # Header
             st.markdown("""
@@ -669,8 +733,7 @@ if menu == "Pasien":
             </div>
             """, unsafe_allow_html=True)
             
-            for p_obj in patients:
-                p = p_obj.__dict__
+            for p in patients:
                 c1, c2, c3, c4 = st.columns([2, 1, 0.5, 1.5])
                 with c1: st.write(f"**{p['full_name']}**")
                 with c2: st.caption(p.get('medical_record_number', '-'))
@@ -694,14 +757,13 @@ if menu == "Pasien":
             st.markdown("<br>", unsafe_allow_html=True)
             
             # Helper to create numbered pagination
-            total_pages = (total_patients + limit - 1) // limit
-            current_page = st.session_state.patient_page
+            # Keyset: hanya halaman yang batasnya sudah diketahui (sudah dikunjungi + berikutnya)
+            known_pages = len(st.session_state.patient_cursors)
             
             # Show window of 5 pages
             max_buttons = 5
-            start_page = max(0, min(current_page - max_buttons // 2, total_pages - max_buttons))
-            start_page = max(0, start_page)
-            end_page = min(start_page + max_buttons, total_pages)
+            start_page = max(0, min(current_page - max_buttons // 2, known_pages - max_buttons))
+            end_page = min(start_page + max_buttons, known_pages)
             
             # Grid for buttons: Spacer + Prev + Numbers + Next + Spacer
             # We use a ratio where the middle content is small and compacted
@@ -734,7 +796,7 @@ if menu == "Pasien":
                         
             # Next (at last button position)
             with cols[-2]:
-                if st.button("Berikutnya", icon=":material/chevron_right:", disabled=(current_page >= total_pages - 1), key="btn_next_page"):
+                if st.button("Berikutnya", icon=":material/chevron_right:", disabled=not has_next_page, key="btn_next_page"):
                     st.session_state.patient_page += 1
                     st.rerun()
                         
@@ -763,11 +825,7 @@ if menu == "Pasien":
         tab1, tab2, tab3 = st.tabs(["Dashboard", "Pemeriksaan Baru", "Riwayat"])
         
         # Get History
-        db = SessionLocal()
-        hist = crud.get_checkups_by_patient(db, p['id'])
-        db.close()
-        
-        df_hist = pd.DataFrame([h.__dict__ for h in hist])
+        df_hist = cached_patient_history(p['id'], crud.data_version(crud.patient_checkups_scope(p['id'])))
         if not df_hist.empty:
             if 'created_at' in df_hist.columns:
                 df_hist['created_at'] = pd.to_datetime(df_hist['created_at'])
@@ -931,7 +989,7 @@ if menu == "Pasien":
                             if res.get('shap_values'):
                                 with st.expander("Lihat Detail Faktor Penentu (AI Explanation)"):
                                     try:
-                                        shap_data = json.loads(res['shap_values'])
+                                        shap_data = res['shap_values']
                                         if shap_data:
                                             sorted_shap = sorted(shap_data.items(), key=lambda x: abs(x[1]), reverse=True)
                                             shap_df = pd.DataFrame(sorted_shap, columns=['Faktor', 'Impact'])
@@ -0,0 +1,324 @@
+"""Endpoint batch & checkup lewat TestClient: bulk, writer, ekspor stream.
+
+Tidak butuh server (berbeda dengan test_api.py); database diarahkan ke file
+SQLite sementara. Jalankan dengan `python test_api_checkups.py` atau pytest.
+"""
+import csv
+import io
+import os
+import queue
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Database sementara, sebelum appheart diimpor (lewat pytest: conftest.py)
+if "appheart.database" not in sys.modules:
+    os.environ["SIAGA_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='siaga-test-')}/siaga_test.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from appheart import crud, export, models, schemas
+from appheart.api import main, predict
+from appheart.checkup_writer import CheckupWriter
+from appheart.database import SessionLocal, engine
+from ml.cardio_model import CardioRiskModel
+
+CHECKUP = {
+    "age_years": 52, "gender": 2, "bmi": 27.5, "map": 101.0, "cholesterol": 2,
+    "gluc": 1, "smoke": 0, "alco": 0, "active": 1, "checked_by_user_id": 1,
+}
+WAIT_SECONDS = 10
+
+client = TestClient(main.app)
+
+
+def add_patient(name="Pasien Uji"):
+    db = SessionLocal()
+    try:
+        patient = models.Patient(full_name=name, gender="F")
+        db.add(patient)
+        db.commit()
+        return patient.id
+    finally:
+        db.close()
+
+
+def count_checkups(**filters):
+    db = SessionLocal()
+    try:
+        return db.query(func.count(models.Checkup.id)).filter_by(**filters).scalar()
+    finally:
+        db.close()
+
+
+def checkup_exists(checkup_id):
+    return count_checkups(id=checkup_id) == 1
+
+
+def writer_kwargs(patient_id, **overrides):
+    """Argumen `crud.create_checkup` seperti yang dikirim endpoint ke writer."""
+    return dict(
+        checkup=schemas.CheckupCreate(**CHECKUP), patient_id=patient_id, probability=0.42,
+        risk_label=0, risk_category="Sedang", model_version="test", **overrides,
+    )
+
+
+def gated_session_factory():
+    """Session yang commit-nya menunggu `release`; `entered` di-set saat commit dimulai."""
+    entered, release = threading.Event(), threading.Event()
+
+    class GatedSession(Session):
+        def commit(self):
+            entered.set()
+            assert release.wait(WAIT_SECONDS), "commit gate never released"
+            super().commit()
+
+    return sessionmaker(bind=engine, class_=GatedSession, autoflush=False), entered, release
+
+
+# --- Predict batch ---
+
+def test_predict_batch_reports_per_row_errors():
+    features = {k: v for k, v in CHECKUP.items() if k != "checked_by_user_id"}
+    rows = [features, dict(features, map=None), dict(features, age_years=70, smoke=1)]
+    response = TestClient(predict.app).post("/predict/batch", json=rows)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [r["index"] for r in body["results"]] == [0, 2]
+    assert [e["index"] for e in body["errors"]] == [1] and "map" in body["errors"][0]["detail"]
+    model = CardioRiskModel()
+    for result in body["results"]:
+        expected = model.predict(rows[result["index"]])
+        assert abs(result["probability"] - expected.probability) <= 1e-6
+        assert (result["label"], result["risk_category"]) == (expected.label, expected.risk_category)
+
+
+# --- Bulk create ---
+
+def test_bulk_create_reports_per_row_errors():
+    pid = add_patient()
+    rows = [
+        dict(CHECKUP, patient_id=pid),
+        dict(CHECKUP, patient_id=pid, bmi="bukan angka"),
+        {k: v for k, v in dict(CHECKUP, patient_id=pid).items() if k != "gluc"},
+        dict(CHECKUP, patient_id=pid, age_years=3),
+        dict(CHECKUP, patient_id=10**9),
+        dict(CHECKUP, patient_id=pid, age_years=67, smoke=1),
+    ]
+    response = client.post("/patients/checkups/bulk", json=rows)
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert [r["index"] for r in body["results"]] == [0, 5]
+    assert [e["index"] for e in body["errors"]] == [1, 2, 3, 4]
+    errors = {e["index"]: e["detail"] for e in body["errors"]}
+    assert "bmi" in errors[1] and "gluc" in errors[2]
+    assert errors[3] == main.MIN_AGE_ERROR
+    assert errors[4] == "Patient not found"
+
+    model = CardioRiskModel()
+    for result in body["results"]:
+        checkup = result["checkup"]
+        assert checkup_exists(checkup["id"]) and checkup["patient_id"] == pid
+        features = {k: v for k, v in rows[result["index"]].items() if k in CHECKUP}
+        assert abs(checkup["probability"] - model.predict_proba(features)) <= 1e-6
+    assert count_checkups(patient_id=pid) == 2
+
+
+def test_bulk_create_with_only_invalid_rows_inserts_nothing():
+    pid = add_patient()
+    rows = [dict(CHECKUP, patient_id=pid, age_years=1), dict(CHECKUP, patient_id=10**9)]
+    response = client.post("/patients/checkups/bulk", json=rows)
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == []
+    assert [e["index"] for e in response.json()["errors"]] == [0, 1]
+    assert count_checkups(patient_id=pid) == 0
+
+
+def test_bulk_create_rejects_oversized_request():
+    pid = add_patient()
+    rows = [dict(CHECKUP, patient_id=pid)] * (main.MAX_BULK_ROWS + 1)
+    response = client.post("/patients/checkups/bulk", json=rows)
+    assert response.status_code == 413
+    assert count_checkups(patient_id=pid) == 0
+
+
+# --- Background writer (group commit) ---
+
+def test_writer_resolves_only_after_commit():
+    pid = add_patient()
+    factory, entered, release = gated_session_factory()
+    writer = CheckupWriter(flush_ms=50, session_factory=factory)
+    try:
+        futures = [writer.submit(**writer_kwargs(pid)) for _ in range(3)]
+        assert entered.wait(WAIT_SECONDS)
+        # Baris sudah di-flush tapi belum di-commit: belum ada yang selesai
+        assert not any(f.done() for f in futures)
+        assert count_checkups(patient_id=pid) == 0
+        release.set()
+        ids = [f.result(WAIT_SECONDS).id for f in futures]
+    finally:
+        release.set()
+        writer.close(WAIT_SECONDS)
+    assert len(set(ids)) == 3 and all(checkup_exists(i) for i in ids)
+    assert (writer.commits, writer.rows) == (1, 3)
+
+
+def test_writer_falls_back_to_per_row_inserts():
+    pid = add_patient()
+    writer = CheckupWriter(flush_ms=1000, max_batch=3)
+    try:
+        good = writer.submit(**writer_kwargs(pid))
+        bad = writer.submit(**writer_kwargs(pid, kolom_tidak_ada=1))
+        also_good = writer.submit(**writer_kwargs(pid))
+        error = bad.exception(WAIT_SECONDS)
+        also_good.result(WAIT_SECONDS)
+    finally:
+        writer.close(WAIT_SECONDS)
+    # Baca id setelah semua baris selesai: rollback baris rusak tidak boleh
+    # meng-expire checkup yang sudah di-commit sebelumnya.
+    ids = [good.result().id, also_good.result().id]
+    # Batch gagal -> diulang per baris: hanya baris rusak yang error
+    assert isinstance(error, TypeError), error
+    assert all(checkup_exists(i) for i in ids)
+    assert count_checkups(patient_id=pid) == 2
+    assert (writer.commits, writer.rows) == (2, 2)
+
+
+def test_writer_rejects_when_queue_is_full():
+    pid = add_patient()
+    factory, entered, release = gated_session_factory()
+    writer = CheckupWriter(queue_depth=1, flush_ms=0, session_factory=factory)
+    try:
+        in_flight = writer.submit(**writer_kwargs(pid))
+        assert entered.wait(WAIT_SECONDS)  # writer tertahan di commit
+        queued = writer.submit(**writer_kwargs(pid))
+        try:
+            writer.submit(**writer_kwargs(pid))
+            raise AssertionError("submit on a full queue did not raise queue.Full")
+        except queue.Full:
+            pass
+        release.set()
+        ids = [in_flight.result(WAIT_SECONDS).id, queued.result(WAIT_SECONDS).id]
+    finally:
+        release.set()
+        writer.close(WAIT_SECONDS)
+    assert all(checkup_exists(i) for i in ids)
+    assert count_checkups(patient_id=pid) == 2
+
+
+def test_api_uses_writer_and_returns_committed_id():
+    pid = add_patient()
+    writer = CheckupWriter(flush_ms=5)
+    try:
+        with mock.patch.object(main, "WRITER_ENABLED", True), mock.patch.object(main, "checkup_writer", writer):
+            response = client.post(f"/patients/{pid}/checkups/", json=CHECKUP)
+    finally:
+        writer.close(WAIT_SECONDS)
+    assert response.status_code == 200, response.text
+    assert checkup_exists(response.json()["id"])
+    assert writer.rows == 1
+
+
+def test_api_returns_503_when_writer_queue_is_full():
+    pid = add_patient()
+    writer = CheckupWriter()
+    with mock.patch.object(main, "WRITER_ENABLED", True), mock.patch.object(main, "checkup_writer", writer), \
+            mock.patch.object(writer, "submit", side_effect=queue.Full):
+        response = client.post(f"/patients/{pid}/checkups/", json=CHECKUP)
+    assert response.status_code == 503, response.text
+    assert count_checkups(patient_id=pid) == 0
+
+
+# --- Ekspor laporan ---
+
+EXPORT_ROWS = 2500
+EXPORT_CHUNK_ROWS = 700  # beberapa potongan / row group per ekspor
+
+
+def add_export_checkups(n=EXPORT_ROWS):
+    pid = add_patient("Pasien Ekspor")
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO checkups (patient_id, checked_by_user_id, age_years, gender, bmi, map, cholesterol, gluc, "
+                "smoke, alco, active, probability, risk_label, risk_category, model_version, created_at) "
+                "VALUES (:pid, 1, 50, 1, 24.0, 93.0, 1, 1, 0, 0, 1, 0.3, 0, 'Rendah', 'test', :ts)"
+            ),
+            [{"pid": pid, "ts": (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S.%f")} for i in range(n)],
+        )
+    return pid
+
+
+def all_checkup_ids():
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT id FROM checkups"))}
+
+
+def download_report(fmt, with_details=True):
+    real = export.stream_report
+    small_chunks = lambda fmt, with_details: real(fmt, with_details, chunk_rows=EXPORT_CHUNK_ROWS)
+    with mock.patch.object(export, "stream_report", small_chunks):
+        return client.get("/checkups/export", params={"format": fmt, "with_details": with_details})
+
+
+def test_csv_export_contains_every_row():
+    add_export_checkups()
+    response = download_report("csv")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    ids = {int(r["id"]) for r in rows}
+    assert len(rows) == len(ids) and ids == all_checkup_ids()
+    assert len(rows) >= EXPORT_ROWS > 1000
+    assert "patient_name" in rows[0] and "shap_bmi" in rows[0]
+    # Endpoint JSON lama tetap dibatasi 1000 baris; ekspor tidak
+    assert len(client.get("/checkups/").json()) == 1000
+
+
+def test_csv_export_without_details():
+    add_export_checkups(10)
+    response = download_report("csv", with_details=False)
+    assert response.status_code == 200, response.text
+    header = next(csv.reader(io.StringIO(response.text)))
+    assert not set(header) & set(crud.CHECKUP_DETAIL_COLUMNS)
+    assert len(response.text.splitlines()) == len(all_checkup_ids()) + 1
+
+
+def test_parquet_export_contains_every_row():
+    if not export.parquet_available():
+        print("SKIP parquet export (pyarrow not installed)")
+        return
+    import pyarrow.parquet as pq
+
+    add_export_checkups()
+    response = download_report("parquet")
+    assert response.status_code == 200, response.text
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    table = parquet.read()
+    ids = set(table.column("id").to_pylist())
+    assert table.num_rows == len(ids) and ids == all_checkup_ids()
+    assert parquet.num_row_groups > 1
+    assert table.schema.names == export._report_columns(True)
+
+
+def test_export_rejects_unknown_format():
+    assert client.get("/checkups/export", params={"format": "xlsx"}).status_code == 400
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,153 @@
+"""MicroBatcher: batas ukuran/waktu batch, mask SHAP, pembatalan dan error.
+
+Tidak butuh server; jalankan dengan `python test_batching.py` atau pytest.
+"""
+import asyncio
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from appheart.api import predict
+from appheart.api.batching import MicroBatcher, scoring_batcher
+from ml.cardio_model import get_model
+
+ROW = {"age_years": 52, "gender": 2, "bmi": 27.5, "map": 101.0, "cholesterol": 2,
+       "gluc": 1, "smoke": 0, "alco": 0, "active": 1}
+
+
+class FakeScorer:
+    """Pengganti `_score`: mencatat ukuran tiap batch, gagal untuk baris `bad`."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows, shap_mask):
+        self.calls.append([row["id"] for row in rows])
+        if any(row.get("bad") for row in rows):
+            raise ValueError("baris rusak")
+        return [(row["id"], wanted) for row, wanted in zip(rows, shap_mask)]
+
+
+def batcher_with_fake(**kwargs):
+    batcher = MicroBatcher(**kwargs)
+    fake = FakeScorer()
+    batcher._score = fake
+    return batcher, fake
+
+
+async def submit_all(batcher, rows, with_shap=False):
+    return await asyncio.gather(
+        *(batcher.submit(row, with_shap=with_shap) for row in rows), return_exceptions=True
+    )
+
+
+def test_batches_respect_max_batch_size():
+    batcher, fake = batcher_with_fake(max_wait_ms=50, max_batch_size=4)
+    results = asyncio.run(submit_all(batcher, [{"id": i} for i in range(10)]))
+    assert results == [(i, False) for i in range(10)]
+    assert [len(c) for c in fake.calls] == [4, 4, 2]
+    assert (batcher.batches, batcher.rows) == (3, 10)
+
+
+def test_batches_respect_max_wait():
+    batcher, fake = batcher_with_fake(max_wait_ms=20, max_batch_size=64)
+
+    async def scenario():
+        first = asyncio.ensure_future(batcher.submit({"id": 0}))
+        await asyncio.sleep(0.2)  # jauh melewati max_wait: batch pertama sudah jalan
+        second = await batcher.submit({"id": 1})
+        return await first, second
+
+    assert asyncio.run(scenario()) == ((0, False), (1, False))
+    assert fake.calls == [[0], [1]]
+
+
+def test_mixed_shap_mask_matches_model():
+    model = get_model()
+    rows = [dict(ROW, age_years=40 + 5 * i, smoke=i % 2) for i in range(6)]
+    batcher = MicroBatcher(max_wait_ms=50, max_batch_size=64)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(row, with_shap=i % 2 == 0) for i, row in enumerate(rows)))
+
+    results = asyncio.run(scenario())
+    assert batcher.batches == 1
+    for i, (row, (prediction, shap_values)) in enumerate(zip(rows, results)):
+        assert abs(prediction.probability - model.predict_proba(row)) <= 1e-6
+        if i % 2:
+            assert shap_values is None
+        else:
+            expected = model.get_shap_values(row)
+            assert list(shap_values) == list(expected)
+            assert np.allclose(list(shap_values.values()), list(expected.values()), atol=1e-9)
+
+
+def test_cancelled_request_does_not_break_batch():
+    batcher, fake = batcher_with_fake(max_wait_ms=50, max_batch_size=64)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(batcher.submit({"id": i})) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        done = await asyncio.gather(*tasks, return_exceptions=True)
+        # Worker tetap hidup untuk request berikutnya
+        return done, await batcher.submit({"id": 3})
+
+    done, later = asyncio.run(scenario())
+    assert done[0] == (0, False) and done[2] == (2, False)
+    assert isinstance(done[1], asyncio.CancelledError)
+    assert later == (3, False)
+
+
+def test_scoring_error_reaches_every_waiter():
+    batcher, fake = batcher_with_fake(max_wait_ms=50, max_batch_size=64)
+    results = asyncio.run(submit_all(batcher, [{"id": i, "bad": True} for i in range(3)]))
+    assert all(isinstance(r, ValueError) for r in results), results
+    assert batcher.rows == 0
+
+
+def test_failing_row_is_retried_alone():
+    batcher, fake = batcher_with_fake(max_wait_ms=50, max_batch_size=64)
+    rows = [{"id": 0}, {"id": 1, "bad": True}, {"id": 2}, {"id": 3}]
+    results = asyncio.run(submit_all(batcher, rows))
+    assert results[0] == (0, False) and results[2] == (2, False) and results[3] == (3, False)
+    assert isinstance(results[1], ValueError)
+    # Satu batch gagal, lalu diulang per baris
+    assert fake.calls == [[0, 1, 2, 3], [0], [1], [2], [3]]
+    assert batcher.rows == 3
+
+
+def test_new_event_loop_gets_a_fresh_worker():
+    # TestClient dan asyncio.run masing-masing memakai event loop sendiri;
+    # worker & antrian lama terikat ke loop yang sudah ditutup.
+    expected = get_model().predict_proba(ROW)
+    first, _ = asyncio.run(scoring_batcher.submit(dict(ROW)))
+    old_worker = scoring_batcher._worker
+    with TestClient(predict.app) as client:
+        response = client.post("/predict", json=ROW)
+    assert response.status_code == 200, response.text
+    second, _ = asyncio.run(scoring_batcher.submit(dict(ROW)))
+    assert scoring_batcher._worker is not old_worker
+    for probability in (first.probability, response.json()["probability"], second.probability):
+        assert abs(probability - expected) <= 1e-6
+
+
+def test_rejects_empty_batch_size():
+    try:
+        MicroBatcher(max_batch_size=0)
+    except ValueError:
+        return
+    raise AssertionError("max_batch_size=0 was accepted")
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,160 @@
+"""Migrasi database lama: SHAP string JSON (`checkups.shap_values`) ke kolom `shap_*`.
+
+Skema dibuat persis seperti versi sebelum migrasi (DDL mentah), diisi SHAP
+JSON valid, sebagian, rusak dan NULL, lalu `migrate.upgrade` dijalankan.
+Kolom lama harus tetap ada (rollback) sampai `drop_legacy_shap` dipanggil.
+
+Tidak butuh server; memakai file SQLite sementara sendiri. Jalankan dengan
+`python test_migrate_shap.py` atau pytest.
+"""
+import json
+import math
+import os
+import sys
+import tempfile
+
+# Database sementara, sebelum appheart diimpor (lewat pytest: conftest.py)
+if "appheart.database" not in sys.modules:
+    os.environ["SIAGA_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='siaga-test-')}/siaga_test.db"
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from appheart import migrate, models
+from ml.cardio_model import SHAP_FEATURE_NAMES
+
+# Skema sebelum kolom shap_* (appheart/models.py versi lama)
+BASELINE_DDL = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, name VARCHAR, email VARCHAR UNIQUE, password_hash VARCHAR,
+        role VARCHAR, created_at DATETIME, updated_at DATETIME
+    )""",
+    """CREATE TABLE patients (
+        id INTEGER PRIMARY KEY, medical_record_number VARCHAR UNIQUE, full_name VARCHAR,
+        date_of_birth VARCHAR, gender VARCHAR, phone VARCHAR, address VARCHAR,
+        is_active BOOLEAN, created_at DATETIME, updated_at DATETIME
+    )""",
+    """CREATE TABLE checkups (
+        id INTEGER PRIMARY KEY, patient_id INTEGER REFERENCES patients (id),
+        checked_by_user_id INTEGER REFERENCES users (id),
+        age_years INTEGER, gender INTEGER, bmi FLOAT, map FLOAT, cholesterol INTEGER,
+        gluc INTEGER, smoke INTEGER, alco INTEGER, active INTEGER,
+        probability FLOAT, risk_label INTEGER, risk_category VARCHAR, model_version VARCHAR,
+        notes VARCHAR, recommendations VARCHAR, shap_values VARCHAR, created_at DATETIME
+    )""",
+]
+
+FULL = {label: round(0.1 * (i + 1) - 0.45, 3) for i, label in enumerate(SHAP_FEATURE_NAMES)}
+PARTIAL = {SHAP_FEATURE_NAMES[0]: 0.25, SHAP_FEATURE_NAMES[3]: -0.5}
+# shap_values lama -> dict yang diharapkan dari Checkup.shap_values (None = tanpa SHAP)
+LEGACY_ROWS = [
+    (json.dumps(FULL), FULL),
+    (json.dumps(PARTIAL), PARTIAL),
+    ("{bukan json", None),
+    (None, None),
+    ("null", None),
+    ("[1, 2]", None),
+]
+
+
+def baseline_engine():
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp(prefix='siaga-migrate-')}/legacy.db")
+    with engine.begin() as conn:
+        for ddl in BASELINE_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO patients (id, full_name, gender) VALUES (1, 'Pasien Lama', 'F')"))
+        for raw, _ in LEGACY_ROWS:
+            insert_legacy_checkup(conn, raw)
+    return engine
+
+
+def insert_legacy_checkup(conn, raw):
+    """INSERT seperti kode versi lama: SHAP hanya di kolom JSON."""
+    return conn.execute(
+        text(
+            "INSERT INTO checkups (patient_id, age_years, gender, bmi, map, cholesterol, gluc, smoke, alco,"
+            " active, probability, risk_label, risk_category, model_version, shap_values, created_at)"
+            " VALUES (1, 50, 1, 25.0, 95.0, 1, 1, 0, 0, 1, 0.3, 0, 'Rendah', 'old', :raw, '2024-05-01 08:00:00')"
+        ),
+        {"raw": raw},
+    ).lastrowid
+
+
+def checkup_columns(engine):
+    return {col["name"] for col in inspect(engine).get_columns("checkups")}
+
+
+def api_shap(engine):
+    """{id: dict dari Checkup.shap_values (JSON API)} lewat ORM."""
+    with Session(engine) as db:
+        return {
+            c.id: json.loads(c.shap_values) if c.shap_values is not None else None
+            for c in db.query(models.Checkup).order_by(models.Checkup.id)
+        }
+
+
+def assert_shap_equal(got, expected):
+    if expected is None:
+        assert got is None, got
+        return
+    assert list(got) == [label for label in SHAP_FEATURE_NAMES if label in expected], got
+    for label, value in expected.items():
+        assert math.isclose(got[label], value, rel_tol=1e-6), (label, got[label], value)
+
+
+def test_upgrade_copies_json_into_columns():
+    engine = baseline_engine()
+    created = migrate.upgrade(engine)
+    columns = checkup_columns(engine)
+    assert set(models.SHAP_COLUMNS) <= columns
+    assert "checkups.shap_values -> shap_*" in created
+    for (_, expected), got in zip(LEGACY_ROWS, api_shap(engine).values()):
+        assert_shap_equal(got, expected)
+    with engine.connect() as conn:
+        row = conn.execute(text(f"SELECT {', '.join(models.SHAP_COLUMNS)} FROM checkups WHERE id = 1")).one()
+    assert all(math.isclose(v, FULL[label], rel_tol=1e-6) for v, label in zip(row, SHAP_FEATURE_NAMES))
+
+
+def test_upgrade_keeps_legacy_column_and_is_idempotent():
+    engine = baseline_engine()
+    migrate.upgrade(engine)
+    assert migrate.LEGACY_SHAP_COLUMN in checkup_columns(engine)
+    with engine.connect() as conn:
+        raw = conn.execute(text("SELECT shap_values FROM checkups ORDER BY id")).scalars().all()
+    assert raw == [r for r, _ in LEGACY_ROWS]
+    # Tidak ada yang disalin ulang; JSON rusak tetap kosong
+    assert migrate.upgrade(engine) == []
+
+
+def test_rows_written_after_rollback_are_copied():
+    engine = baseline_engine()
+    migrate.upgrade(engine)
+    with engine.begin() as conn:
+        new_id = insert_legacy_checkup(conn, json.dumps(PARTIAL))
+    assert api_shap(engine)[new_id] is None
+    assert "checkups.shap_values -> shap_*" in migrate.upgrade(engine)
+    assert_shap_equal(api_shap(engine)[new_id], PARTIAL)
+
+
+def test_drop_legacy_shap_is_explicit():
+    engine = baseline_engine()
+    migrate.upgrade(engine)
+    before = api_shap(engine)
+    assert migrate.drop_legacy_shap(engine)
+    assert migrate.LEGACY_SHAP_COLUMN not in checkup_columns(engine)
+    assert api_shap(engine) == before
+    assert not migrate.drop_legacy_shap(engine)
+    assert migrate.upgrade(engine) == []
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,256 @@
+"""Jalur inferensi cepat harus memberi angka yang sama dengan referensi.
+
+Referensi: `pipeline.predict_proba` dari best_xgb_pipeline.joblib yang dimuat
+terpisah dari `CardioRiskModel`, dan `shap.TreeExplainer`. Yang diuji:
+evaluator pohon NumPy, TreeSHAP tervektorisasi, lookup engine, format slim,
+method batch `CardioRiskModel` untuk input ndarray, DataFrame dan list of
+dict, jalur `LoadedModel` per ukuran batch, serta fallback bila jalur cepat
+tidak tersedia / ditolak.
+
+Tidak butuh server; jalankan dengan `python test_model_equivalence.py` atau pytest.
+"""
+import copy
+from functools import lru_cache
+from unittest import mock
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ml import cardio_model as cm
+from ml.compiled_trees import CompiledTreeEnsemble, random_feature_matrix
+from ml.lookup_engine import build_lookup_engine
+from ml.tree_shap import build_explainer
+
+PROBA_ATOL = 1e-6
+# shap.TreeExplainer menghitung dalam float32
+SHAP_ATOL = 1e-4
+N_ROWS = 2000
+
+
+@lru_cache(maxsize=None)
+def reference_pipeline():
+    return joblib.load(cm.MODEL_PATH)
+
+
+@lru_cache(maxsize=None)
+def reference_explainer():
+    import shap
+
+    return shap.TreeExplainer(cm.extract_classifier(reference_pipeline()))
+
+
+@lru_cache(maxsize=None)
+def reference_trees():
+    return CompiledTreeEnsemble.from_booster(cm.extract_classifier(reference_pipeline()))
+
+
+def rows(n=N_ROWS, seed=1):
+    """Input acak + nilai tepat di threshold pohon (kasus tepi `x < t`)."""
+    X = random_feature_matrix(n, seed)
+    ens = reference_trees()
+    rng = np.random.default_rng(seed)
+    split = ens.left >= 0
+    for f in range(X.shape[1]):
+        thresholds = np.unique(ens.threshold[split & (ens.feature == f)])
+        if len(thresholds):
+            X[: n // 4, f] = rng.choice(thresholds, n // 4)
+    return X
+
+
+def fresh_state(model_format="pipeline"):
+    """`LoadedModel` baru (di luar singleton) yang dimuat dengan `model_format`."""
+    with mock.patch.object(cm, "MODEL_FORMAT", model_format):
+        return cm.LoadedModel()
+
+
+@lru_cache(maxsize=None)
+def pipeline_state():
+    return fresh_state("pipeline")
+
+
+def expected_proba(X):
+    return reference_pipeline().predict_proba(X)[:, 1]
+
+
+def expected_shap(X):
+    values = reference_explainer().shap_values(X)
+    return np.asarray(values[1] if isinstance(values, list) else values)
+
+
+def test_compiled_trees_match_pipeline():
+    X = rows()
+    ens = pipeline_state().fast_trees
+    assert ens is not None, "compiled tree fast path was rejected for the shipped model"
+    assert np.allclose(ens.predict_proba(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_compiled_trees_handle_missing_values():
+    X = rows(200)
+    X[::3, 2] = np.nan
+    X[1::3, 3] = np.nan
+    ens = pipeline_state().fast_trees
+    assert np.allclose(ens.predict_proba(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_shipped_trees_match_pipeline():
+    X = rows()
+    ens = CompiledTreeEnsemble.load(cm.TREES_PATH)
+    assert np.allclose(ens.predict_proba(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_vectorized_treeshap_matches_shap():
+    X = rows(500)
+    explainer = pipeline_state().tree_explainer
+    assert explainer is not None, "vectorized TreeSHAP was not built for the shipped model"
+    assert np.allclose(explainer.shap_values(X), expected_shap(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_vectorized_treeshap_handles_missing_values():
+    X = rows(200)
+    X[::3, 2] = np.nan
+    X[1::3, 3] = np.nan
+    explainer = pipeline_state().tree_explainer
+    assert np.allclose(explainer.shap_values(X), expected_shap(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_treeshap_sums_to_margin():
+    X = rows(500)
+    state = pipeline_state()
+    sv = state.tree_explainer.shap_values(X)
+    base = reference_explainer().expected_value
+    assert np.allclose(sv.sum(axis=1) + base, state.fast_trees.predict_margin(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_lookup_engine_matches_pipeline():
+    engine = build_lookup_engine(reference_trees(), len(cm.FEATURE_COLUMNS))
+    assert engine is not None
+    X = rows()
+    assert np.allclose(engine.predict_proba(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_state_lookup_falls_back_on_missing_values():
+    with mock.patch.object(cm, "USE_LOOKUP_ENGINE", True):
+        state = fresh_state()
+    assert state.lookup is not None
+    state.cache = None
+    X = rows(50)
+    assert np.allclose(state.predict_matrix(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+    X[::2, 3] = np.nan
+    assert np.allclose(state.predict_matrix(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_state_paths_match_pipeline_for_every_batch_size():
+    # 1 & 16 baris: evaluator pohon; 500: booster.inplace_predict
+    state = pipeline_state()
+    assert state.booster is not None
+    for n in (1, cm.FAST_PATH_MAX_ROWS, 500):
+        X = rows(n, seed=n)
+        assert np.allclose(state.predict_uncached(X), expected_proba(X), atol=PROBA_ATOL, rtol=0), n
+
+
+def test_fallback_without_fast_paths():
+    state = copy.copy(pipeline_state())
+    state.fast_trees = state.booster = state.lookup = state.tree_explainer = state.cache = None
+    X = rows(300)
+    assert np.allclose(state.predict_matrix(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+    assert np.allclose(state.shap_matrix(X), expected_shap(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_mismatched_trees_are_rejected():
+    # Ensemble yang berbeda dari pipeline tidak boleh dipakai (fast path & TreeSHAP)
+    bad = CompiledTreeEnsemble.from_booster(cm.extract_classifier(reference_pipeline()))
+    bad.value = bad.value * 1.5
+    bad._flatten()
+    with mock.patch.object(CompiledTreeEnsemble, "load", return_value=bad), \
+            mock.patch.object(CompiledTreeEnsemble, "from_booster", return_value=bad):
+        state = fresh_state()
+    assert state.fast_trees is None and state.tree_explainer is None
+    X = rows(300)
+    assert np.allclose(state.predict_uncached(X[:10]), expected_proba(X[:10]), atol=PROBA_ATOL, rtol=0)
+    assert np.allclose(state.predict_uncached(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+    assert np.allclose(state.shap_uncached(X), expected_shap(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_slim_format_matches_pipeline():
+    state = fresh_state("slim")
+    assert state.pipeline is None
+    X = rows(500)
+    assert np.allclose(state.predict_matrix(X), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+    assert np.allclose(state.shap_matrix(X), expected_shap(X), atol=SHAP_ATOL, rtol=0)
+
+
+def test_build_helpers_accept_missing_ensemble():
+    assert build_explainer(None, len(cm.FEATURE_COLUMNS)) is None
+    assert build_lookup_engine(None, len(cm.FEATURE_COLUMNS)) is None
+
+
+def test_batch_methods_match_reference():
+    model = cm.CardioRiskModel()
+    X = rows(300)
+    frame = pd.DataFrame(X, columns=cm.FEATURE_COLUMNS)
+    records = frame.to_dict("records")
+    expected = expected_proba(X)
+    for data in (X, frame, records):
+        assert np.allclose(model.predict_proba_batch(data), expected, atol=PROBA_ATOL, rtol=0)
+    assert np.array_equal(model.predict_label_batch(X), (expected >= 0.5).astype(int))
+
+    predictions = model.predict_batch(records)
+    assert [p.risk_category for p in predictions] == [cm.risk_category(p) for p in expected]
+    assert [p.label for p in predictions] == [int(p >= 0.5) for p in expected]
+
+    sv, names = model.explain_batch(X)
+    assert names == cm.SHAP_FEATURE_NAMES
+    assert np.allclose(sv, expected_shap(X), atol=SHAP_ATOL, rtol=0)
+    per_row = model.get_shap_values_batch(records[:20])
+    assert all(list(d) == cm.SHAP_FEATURE_NAMES for d in per_row)
+    assert np.allclose([list(d.values()) for d in per_row], sv[:20], atol=1e-9, rtol=0)
+
+
+def test_batch_accepts_shuffled_frame_columns():
+    model = cm.CardioRiskModel()
+    X = rows(50)
+    frame = pd.DataFrame(X, columns=cm.FEATURE_COLUMNS)[list(reversed(cm.FEATURE_COLUMNS))]
+    assert np.allclose(model.predict_proba_batch(frame), expected_proba(X), atol=PROBA_ATOL, rtol=0)
+
+
+def test_single_row_matches_batch():
+    model = cm.CardioRiskModel()
+    X = rows(20, seed=7)
+    batch = model.predict_proba_batch(X)
+    for row, proba in zip(X, batch):
+        data = dict(zip(cm.FEATURE_COLUMNS, row))
+        assert abs(model.predict_proba(data) - proba) <= PROBA_ATOL
+        assert abs(model.predict(data).probability - proba) <= PROBA_ATOL
+
+
+def test_empty_batch():
+    model = cm.CardioRiskModel()
+    empty = np.empty((0, len(cm.FEATURE_COLUMNS)))
+    assert model.predict_proba_batch(empty).shape == (0,)
+    assert model.predict_label_batch([]).shape == (0,)
+    assert model.predict_batch(empty) == []
+    assert model.get_shap_values_batch(empty) == []
+    assert model.explain_batch(empty)[0].shape == (0, len(cm.FEATURE_COLUMNS))
+
+
+def test_batch_rejects_wrong_shape():
+    model = cm.CardioRiskModel()
+    try:
+        model.predict_proba_batch(np.zeros((3, len(cm.FEATURE_COLUMNS) - 1)))
+    except ValueError:
+        return
+    raise AssertionError("array with a missing column was accepted")
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,108 @@
+"""Keyset pagination riwayat checkup: berjalan sampai habis tanpa ulang / lompat.
+
+Tidak butuh server; jalankan dengan `python test_pagination.py` atau pytest.
+"""
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from appheart import crud, models
+from appheart.migrate import upgrade
+
+PATIENT_ID = 1
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    upgrade(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.Patient(id=PATIENT_ID, full_name="Pasien Uji", gender="F"))
+    db.commit()
+    return db
+
+
+def add_checkups(db, stamps):
+    """Checkup dengan `created_at` mentah (string) agar format penyimpanan bisa dicampur."""
+    for stamp in stamps:
+        db.execute(
+            text("INSERT INTO checkups (patient_id, risk_category, created_at) VALUES (:pid, 'Rendah', :ts)"),
+            {"pid": PATIENT_ID, "ts": stamp},
+        )
+    db.commit()
+
+
+def walk(db, limit):
+    """Ikuti cursor (created_at, id) seperti API sampai halaman kosong."""
+    seen, after = [], None
+    for _ in range(100):
+        page = crud.get_checkups_by_patient(db, PATIENT_ID, limit=limit, after=after)
+        if not page:
+            return seen
+        seen.extend(c.id for c in page)
+        after = (page[-1].created_at, page[-1].id)
+    raise AssertionError(f"pagination did not terminate: {seen[:20]}")
+
+
+def check_walks(db):
+    expected = [c.id for c in crud.get_checkups_by_patient(db, PATIENT_ID, limit=1000)]
+    for limit in (1, 2, 3, 100):
+        assert walk(db, limit) == expected, limit
+    return expected
+
+
+def test_walks_to_end_with_ties():
+    db = make_session()
+    add_checkups(db, ["2024-05-01 08:00:00.000000"] * 3 + ["2024-05-02 09:30:00.250000", "2024-04-30 23:59:59.999999"])
+    assert len(check_walks(db)) == 5
+
+
+def test_walks_to_end_without_microseconds():
+    # Penulis lama menyimpan `str(datetime)`: tanpa ".000000" bila mikrodetik 0
+    db = make_session()
+    add_checkups(db, ["2024-05-01 08:00:00", "2024-05-01 08:00:00", "2024-05-03 10:00:00", "2024-04-01 07:00:00"])
+    assert len(check_walks(db)) == 4
+
+
+def test_walks_to_end_with_orm_rows():
+    db = make_session()
+    for created_at in (datetime(2024, 6, 1, 12, 0), datetime(2024, 6, 1, 12, 0), datetime(2024, 6, 2, 8, 15, 30, 123456)):
+        db.add(models.Checkup(patient_id=PATIENT_ID, risk_category="Sedang", created_at=created_at))
+    db.commit()
+    add_checkups(db, ["2024-06-01 12:00:00"])
+    assert len(check_walks(db)) == 4
+
+
+def test_deleted_cursor_row_falls_back_to_timestamp():
+    db = make_session()
+    add_checkups(db, [f"2024-05-0{day} 08:00:00.000000" for day in range(1, 6)])
+    first = crud.get_checkups_by_patient(db, PATIENT_ID, limit=2)
+    after = (first[-1].created_at, first[-1].id)
+    db.execute(text("DELETE FROM checkups WHERE id = :id"), {"id": first[-1].id})
+    db.commit()
+    rest = crud.get_checkups_by_patient(db, PATIENT_ID, limit=100, after=after)
+    assert [c.created_at.day for c in rest] == [3, 2, 1]
+
+
+def test_latest_risk_pages_cover_every_patient_once():
+    db = make_session()
+    # Id tidak berurutan dengan urutan insert, agar urutan fisik tabel berbeda
+    for pid in (40, 7, 23, 3, 15, 31, 12):
+        db.add(models.Patient(id=pid, full_name=f"Pasien {pid}", gender="M"))
+    db.commit()
+    pages = [crud.get_patients_with_latest_risk(db, skip=skip, limit=3) for skip in range(0, 9, 3)]
+    ids = [p.id for page in pages for p, _ in page]
+    assert ids == sorted(ids) and len(ids) == len(set(ids)) == 8, ids
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
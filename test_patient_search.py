@@ -0,0 +1,201 @@
+"""Pencarian pasien lewat indeks FTS5 trigram (`appheart.patient_search`).
+
+Yang diuji: `match_clause` sama hasilnya dengan `contains`, filter nama saja
+untuk `crud.get_patients(name=)`, tingkat & urutan `ranked_search`, keyset
+(score, id), fallback LIKE untuk query < 3 karakter, dan trigger yang menjaga
+patients_fts tetap sinkron saat insert / update / delete.
+
+Tidak butuh server; memakai file SQLite sementara sendiri. Jalankan dengan
+`python test_patient_search.py` atau pytest.
+"""
+import os
+import sys
+import tempfile
+
+# Database sementara, sebelum appheart diimpor (lewat pytest: conftest.py)
+if "appheart.database" not in sys.modules:
+    os.environ["SIAGA_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='siaga-test-')}/siaga_test.db"
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from appheart import crud, models, patient_search
+from appheart.patient_search import TIER_EXACT_MRN, TIER_FUZZY, TIER_GAP, TIER_PREFIX, TIER_SUBSTRING
+
+engine = create_engine(f"sqlite:///{tempfile.mkdtemp(prefix='siaga-search-')}/search.db")
+models.Base.metadata.create_all(bind=engine)
+assert patient_search.ensure_search_index(engine), "FTS5 trigram is not available in this SQLite build"
+Session = sessionmaker(bind=engine, autoflush=False)
+
+PATIENTS = [
+    ("Dewi Lestari", "SANTOSO"),
+    ("Santoso Wibowo", "RM-0001"),
+    ("Budi Santoso", "RM-0002"),
+    ("Agus Santosa", "RM-0003"),
+    ("Rina Marlina", "RM-0004"),
+    ("Santoso Wibowo", "RM-0005"),
+    ("Siti 100% Aman", 'RM-"Q"'),
+    ("An Nisa", "RM-AN01"),
+]
+
+
+def session_with_patients(patients=PATIENTS):
+    """Session dengan tabel patients berisi `patients` saja. Return (db, ids)."""
+    db = Session()
+    db.query(models.Patient).delete()
+    added = [models.Patient(full_name=name, medical_record_number=mrn, gender="F") for name, mrn in patients]
+    db.add_all(added)
+    db.commit()
+    return db, [p.id for p in added]
+
+
+def matched_ids(db, clause):
+    return sorted(pid for pid, in db.query(models.Patient.id).filter(clause))
+
+
+def contains_ids(db, q, columns=patient_search.SEARCH_COLUMNS):
+    q = q.strip()
+    return sorted(
+        p.id for p in db.query(models.Patient).all()
+        if any(q.lower() in (getattr(p, name) or "").lower() for name in columns)
+    )
+
+
+def fts_ids(db, q):
+    rows = db.execute(text("SELECT rowid FROM patients_fts WHERE patients_fts MATCH :q"), {"q": f'"{q}"'})
+    return sorted(r[0] for r in rows)
+
+
+def test_match_clause_equals_contains():
+    db, _ = session_with_patients()
+    try:
+        for q in ("santoso", "SANTOS", "  wibowo ", "rm-000", "100%", 'RM-"Q', "tidak ada", "an", "i"):
+            assert matched_ids(db, patient_search.match_clause(db, q)) == contains_ids(db, q), q
+    finally:
+        db.close()
+
+
+def test_match_clause_name_only():
+    db, ids = session_with_patients()
+    try:
+        name_only = ("full_name",)
+        for q in ("santoso", "rm-000", "an"):
+            clause = patient_search.match_clause(db, q, columns=name_only)
+            assert matched_ids(db, clause) == contains_ids(db, q, name_only), q
+        # "SANTOSO" adalah No RM Dewi Lestari: tidak ikut pada pencarian nama
+        assert ids[0] not in [p.id for p in crud.get_patients(db, name="santoso")]
+        assert crud.get_patients(db, name="rm-000") == []
+        assert [p.id for p in crud.get_patients(db, name="santoso")] == [ids[1], ids[2], ids[5]]
+    finally:
+        db.close()
+
+
+def test_ranked_search_tiers_and_order():
+    db, ids = session_with_patients()
+    try:
+        ranked = patient_search.ranked_search(db, "santoso", limit=20)
+        assert [pid for pid, _ in ranked] == [ids[0], ids[1], ids[5], ids[2], ids[3]]
+        tiers = [round(score / TIER_GAP) for _, score in ranked]
+        assert tiers == [TIER_EXACT_MRN, TIER_PREFIX, TIER_PREFIX, TIER_SUBSTRING, TIER_FUZZY]
+        scores = [score for _, score in ranked]
+        assert scores == sorted(scores)
+        # Dua nama identik: score sama, urut id
+        assert ranked[1][1] == ranked[2][1]
+    finally:
+        db.close()
+
+
+def test_ranked_search_skips_fuzzy_when_page_is_full():
+    db, ids = session_with_patients()
+    try:
+        ranked = patient_search.ranked_search(db, "santoso", limit=3)
+        assert [pid for pid, _ in ranked] == [ids[0], ids[1], ids[5]]
+    finally:
+        db.close()
+
+
+def test_keyset_pages_cover_all_results_once():
+    db, _ = session_with_patients()
+    try:
+        full = patient_search.ranked_search(db, "santoso", limit=20)
+        for page_size in (1, 2, 3):
+            seen, after = [], None
+            while True:
+                page = patient_search.ranked_search(db, "santoso", limit=page_size, after=after)
+                seen += page
+                if len(page) < page_size:
+                    break
+                after = (page[-1][1], page[-1][0])
+            assert seen == full, page_size
+    finally:
+        db.close()
+
+
+def test_search_patients_page_cursor():
+    db, ids = session_with_patients()
+    try:
+        patients, after = crud.search_patients_page(db, "santoso", limit=2)
+        assert [p.id for p in patients] == [ids[0], ids[1]]
+        assert after is not None
+        patients, after = crud.search_patients_page(db, "santoso", limit=3, after=after)
+        assert [p.id for p in patients] == [ids[5], ids[2], ids[3]]
+        assert after is None
+    finally:
+        db.close()
+
+
+def test_short_query_falls_back_to_like():
+    db, ids = session_with_patients()
+    try:
+        q = "an"
+        assert len(q) < patient_search.MIN_TRIGRAM_QUERY
+        expected = contains_ids(db, q)
+        ranked = patient_search.ranked_search(db, q, limit=20)
+        assert [pid for pid, _ in ranked] == expected
+        assert all(score == 0.0 for _, score in ranked)
+        # Keyset fallback: lanjut setelah id
+        after = (0.0, expected[1])
+        assert [pid for pid, _ in patient_search.ranked_search(db, q, limit=20, after=after)] == expected[2:]
+    finally:
+        db.close()
+
+
+def test_triggers_keep_index_in_sync():
+    db, ids = session_with_patients([("Rina Marlina", "RM-0004")])
+    try:
+        assert fts_ids(db, "marlina") == ids
+        patient = db.get(models.Patient, ids[0])
+        patient.full_name = "Rina Kartika"
+        db.commit()
+        assert fts_ids(db, "marlina") == []
+        assert fts_ids(db, "kartika") == ids
+        patient.medical_record_number = "RM-9999"
+        db.commit()
+        assert fts_ids(db, "rm-0004") == [] and fts_ids(db, "rm-9999") == ids
+
+        # Insert lewat SQL mentah juga terindeks
+        db.execute(text("INSERT INTO patients (full_name, medical_record_number, gender) VALUES ('Yusuf Hakim', NULL, 'M')"))
+        db.commit()
+        raw_id = db.execute(text("SELECT id FROM patients WHERE full_name = 'Yusuf Hakim'")).scalar()
+        assert fts_ids(db, "hakim") == [raw_id]
+
+        db.delete(patient)
+        db.commit()
+        assert fts_ids(db, "kartika") == [] and fts_ids(db, "rm-9999") == []
+        integrity = db.execute(text("INSERT INTO patients_fts(patients_fts, rank) VALUES ('integrity-check', 1)"))
+        integrity.close()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
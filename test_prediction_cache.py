@@ -0,0 +1,152 @@
+"""Perilaku `PredictionCache`: LRU, TTL, penghitung hit/miss, penggabungan
+field lewat `update`, dan cache yang dibuang saat model dimuat ulang.
+
+Tidak butuh server; jalankan dengan `python test_prediction_cache.py` atau pytest.
+"""
+from unittest import mock
+
+import numpy as np
+
+from ml import cardio_model as cm
+from ml import prediction_cache
+from ml.compiled_trees import random_feature_matrix
+from ml.prediction_cache import PredictionCache
+
+
+class Clock:
+    """Pengganti modul `time` dengan waktu yang dimajukan manual."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def cache_with_clock(maxsize=4, ttl=10.0):
+    clock = Clock()
+    patcher = mock.patch.object(prediction_cache, "time", clock)
+    patcher.start()
+    return PredictionCache(maxsize, ttl), clock, patcher
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2, ttl=None)
+    cache.update("a", proba=0.1)
+    cache.update("b", proba=0.2)
+    assert cache.get("a", "proba") == 0.1
+    cache.update("c", proba=0.3)
+    assert len(cache) == 2
+    assert cache.get("b", "proba") is None
+    assert cache.get("a", "proba") == 0.1
+    assert cache.get("c", "proba") == 0.3
+
+
+def test_update_merges_fields():
+    cache = PredictionCache(maxsize=4, ttl=None)
+    cache.update("a", proba=0.1)
+    assert cache.get("a", "shap") is None
+    cache.update("a", shap=[1.0, 2.0])
+    assert cache.get("a", "proba") == 0.1
+    assert cache.get("a", "shap") == [1.0, 2.0]
+    assert len(cache) == 1
+
+
+def test_entries_expire_after_ttl():
+    cache, clock, patcher = cache_with_clock(ttl=10.0)
+    try:
+        cache.update("a", proba=0.1)
+        clock.now += 10.0
+        assert cache.get("a", "proba") == 0.1
+        clock.now += 0.5
+        assert cache.get("a", "proba") is None
+        assert len(cache) == 0
+    finally:
+        patcher.stop()
+
+
+def test_update_does_not_revive_expired_entry():
+    cache, clock, patcher = cache_with_clock(ttl=10.0)
+    try:
+        cache.update("a", proba=0.1)
+        clock.now += 11.0
+        cache.update("a", shap=[1.0])
+        assert cache.get("a", "proba") is None
+        assert cache.get("a", "shap") == [1.0]
+    finally:
+        patcher.stop()
+
+
+def test_update_keeps_original_timestamp():
+    cache, clock, patcher = cache_with_clock(ttl=10.0)
+    try:
+        cache.update("a", proba=0.1)
+        clock.now += 6.0
+        cache.update("a", shap=[1.0])
+        clock.now += 6.0
+        assert cache.get("a", "proba") is None
+        assert cache.get("a", "shap") is None
+    finally:
+        patcher.stop()
+
+
+def test_no_ttl_never_expires():
+    cache, clock, patcher = cache_with_clock(ttl=None)
+    try:
+        cache.update("a", proba=0.1)
+        clock.now += 1e9
+        assert cache.get("a", "proba") == 0.1
+    finally:
+        patcher.stop()
+
+
+def test_hit_miss_counters_and_stats():
+    cache = PredictionCache(maxsize=8, ttl=None)
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.get("a", "proba")
+    cache.update("a", proba=0.1)
+    cache.get("a", "proba")
+    cache.get("a", "proba")
+    cache.get("a", "shap")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+    assert (stats["size"], stats["maxsize"]) == (1, 8)
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["hits"] == 2
+
+
+def test_reload_discards_cache():
+    model = cm.CardioRiskModel()
+    old_state = model._state
+    assert old_state.cache is not None
+    old_cache = model.cache
+    old_cache.clear()
+    X = random_feature_matrix(5, 3)
+    model.predict_proba_batch(X)
+    assert len(old_cache) == 5
+    try:
+        with mock.patch.object(cm, "_model_fingerprint", return_value=("changed",)):
+            model._fingerprint_checked = float("-inf")
+            proba = model.predict_proba_batch(X)
+        assert model._state is not old_state
+        assert model.cache is not old_cache
+        assert model.cache.stats()["hits"] == 0
+        assert len(model.cache) == 5
+        assert len(old_cache) == 5
+        assert np.allclose(proba, old_state.predict_matrix(X))
+    finally:
+        model._state = old_state
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,120 @@
+"""Pastikan query CRUD memakai index, bukan full scan / sort sementara.
+
+Tidak butuh server; jalankan dengan `python test_query_plans.py` atau pytest.
+"""
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from appheart import crud
+from appheart.migrate import upgrade
+
+# Tabel yang tumbuh bersama jumlah pemeriksaan
+LARGE_TABLES = ("checkups",)
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    upgrade(engine)
+    return engine, sessionmaker(bind=engine)()
+
+
+@contextmanager
+def captured_selects(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def query_plans(engine, statements):
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                yield row[-1], " ".join(statement.split())
+
+
+def plan_problems(engine, statements, tables=LARGE_TABLES):
+    problems = []
+    for detail, statement in query_plans(engine, statements):
+        full_scan = any(detail == f"SCAN {t}" for t in tables)
+        if full_scan or "TEMP B-TREE" in detail:
+            problems.append(f"{detail}\n    in: {statement}")
+    return problems
+
+
+def run_captured(query):
+    engine, db = make_session()
+    try:
+        with captured_selects(engine) as statements:
+            query(db)
+    finally:
+        db.close()
+    assert statements, "query did not run any SELECT"
+    return engine, statements
+
+
+def assert_uses_indexes(query, tables=LARGE_TABLES):
+    engine, statements = run_captured(query)
+    problems = plan_problems(engine, statements, tables)
+    assert not problems, "\n".join(problems)
+
+
+def test_checkups_by_patient_uses_index():
+    assert_uses_indexes(lambda db: crud.get_checkups_by_patient(db, patient_id=1))
+
+
+def test_checkups_by_patient_keyset_uses_index():
+    after = (datetime(2024, 6, 1, 12, 0), 500)
+    assert_uses_indexes(lambda db: crud.get_checkups_by_patient(db, patient_id=1, after=after))
+
+
+def test_all_checkups_uses_index():
+    assert_uses_indexes(lambda db: crud.get_all_checkups(db))
+
+
+def test_checkup_report_uses_index():
+    assert_uses_indexes(lambda db: crud.get_checkup_report(db).fetchall())
+
+
+def test_latest_risk_uses_index():
+    assert_uses_indexes(lambda db: crud.get_patients_with_latest_risk(db))
+
+
+def test_timeseries_uses_index():
+    assert_uses_indexes(
+        lambda db: crud.get_checkup_timeseries(db, start=date(2024, 1, 1), end=date(2024, 12, 31)),
+        tables=("checkups", "checkup_stats"),
+    )
+
+
+def test_shap_impact_uses_index():
+    assert_uses_indexes(lambda db: crud.get_shap_impact(db, start=date(2024, 5, 1), end=date(2024, 5, 31)))
+
+
+def test_stats_reads_rollup_only():
+    engine, statements = run_captured(lambda db: crud.get_checkup_stats(db))
+    touched = [(d, s) for d, s in query_plans(engine, statements) if " checkups" in d]
+    assert not touched, touched
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,214 @@
+"""Rollup checkup_stats harus sama dengan scan langsung tabel checkups.
+
+Dibandingkan `crud.get_checkup_stats` (rollup) dengan `crud.scan_checkup_stats`
+setelah create_checkup, create_checkups_bulk, CheckupWriter dan backfill
+`rebuild_checkup_stats` / `ensure_checkup_stats`, termasuk baris dengan
+risk_category, bmi atau map NULL. `/stats/timeseries` dicek per hari.
+
+Tidak butuh server; database diarahkan ke file SQLite sementara. Jalankan
+dengan `python test_stats_rollup.py` atau pytest.
+"""
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Database sementara, sebelum appheart diimpor (lewat pytest: conftest.py)
+if "appheart.database" not in sys.modules:
+    os.environ["SIAGA_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='siaga-test-')}/siaga_test.db"
+
+from fastapi.testclient import TestClient
+
+from appheart import crud, models, schemas
+from appheart.api import main
+from appheart.checkup_writer import CheckupWriter
+from appheart.database import SessionLocal
+
+CHECKUP = {
+    "age_years": 52, "gender": 2, "bmi": 27.5, "map": 101.0, "cholesterol": 2,
+    "gluc": 1, "smoke": 0, "alco": 0, "active": 1, "checked_by_user_id": 1,
+}
+WAIT_SECONDS = 10
+
+client = TestClient(main.app)
+
+
+def checkup(**overrides):
+    # Tanpa validasi: data lama boleh punya bmi/map NULL
+    return schemas.CheckupCreate.construct(**{**CHECKUP, **overrides})
+
+
+def variants():
+    """(checkup, risk_category, probability) yang mencakup semua cabang rollup."""
+    return [
+        (checkup(), "Rendah", 0.10),
+        (checkup(smoke=1, cholesterol=3, gluc=2, map=120.0), "Tinggi", 0.90),
+        (checkup(bmi=None), "Sedang", 0.45),
+        (checkup(map=None, smoke=1), "Sedang", 0.55),
+        (checkup(bmi=None, map=None), None, 0.30),
+        (checkup(gluc=3), None, 0.70),
+    ]
+
+
+def add_patient(db, name="Pasien Rollup"):
+    patient = models.Patient(full_name=name, gender="F")
+    db.add(patient)
+    db.commit()
+    return patient.id
+
+
+def bulk_rows(patient_id, **extra):
+    return [
+        dict(checkup=c, patient_id=patient_id, probability=p, risk_label=int(p >= 0.5),
+             risk_category=cat, model_version="test", **extra)
+        for c, cat, p in variants()
+    ]
+
+
+def assert_rollup_matches_scan(db):
+    rolled = crud.get_checkup_stats(db)
+    scanned = crud.scan_checkup_stats(db)
+    for key in ("total_patients", "total_checkups", "risk_distribution", "risk_factors"):
+        assert rolled[key] == scanned[key], (key, rolled[key], scanned[key])
+    for key, value in scanned["averages"].items():
+        assert math.isclose(rolled["averages"][key], value, rel_tol=1e-9, abs_tol=1e-12), (key, rolled, scanned)
+
+
+def synced_session():
+    """Session dengan rollup yang sudah disamakan (test lain boleh insert mentah)."""
+    db = SessionLocal()
+    crud.rebuild_checkup_stats(db)
+    assert_rollup_matches_scan(db)
+    return db
+
+
+def test_create_checkup_updates_rollup():
+    db = synced_session()
+    try:
+        pid = add_patient(db)
+        for c, cat, p in variants():
+            crud.create_checkup(db, c, patient_id=pid, probability=p, risk_label=int(p >= 0.5),
+                                risk_category=cat, model_version="test")
+            assert_rollup_matches_scan(db)
+        assert crud.get_checkup_stats(db)["risk_distribution"][None] >= 2
+    finally:
+        db.close()
+
+
+def test_create_checkups_bulk_updates_rollup():
+    db = synced_session()
+    try:
+        pid = add_patient(db)
+        crud.create_checkups_bulk(db, bulk_rows(pid))
+        assert_rollup_matches_scan(db)
+    finally:
+        db.close()
+
+
+def test_checkup_writer_updates_rollup():
+    db = synced_session()
+    try:
+        pid = add_patient(db)
+        writer = CheckupWriter(flush_ms=50)
+        try:
+            futures = [writer.submit(**row) for row in bulk_rows(pid)]
+            for future in futures:
+                future.result(WAIT_SECONDS)
+        finally:
+            writer.close(WAIT_SECONDS)
+        db.expire_all()
+        assert_rollup_matches_scan(db)
+    finally:
+        db.close()
+
+
+def test_rebuild_backfills_rows_inserted_without_rollup():
+    db = synced_session()
+    try:
+        pid = add_patient(db)
+        for row in bulk_rows(pid):
+            c = row.pop("checkup")
+            db.add(models.Checkup(**c.dict(exclude={"patient_id"}), **row))
+        db.commit()
+        before = crud.get_checkup_stats(db)["total_checkups"]
+        assert before < crud.scan_checkup_stats(db)["total_checkups"]
+        crud.rebuild_checkup_stats(db)
+        assert_rollup_matches_scan(db)
+    finally:
+        db.close()
+
+
+def test_ensure_backfills_only_an_empty_rollup():
+    db = synced_session()
+    try:
+        db.query(models.CheckupStat).delete()
+        db.commit()
+        crud.ensure_checkup_stats(db)
+        assert_rollup_matches_scan(db)
+        rows = db.query(models.CheckupStat).count()
+        crud.ensure_checkup_stats(db)
+        assert db.query(models.CheckupStat).count() == rows
+    finally:
+        db.close()
+
+
+def test_timeseries_sums_match_per_day():
+    days = [datetime(2001, 3, 1, 8), datetime(2001, 3, 1, 23, 59), datetime(2001, 3, 3, 12)]
+    db = synced_session()
+    try:
+        pid = add_patient(db)
+        expected = {}
+        for created_at in days:
+            rows = bulk_rows(pid, created_at=created_at)
+            crud.create_checkups_bulk(db, [dict(r) for r in rows])
+            day = expected.setdefault(created_at.date().isoformat(), [])
+            day.extend(rows)
+        assert_rollup_matches_scan(db)
+    finally:
+        db.close()
+
+    response = client.get("/stats/timeseries", params={"start": "2001-03-01", "end": "2001-03-31"})
+    assert response.status_code == 200, response.text
+    body = {d["day"]: d for d in response.json()}
+    assert sorted(body) == sorted(expected)
+    for day, rows in expected.items():
+        got = body[day]
+        checkups = [r["checkup"] for r in rows]
+        assert got["total_checkups"] == len(rows)
+        distribution = {}
+        for r in rows:
+            # Kunci None dari StatsDay.risk_distribution diserialisasi sebagai "None"
+            key = r["risk_category"] if r["risk_category"] is not None else "None"
+            distribution[key] = distribution.get(key, 0) + 1
+        assert got["risk_distribution"] == distribution
+        assert got["risk_factors"] == {
+            "Merokok": sum(c.smoke == 1 for c in checkups),
+            "Kolesterol Tinggi": sum(c.cholesterol >= crud.HIGH_CHOLESTEROL_LEVEL for c in checkups),
+            "Diabetes": sum(c.gluc >= crud.DIABETES_GLUC_LEVEL for c in checkups),
+            "Hipertensi": sum(c.map is not None and c.map > crud.HYPERTENSION_MAP for c in checkups),
+        }
+        for name, values in (
+            ("bmi", [c.bmi for c in checkups]),
+            ("map", [c.map for c in checkups]),
+            ("risk", [r["probability"] for r in rows]),
+        ):
+            values = [v for v in values if v is not None]
+            assert math.isclose(got["averages"][name], sum(values) / len(values), rel_tol=1e-9), (day, name)
+
+    only_high = client.get("/stats/timeseries", params={"start": "2001-03-01", "end": "2001-03-31",
+                                                        "risk_category": "Tinggi"}).json()
+    assert [d["total_checkups"] for d in only_high] == [2, 1]
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}\n  {e}")
+    raise SystemExit(1 if failed else 0)